@@ -0,0 +1,176 @@
+import numpy as np
+
+from chinese_chess import (
+    ADVISOR, ADVISOR_MOVES, BLACK_OFFSET, CANNON, CHARIOT, ELEPHANT, ELEPHANT_MOVES,
+    GENERAL, GENERAL_MOVES, HORSE, HORSE_ATTACKERS, HORSE_MOVES, NUM_SQUARES, RAYS, SOLDIER,
+    SOLDIER_ATTACKERS, SOLDIER_MOVES,
+)
+from cc_gym import ACTION_ENCODINGS, SQUARE_TO_COMPACT
+
+# 棋盘数组末尾追加一个恒为空的哨兵格，用于补齐长度不一的表
+SENTINEL = NUM_SQUARES
+
+def _padded(rows, width):
+    # 把长度不一的索引列表用哨兵格补齐成矩形数组
+    return np.array([list(row) + [SENTINEL] * (width - len(row)) for row in rows], dtype=np.intp)
+
+
+def _leaper_table(table, with_block):
+    # (90, 宽度)的目标格数组和蹩腿/塞眼格数组，不足的位置用哨兵格补齐
+    width = max(len(entries) for entries in table)
+    if with_block:
+        targets = _padded([[to_sq for to_sq, _ in entries] for entries in table], width)
+        blocks = _padded([[block for _, block in entries] for entries in table], width)
+    else:
+        targets = _padded(table, width)
+        blocks = np.full(targets.shape, SENTINEL, dtype=np.intp)
+    return targets, blocks
+
+
+# 每种非直线棋子的 (棋子类型, [红方表, 黑方表])
+LEAPERS = (
+    (HORSE, [_leaper_table(HORSE_MOVES, True)] * 2),
+    (ELEPHANT, [_leaper_table(ELEPHANT_MOVES[color], True) for color in range(2)]),
+    (ADVISOR, [_leaper_table(ADVISOR_MOVES[color], False) for color in range(2)]),
+    (GENERAL, [_leaper_table(GENERAL_MOVES[color], False) for color in range(2)]),
+    (SOLDIER, [_leaper_table(SOLDIER_MOVES[color], False) for color in range(2)]),
+)
+
+# 将帅所在格向四个方向的射线，以及能攻击到它的马（及马腿）、兵的位置
+RAY_INDEX = np.stack([_padded(RAYS[sq], 9) for sq in range(NUM_SQUARES)])
+RAY_VALID = RAY_INDEX != SENTINEL
+HORSE_ATTACK_SQ = _padded([[horse_sq for horse_sq, _ in HORSE_ATTACKERS[sq]] for sq in range(NUM_SQUARES)], 8)
+HORSE_ATTACK_LEG = _padded([[leg for _, leg in HORSE_ATTACKERS[sq]] for sq in range(NUM_SQUARES)], 8)
+SOLDIER_ATTACK_SQ = np.stack([_padded(SOLDIER_ATTACKERS[color], 3) for color in range(2)])
+
+# 离开或进入将帅所在的行列、离开攻击将帅的马的马腿格，才可能改变将帅是否被攻击
+_rows, _cols = np.divmod(np.arange(NUM_SQUARES + 1), 9)
+SAME_LINE = (_rows[:NUM_SQUARES, None] == _rows) | (_cols[:NUM_SQUARES, None] == _cols)
+SAME_LINE[:, SENTINEL] = False
+HORSE_LEG = np.zeros((NUM_SQUARES, NUM_SQUARES + 1), dtype=bool)
+HORSE_LEG[np.arange(NUM_SQUARES)[:, None], HORSE_ATTACK_LEG] = True
+HORSE_LEG[:, SENTINEL] = False
+del _rows, _cols
+
+
+def _attacked_generals(boards, turns):
+    # boards: (K, 91)；返回turns一方的将帅是否被攻击（没有将帅也视为被攻击）及将帅所在格
+    rows = np.arange(len(boards))
+    enemy_offset = (BLACK_OFFSET * (1 - turns)).astype(np.uint8)[:, None]
+    general_code = (GENERAL + BLACK_OFFSET * turns).astype(np.uint8)[:, None]
+    is_general = boards[:, :NUM_SQUARES] == general_code
+    has_general = is_general.any(axis=1)
+    general_sq = is_general.argmax(axis=1)
+
+    # 车、炮沿直线攻击；对方将帅在同一直线上且中间无子即“对脸”
+    pieces = boards[rows[:, None, None], RAY_INDEX[general_sq]]
+    count = (pieces != 0).cumsum(axis=2, dtype=np.uint8)
+    offset3 = enemy_offset[:, :, None]
+    attacked = ((count == 1) & ((pieces == CHARIOT + offset3) | (pieces == GENERAL + offset3))).any(axis=(1, 2))
+    attacked |= ((count == 2) & (pieces == CANNON + offset3)).any(axis=(1, 2))
+
+    # 马腿未被蹩住的马
+    horses = boards[rows[:, None], HORSE_ATTACK_SQ[general_sq]] == HORSE + enemy_offset
+    legs = boards[rows[:, None], HORSE_ATTACK_LEG[general_sq]] == 0
+    attacked |= (horses & legs).any(axis=1)
+
+    # 兵卒（仕象不会出现在对方九宫，无需检查）
+    soldier_squares = SOLDIER_ATTACK_SQ[1 - turns, general_sq]
+    attacked |= (boards[rows[:, None], soldier_squares] == SOLDIER + enemy_offset).any(axis=1)
+    return attacked | ~has_general, general_sq
+
+
+def legal_move_arrays(boards, turns):
+    """Legal moves of a batch of positions as flat (board_index, from_sq, to_sq) arrays.
+
+    boards: (N, 10, 9) piece codes, turns: (N,) with 0 = red and 1 = black to move.
+    """
+    boards = np.asarray(boards).reshape(-1, NUM_SQUARES).astype(np.uint8)
+    turns = np.asarray(turns).astype(np.intp)
+    n = len(boards)
+    # 追加一列哨兵空格
+    boards = np.concatenate([boards, np.zeros((n, 1), dtype=np.uint8)], axis=1)
+
+    own_offset = (BLACK_OFFSET * turns).astype(np.uint8)[:, None]
+    occupied = boards != 0
+    own = occupied & ((boards > BLACK_OFFSET) == turns[:, None].astype(bool))
+    enemy = occupied & ~own
+    indices, froms, tos = [], [], []
+
+    # 车炮：沿四条射线取出棋子，按前面已有几个棋子判断能否到达
+    for piece_type in (CHARIOT, CANNON):
+        board_index, from_sq = np.nonzero(boards == piece_type + own_offset)
+        targets = RAY_INDEX[from_sq]
+        rows = board_index[:, None, None]
+        target_occupied = occupied[rows, targets]
+        before = target_occupied.cumsum(axis=2, dtype=np.uint8) - target_occupied
+        if piece_type == CHARIOT:
+            ok = (before == 0) & ~own[rows, targets]
+        else:
+            ok = ((before == 0) & ~target_occupied) | ((before == 1) & enemy[rows, targets])
+        pair, ray, step = np.nonzero(ok & RAY_VALID[from_sq])
+        indices.append(board_index[pair])
+        froms.append(from_sq[pair])
+        tos.append(targets[pair, ray, step])
+
+    # 马、象、仕、帅、兵：查表，蹩腿/塞眼格必须为空
+    for piece_type, tables in LEAPERS:
+        for color in range(2):
+            board_index, from_sq = np.nonzero((boards == piece_type + BLACK_OFFSET * color) & (turns == color)[:, None])
+            targets, blocks = tables[color]
+            targets = targets[from_sq]
+            rows = board_index[:, None]
+            ok = (targets != SENTINEL) & ~own[rows, targets] & ~occupied[rows, blocks[from_sq]]
+            pair, slot = np.nonzero(ok)
+            indices.append(board_index[pair])
+            froms.append(from_sq[pair])
+            tos.append(targets[pair, slot])
+
+    board_index = np.concatenate(indices)
+    from_sq = np.concatenate(froms)
+    to_sq = np.concatenate(tos)
+
+    # 当前未被将军时，只有走将帅、或经过将帅所在行列/马腿格的着法需要检查
+    in_check, general_sq = _attacked_generals(boards, turns)
+    general_sq = general_sq[board_index]
+    suspect = (
+        in_check[board_index]
+        | (from_sq == general_sq)
+        | SAME_LINE[general_sq, from_sq]
+        | SAME_LINE[general_sq, to_sq]
+        | HORSE_LEG[general_sq, from_sq]
+    )
+
+    # 对需要检查的着法一次性走棋，再过滤走后被将军的着法
+    check_index = np.flatnonzero(suspect)
+    after = boards[board_index[check_index]]
+    rows = np.arange(len(after))
+    after[rows, to_sq[check_index]] = after[rows, from_sq[check_index]]
+    after[rows, from_sq[check_index]] = 0
+    legal = np.ones(len(board_index), dtype=bool)
+    legal[check_index] = ~_attacked_generals(after, turns[board_index[check_index]])[0]
+    return board_index[legal], from_sq[legal], to_sq[legal]
+
+
+def legal_action_mask(boards, turns, action_encoding="square", out=None):
+    """Legal-action masks of shape (N, action_size) for a batch of positions.
+
+    boards: (N, 10, 9) piece codes, turns: (N,) with 0 = red and 1 = black to move.
+    The masks match ChineseChess.get_action_space encoded with cc_gym.ACTION_ENCODINGS.
+    """
+    action_size = ACTION_ENCODINGS[action_encoding][0]
+    board_index, from_sq, to_sq = legal_move_arrays(boards, turns)
+    actions = from_sq * NUM_SQUARES + to_sq
+    if action_encoding == "compact":
+        actions = SQUARE_TO_COMPACT[actions]
+        # 不在紧凑编码中的着法（士、象处于不可能到达的格子）为-1，不能当作下标写入
+        if (actions < 0).any():
+            bad = int(np.flatnonzero(actions < 0)[0])
+            raise ValueError(f"第{int(board_index[bad])}个局面的着法{int(from_sq[bad])}->{int(to_sq[bad])}"
+                             f"没有紧凑编码")
+    if out is None:
+        out = np.zeros((len(np.asarray(turns)), action_size), dtype=bool)
+    else:
+        out[:] = False
+    out[board_index, actions] = True
+    return out
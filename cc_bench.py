@@ -0,0 +1,281 @@
+"""Benchmark suite for the Chinese Chess engine and gym environment.
+
+Run ``python cc_bench.py`` to print every benchmark, or pass benchmark
+names (e.g. ``python cc_bench.py startup``) to run a subset.
+"""
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+STARTUP_SCRIPT = """
+import resource, sys, time
+t0 = time.perf_counter()
+from cc_gym import ChineseChessEnv
+t1 = time.perf_counter()
+envs = [ChineseChessEnv() for _ in range({num_envs})]
+for env in envs:
+    env.reset()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'pygame' in sys.modules)
+"""
+
+
+def bench_startup(num_envs=100):
+    """Measure import time, env construction time and peak RSS of a fresh worker"""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT.format(num_envs=num_envs)],
+        capture_output=True, text=True, check=True,
+    )
+    import_time, create_time, max_rss_kb, pygame_loaded = result.stdout.split()
+    return {
+        'import_ms': float(import_time) * 1000,
+        'create_ms_per_env': float(create_time) * 1000 / num_envs,
+        'max_rss_mb': int(max_rss_kb) / 1024,
+        'pygame_loaded': pygame_loaded == 'True',
+    }
+
+
+def _random_env_steps(num_steps, seed, move_cache):
+    from cc_gym import ChineseChessEnv
+
+    rng = random.Random(seed)
+    env = ChineseChessEnv(move_cache=move_cache)
+    env.reset(seed=seed)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        action = rng.randrange(len(env.valid_actions))
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    return num_steps / (time.perf_counter() - start), env.chess_game.move_cache
+
+
+def bench_env_steps(num_steps=2000, seed=0, move_cache=None, cached_size=10000):
+    """Measure random-play env steps per second with move_cache (the env default) and with a cached_size cache"""
+    steps_per_sec, _ = _random_env_steps(num_steps, seed, move_cache)
+    cached_steps_per_sec, cache = _random_env_steps(num_steps, seed, cached_size)
+    return {
+        'steps': num_steps,
+        'steps_per_sec': steps_per_sec,
+        'cached_steps_per_sec': cached_steps_per_sec,
+        'move_cache_hit_rate': cache.stats()['hit_rate'],
+    }
+
+
+def bench_position_copy(num_copies=10000):
+    """Measure the time and memory needed to snapshot a position"""
+    from chinese_chess import ChineseChess
+
+    game = ChineseChess()
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshots = [bytearray(game.squares) for _ in range(num_copies)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del snapshots
+    return {
+        'copy_us': elapsed * 1e6 / num_copies,
+        'bytes_per_position': size / num_copies,
+    }
+
+
+def bench_action_space(num_positions=200, seed=0):
+    """Measure get_action_space calls per second over random-play positions"""
+    from chinese_chess import ChineseChess
+
+    rng = random.Random(seed)
+    # Measure move generation itself, not the legal-move cache
+    game = ChineseChess(move_cache=None)
+    positions = []
+    while len(positions) < num_positions:
+        actions = game.get_action_space()
+        if game.game_over or not actions:
+            game.reset()
+            continue
+        positions.append(game.copy())
+        game.make_move(*rng.choice(actions))
+
+    start = time.perf_counter()
+    for position in positions:
+        position.get_action_space()
+    elapsed = time.perf_counter() - start
+    return {'positions': num_positions, 'calls_per_sec': num_positions / elapsed}
+
+
+def bench_perft(depth=3, backends=('array', 'bitboard')):
+    """Measure perft leaf nodes per second from the initial position for each engine backend"""
+    from chinese_chess import make_game
+    from perft import perft
+
+    result = {'depth': depth}
+    for backend in backends:
+        game = make_game(backend, move_cache=None)
+        start = time.perf_counter()
+        nodes = perft(game, depth)
+        result[f'{backend}_nodes_per_sec'] = nodes / (time.perf_counter() - start)
+    return result
+
+
+def bench_search(depth=4):
+    """Measure alpha-beta search nodes per second on the perft suite positions"""
+    from chinese_chess import ChineseChess
+    from cc_search import Searcher, SearchLimit
+    from perft import PERFT_SUITE
+
+    nodes = 0
+    elapsed = 0.0
+    for _, fen, _ in PERFT_SUITE:
+        game = ChineseChess()
+        game.load_fen(fen)
+        result = Searcher().search(game, SearchLimit(depth=depth))
+        nodes += result.nodes
+        elapsed += result.time
+    return {'depth': depth, 'nodes': nodes, 'nodes_per_sec': nodes / elapsed}
+
+
+def bench_observation(num_calls=20000):
+    """Measure the cost of building one observation in each observation mode"""
+    from cc_gym import ChineseChessEnv
+
+    configs = {
+        'board': {},
+        'planes': {'observation_mode': 'planes'},
+        'planes_history4': {'observation_mode': 'planes', 'history_length': 4, 'side_to_move_plane': True},
+    }
+    result = {}
+    for name, kwargs in configs.items():
+        env = ChineseChessEnv(copy_obs=False, **kwargs)
+        env.reset()
+        for action in range(8):
+            env.step(action % len(env.valid_actions))
+        start = time.perf_counter()
+        for _ in range(num_calls):
+            env._get_obs()
+        result[f'{name}_us'] = (time.perf_counter() - start) * 1e6 / num_calls
+    return result
+
+
+def bench_batch_mask(batch_size=256, seed=0):
+    """Compare batched NumPy legal-action masks with per-board get_action_space"""
+    import numpy as np
+    from chinese_chess import ChineseChess, COLORS
+    from cc_batch import legal_action_mask
+
+    rng = random.Random(seed)
+    game = ChineseChess(move_cache=None)
+    positions = []
+    while len(positions) < batch_size:
+        actions = game.get_action_space()
+        if game.game_over or not actions:
+            game.reset()
+            continue
+        positions.append(game.copy())
+        game.make_move(*rng.choice(actions))
+    boards = np.array([np.frombuffer(bytes(position.squares), dtype=np.uint8) for position in positions])
+    boards = boards.reshape(batch_size, 10, 9)
+    turns = np.array([COLORS.index(position.turn) for position in positions])
+
+    start = time.perf_counter()
+    legal_action_mask(boards, turns, "compact")
+    batched = time.perf_counter() - start
+    start = time.perf_counter()
+    for position in positions:
+        position.get_action_space()
+    per_board = time.perf_counter() - start
+    return {
+        'batch_size': batch_size,
+        'batched_boards_per_sec': batch_size / batched,
+        'per_board_boards_per_sec': batch_size / per_board,
+    }
+
+
+def bench_vector_env(num_envs=64, num_steps=200, seed=0):
+    """Measure random-play env steps per second of ChineseChessVectorEnv"""
+    import numpy as np
+    from cc_vector_env import ChineseChessVectorEnv
+
+    rng = np.random.default_rng(seed)
+    envs = ChineseChessVectorEnv(num_envs, copy=False)
+    _, infos = envs.reset(seed=seed)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        masks = infos["action_mask"]
+        actions = [rng.choice(np.flatnonzero(mask)) for mask in masks]
+        _, _, _, _, infos = envs.step(actions)
+    elapsed = time.perf_counter() - start
+    return {
+        'num_envs': num_envs,
+        'env_steps_per_sec': num_envs * num_steps / elapsed,
+    }
+
+
+def bench_rollout(worker_counts=(1, 2, 4), duration=3.0):
+    """Measure self-play steps per second of RolloutPool for several worker counts"""
+    from cc_rollout import RolloutPool
+
+    result = {}
+    for num_workers in worker_counts:
+        with RolloutPool(num_workers) as pool:
+            pool.collect(min_steps=num_workers, timeout=30)  # 等待工作进程启动
+            start = time.perf_counter()
+            steps = 0
+            while time.perf_counter() - start < duration:
+                steps += len(pool.collect()['action'])
+            elapsed = time.perf_counter() - start
+        result[f'workers{num_workers}_steps_per_sec'] = steps / elapsed
+    return result
+
+
+def bench_mcts(num_simulations=1000, batch_sizes=(1, 16)):
+    """Measure MCTS simulations per second from the initial position with a uniform evaluator"""
+    from chinese_chess import ChineseChess
+    from cc_mcts import MCTS, uniform_evaluator
+
+    result = {}
+    for batch_size in batch_sizes:
+        calls = []
+
+        def evaluator(observations, action_masks, turns):
+            calls.append(len(observations))
+            return uniform_evaluator(observations, action_masks, turns)
+
+        mcts = MCTS(evaluator, batch_size=batch_size)
+        mcts.reset(ChineseChess())
+        start = time.perf_counter()
+        mcts.search(num_simulations)
+        elapsed = time.perf_counter() - start
+        result[f'batch{batch_size}_sims_per_sec'] = num_simulations / elapsed
+        result[f'batch{batch_size}_evaluator_calls'] = len(calls)
+    return result
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'position_copy': bench_position_copy,
+    'action_space': bench_action_space,
+    'perft': bench_perft,
+    'search': bench_search,
+    'env_steps': bench_env_steps,
+    'observation': bench_observation,
+    'batch_mask': bench_batch_mask,
+    'vector_env': bench_vector_env,
+    'rollout': bench_rollout,
+    'mcts': bench_mcts,
+}
+
+
+def main(names=None):
+    for name in names or BENCHMARKS:
+        result = BENCHMARKS[name]()
+        print(f"{name}: " + ", ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        ))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,214 @@
+from chinese_chess import (
+    BLACK_OFFSET, CANNON, CHARIOT, CODE_COLOR, CODE_TYPE, COLS, EMPTY, GENERAL, HORSE, HORSE_ATTACKERS,
+    NUM_SQUARES, RAYS, ROWS, SQUARE_POS, ChineseChess,
+)
+
+# Bit of every square in its rank's (bit = col) and its file's (bit = row) occupancy
+RANK_BIT = tuple(1 << col for row, col in SQUARE_POS)
+FILE_BIT = tuple(1 << row for row, col in SQUARE_POS)
+
+
+def _line_entry(line, index, occupancy):
+    """(empty squares reached, first pieces hit, pieces beyond the first) from line[index] in both directions"""
+    quiet, first, second = [], [], []
+    for step in (1, -1):
+        j = index + step
+        while 0 <= j < len(line) and not occupancy >> j & 1:
+            quiet.append(line[j])
+            j += step
+        if 0 <= j < len(line):
+            first.append(line[j])
+            j += step
+            while 0 <= j < len(line) and not occupancy >> j & 1:
+                j += step
+            if 0 <= j < len(line):
+                second.append(line[j])
+    return tuple(quiet), tuple(first), tuple(second)
+
+
+def _build_line_table(lines):
+    """Per-square table indexed by the occupancy of the square's line; the square's own bit is ignored"""
+    table = [None] * NUM_SQUARES
+    for line in lines:
+        size = len(line)
+        for index, sq in enumerate(line):
+            own_bit = 1 << index
+            entries = [None] * (1 << size)
+            for occupancy in range(1 << size):
+                if occupancy & own_bit:
+                    entries[occupancy] = entries[occupancy ^ own_bit] = _line_entry(line, index, occupancy)
+            table[sq] = tuple(entries)
+    return tuple(table)
+
+
+RANK_TABLE = _build_line_table([tuple(row * COLS + col for col in range(COLS)) for row in range(ROWS)])
+FILE_TABLE = _build_line_table([tuple(row * COLS + col for row in range(ROWS)) for col in range(COLS)])
+
+
+class BitboardChineseChess(ChineseChess):
+    """ChineseChess with chariot and cannon moves looked up in rank/file attack tables.
+
+    Each rank and file keeps an occupancy bitboard (a 9- or 10-bit int),
+    updated by _move_piece/_unmove_piece. The occupancy of a square's rank
+    and file indexes precomputed tables of the empty squares a slider
+    reaches, the first piece it hits (chariot captures) and the piece
+    beyond that (cannon captures), so no ray is walked at move generation
+    or check detection time.
+
+    Legality checks are also skipped for moves that cannot expose the
+    general: when the side is not in check, only general moves and moves
+    from or to a square between the general and an enemy chariot, cannon
+    or general on its rank/file, or on the leg of an enemy horse next to
+    it, are made and tested.
+    """
+
+    _check_status = None
+
+    def _set_squares(self, squares):
+        super()._set_squares(squares)
+        self.rank_occupancy = [0] * ROWS
+        self.file_occupancy = [0] * COLS
+        for sq, code in enumerate(squares):
+            if code != EMPTY:
+                row, col = SQUARE_POS[sq]
+                self.rank_occupancy[row] |= RANK_BIT[sq]
+                self.file_occupancy[col] |= FILE_BIT[sq]
+
+    def copy(self):
+        game = super().copy()
+        game.rank_occupancy = list(self.rank_occupancy)
+        game.file_occupancy = list(self.file_occupancy)
+        return game
+
+    def _move_piece(self, from_sq, to_sq):
+        squares = self.squares
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        squares[to_sq] = piece
+        squares[from_sq] = EMPTY
+        from_row, from_col = SQUARE_POS[from_sq]
+        self.rank_occupancy[from_row] ^= RANK_BIT[from_sq]
+        self.file_occupancy[from_col] ^= FILE_BIT[from_sq]
+        if captured == EMPTY:
+            to_row, to_col = SQUARE_POS[to_sq]
+            self.rank_occupancy[to_row] |= RANK_BIT[to_sq]
+            self.file_occupancy[to_col] |= FILE_BIT[to_sq]
+        elif CODE_TYPE[captured] == GENERAL:
+            self.generals[CODE_COLOR[captured]] = -1
+        if CODE_TYPE[piece] == GENERAL:
+            self.generals[CODE_COLOR[piece]] = to_sq
+        return captured
+
+    def _unmove_piece(self, from_sq, to_sq, captured):
+        squares = self.squares
+        piece = squares[to_sq]
+        squares[from_sq] = piece
+        squares[to_sq] = captured
+        from_row, from_col = SQUARE_POS[from_sq]
+        self.rank_occupancy[from_row] |= RANK_BIT[from_sq]
+        self.file_occupancy[from_col] |= FILE_BIT[from_sq]
+        if captured == EMPTY:
+            to_row, to_col = SQUARE_POS[to_sq]
+            self.rank_occupancy[to_row] ^= RANK_BIT[to_sq]
+            self.file_occupancy[to_col] ^= FILE_BIT[to_sq]
+        elif CODE_TYPE[captured] == GENERAL:
+            self.generals[CODE_COLOR[captured]] = to_sq
+        if CODE_TYPE[piece] == GENERAL:
+            self.generals[CODE_COLOR[piece]] = from_sq
+
+    def _legal_moves_from(self, from_sq, color):
+        general_sq = self.generals[color]
+        if from_sq == general_sq or general_sq < 0:
+            return super()._legal_moves_from(from_sq, color)
+
+        # Check status and sensitive squares, computed once per position
+        status = self._check_status
+        if status is None or status[0] != self._hash or status[1] != color:
+            status = self._check_status = (self._hash, color) + self._king_safety(color)
+        in_check, sensitive = status[2], status[3]
+
+        moves = self._pseudo_moves(from_sq)
+        if not in_check and from_sq not in sensitive:
+            legal = []
+            for to_sq in moves:
+                if to_sq not in sensitive:
+                    legal.append(to_sq)
+                    continue
+                captured = self._move_piece(from_sq, to_sq)
+                if not self._is_in_check(color):
+                    legal.append(to_sq)
+                self._unmove_piece(from_sq, to_sq, captured)
+            return legal
+
+        legal = []
+        for to_sq in moves:
+            captured = self._move_piece(from_sq, to_sq)
+            if not self._is_in_check(color):
+                legal.append(to_sq)
+            self._unmove_piece(from_sq, to_sq, captured)
+        return legal
+
+    def _king_safety(self, color):
+        """(in_check, squares whose vacating or occupation may expose color's general)"""
+        squares = self.squares
+        general_sq = self.generals[color]
+        offset = BLACK_OFFSET * (1 - color)
+        sliders = (CHARIOT + offset, CANNON + offset, GENERAL + offset)
+        sensitive = set()
+        # Up to the farthest enemy chariot, cannon or general on each rank/file ray
+        for ray in RAYS[general_sq]:
+            last = -1
+            for index, s in enumerate(ray):
+                if squares[s] in sliders:
+                    last = index
+            sensitive.update(ray[:last + 1])
+        # Legs of enemy horses that could attack the general
+        horse = HORSE + offset
+        for horse_sq, leg in HORSE_ATTACKERS[general_sq]:
+            if squares[horse_sq] == horse:
+                sensitive.add(leg)
+        return self._is_in_check(color), sensitive
+
+    def _chariot_moves(self, sq, color):
+        row, col = SQUARE_POS[sq]
+        rank_quiet, rank_first, _ = RANK_TABLE[sq][self.rank_occupancy[row]]
+        file_quiet, file_first, _ = FILE_TABLE[sq][self.file_occupancy[col]]
+        squares = self.squares
+        moves = [*rank_quiet, *file_quiet]
+        for to_sq in rank_first + file_first:
+            if CODE_COLOR[squares[to_sq]] != color:
+                moves.append(to_sq)
+        return moves
+
+    def _cannon_moves(self, sq, color):
+        row, col = SQUARE_POS[sq]
+        rank_quiet, _, rank_second = RANK_TABLE[sq][self.rank_occupancy[row]]
+        file_quiet, _, file_second = FILE_TABLE[sq][self.file_occupancy[col]]
+        squares = self.squares
+        moves = [*rank_quiet, *file_quiet]
+        for to_sq in rank_second + file_second:
+            if CODE_COLOR[squares[to_sq]] != color:
+                moves.append(to_sq)
+        return moves
+
+    def _line_attacked(self, sq, by):
+        row, col = SQUARE_POS[sq]
+        _, rank_first, rank_second = RANK_TABLE[sq][self.rank_occupancy[row]]
+        _, file_first, file_second = FILE_TABLE[sq][self.file_occupancy[col]]
+        squares = self.squares
+        offset = BLACK_OFFSET if by else 0
+        chariot = CHARIOT + offset
+        for s in rank_first:
+            if squares[s] == chariot:
+                return True
+        # Generals can only face each other along a file
+        general = GENERAL + offset if squares[sq] == GENERAL + BLACK_OFFSET - offset else chariot
+        for s in file_first:
+            piece = squares[s]
+            if piece == chariot or piece == general:
+                return True
+        cannon = CANNON + offset
+        for s in rank_second + file_second:
+            if squares[s] == cannon:
+                return True
+        return False
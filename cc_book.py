@@ -0,0 +1,254 @@
+"""Opening book: weighted moves keyed by the Zobrist hash of a position.
+
+Books are built from PGN files with ICCS move text (``H2-E2``), plain ICCS
+move lists (one game per line) or self-play shards written by
+``cc_records``, and saved as a sorted binary file of (hash, move, weight)
+entries. Lookups go through an in-memory dict, so they cost one hash
+probe. Run ``python cc_book.py book.ccbk games.pgn selfplay/ --plies 20``
+to build a book from the command line.
+"""
+import argparse
+import os
+import random
+import re
+import struct
+import sys
+
+from cc_records import BLACK_WIN, DRAW, RED_WIN, UNFINISHED, ShardReader
+from chinese_chess import COLS, NUM_SQUARES, ROWS, SQUARE_POS, ChineseChess
+
+BOOK_MAGIC = b'CCBK'
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct('<4sHI')
+BOOK_ENTRY = struct.Struct('<QHI')
+
+PGN_RESULTS = {'1-0': RED_WIN, '0-1': BLACK_WIN, '1/2-1/2': DRAW, '*': UNFINISHED}
+
+ICCS_MOVE = re.compile(r'^([a-i])(\d)-?([a-i])(\d)$', re.IGNORECASE)
+
+
+def parse_iccs(text):
+    """ICCS move such as 'h2e2' or 'H2-E2' -> ((from_row, from_col), (to_row, to_col)), or None"""
+    match = ICCS_MOVE.match(text)
+    if match is None:
+        return None
+    from_file, from_rank, to_file, to_rank = match.groups()
+    # Files a-i run left to right and ranks 0-9 bottom to top from red's side
+    return ((ROWS - 1 - int(from_rank), ord(from_file.lower()) - ord('a')),
+            (ROWS - 1 - int(to_rank), ord(to_file.lower()) - ord('a')))
+
+
+def format_iccs(move):
+    """((from_row, from_col), (to_row, to_col)) -> ICCS move such as 'h2e2'"""
+    return ''.join(f"{chr(ord('a') + col)}{ROWS - 1 - row}" for row, col in move)
+
+
+def read_pgn(path):
+    """Yield (fen, moves, result) for every game of a PGN file with ICCS move text.
+
+    Comments and variations are skipped; a game stops at the first move
+    that is not in ICCS notation.
+    """
+    with open(path, encoding='utf-8', errors='replace') as file:
+        text = file.read()
+    for chunk in re.split(r'\n\s*\n(?=\[)', text):
+        tags = dict(re.findall(r'^\[(\w+)\s+"([^"]*)"\]', chunk, re.MULTILINE))
+        movetext = re.sub(r'^\[.*\]\s*$', '', chunk, flags=re.MULTILINE)
+        movetext = re.sub(r'\{[^}]*\}|;[^\n]*', ' ', movetext)
+        while '(' in movetext:
+            stripped = re.sub(r'\([^()]*\)', ' ', movetext)
+            if stripped == movetext:
+                break
+            movetext = stripped
+        moves = []
+        result = PGN_RESULTS.get(tags.get('Result', '*'), UNFINISHED)
+        for token in movetext.split():
+            if token in PGN_RESULTS:
+                result = PGN_RESULTS[token]
+                break
+            if re.match(r'^\d+\.+$', token):
+                continue
+            move = parse_iccs(re.sub(r'^\d+\.+', '', token))
+            if move is None:
+                break
+            moves.append(move)
+        if moves:
+            yield tags.get('FEN'), moves, result
+
+
+def read_iccs(path):
+    """Yield (None, moves, UNFINISHED) for a file of ICCS move lists, one game per line"""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            moves = []
+            for token in line.split():
+                move = parse_iccs(token)
+                if move is None:
+                    break
+                moves.append(move)
+            if moves:
+                yield None, moves, UNFINISHED
+
+
+def read_records(directory):
+    """Yield (fen, moves, result) for every game in a cc_records shard directory"""
+    with ShardReader(directory) as reader:
+        for index in range(reader.num_games):
+            record = reader.game(index)
+            moves = [(SQUARE_POS[move // NUM_SQUARES], SQUARE_POS[move % NUM_SQUARES])
+                     for move in record.moves.tolist()]
+            yield record.fen, moves, record.result
+
+
+def read_games(path):
+    """Yield games from a PGN file, a cc_records shard directory or an ICCS move list file"""
+    if os.path.isdir(path):
+        return read_records(path)
+    if path.lower().endswith('.pgn'):
+        return read_pgn(path)
+    return read_iccs(path)
+
+
+class OpeningBook:
+    """Weighted book moves by position hash.
+
+    ``lookup(game)`` returns the book moves of a position with their
+    weights and ``choose(game, rng)`` picks one at random in proportion to
+    its weight. Only moves that are legal in the position are returned, so
+    a hash collision cannot produce an illegal move.
+    """
+
+    def __init__(self):
+        # Zobrist hash -> {from_sq * 90 + to_sq: weight}
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, game):
+        return game.zobrist_hash in self.entries
+
+    def add(self, key, move, weight=1):
+        """Add weight to move ((from_row, from_col), (to_row, to_col)) in the position with hash key"""
+        (from_row, from_col), (to_row, to_col) = move
+        code = (from_row * COLS + from_col) * NUM_SQUARES + to_row * COLS + to_col
+        moves = self.entries.setdefault(key, {})
+        moves[code] = moves.get(code, 0) + weight
+
+    def add_game(self, moves, result=UNFINISHED, fen=None, max_plies=20, result_weights=(3, 2, 1)):
+        """Add the first max_plies moves of a game, weighted by the result for the side that played them.
+
+        result_weights are the weights of a move from a won, drawn and lost
+        game; unfinished games count as draws. Returns the plies added.
+        """
+        game = ChineseChess(move_cache=None, repetition_limit=None)
+        if fen is not None:
+            game.load_fen(fen)
+        for ply, move in enumerate(moves[:max_plies]):
+            move = (tuple(move[0]), tuple(move[1]))
+            if game.game_over or move not in game._legal_actions():
+                return ply
+            mover = 0 if game.turn == 'red' else 1
+            if result in (RED_WIN, BLACK_WIN):
+                weight = result_weights[0] if result == mover else result_weights[2]
+            else:
+                weight = result_weights[1]
+            if weight:
+                self.add(game.zobrist_hash, move, weight)
+            game.push(move)
+        return min(len(moves), max_plies)
+
+    def prune(self, min_weight):
+        """Drop moves whose total weight is below min_weight"""
+        for key in list(self.entries):
+            moves = {code: weight for code, weight in self.entries[key].items() if weight >= min_weight}
+            if moves:
+                self.entries[key] = moves
+            else:
+                del self.entries[key]
+
+    def lookup(self, game):
+        """Legal book moves of the position as [(((from_row, from_col), (to_row, to_col)), weight)], heaviest first"""
+        moves = self.entries.get(game.zobrist_hash)
+        if not moves:
+            return []
+        found = []
+        for code, weight in sorted(moves.items(), key=lambda item: -item[1]):
+            # Only the book moves are tested, the full legal move list is never generated
+            from_sq, to_sq = divmod(code, NUM_SQUARES)
+            if game._is_legal_move(from_sq, to_sq):
+                found.append(((SQUARE_POS[from_sq], SQUARE_POS[to_sq]), weight))
+        return found
+
+    def choose(self, game, rng=None):
+        """A book move chosen with probability proportional to its weight, or None when out of book.
+
+        rng may be a random.Random or a numpy Generator; only its random() method is used.
+        """
+        found = self.lookup(game)
+        if not found:
+            return None
+        rng = rng or random
+        threshold = rng.random() * sum(weight for _, weight in found)
+        for move, weight in found:
+            threshold -= weight
+            if threshold < 0:
+                return move
+        return found[-1][0]
+
+    def save(self, path):
+        """Write the book as sorted (hash, move, weight) entries"""
+        entries = sorted((key, code, weight) for key, moves in self.entries.items()
+                         for code, weight in moves.items())
+        with open(path, 'wb') as file:
+            file.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(entries)))
+            for key, code, weight in entries:
+                file.write(BOOK_ENTRY.pack(key, code, min(weight, 0xFFFFFFFF)))
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by save()"""
+        book = cls()
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, count = BOOK_HEADER.unpack_from(data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError(f"{path} is not a version {BOOK_VERSION} opening book")
+        for key, code, weight in BOOK_ENTRY.iter_unpack(data[BOOK_HEADER.size:BOOK_HEADER.size
+                                                             + count * BOOK_ENTRY.size]):
+            book.entries.setdefault(key, {})[code] = weight
+        return book
+
+
+def build_book(sources, max_plies=20, result_weights=(3, 2, 1), min_weight=1):
+    """Build an OpeningBook from game files or shard directories (see read_games)"""
+    book = OpeningBook()
+    for source in sources:
+        for fen, moves, result in read_games(source):
+            try:
+                book.add_game(moves, result, fen, max_plies, result_weights)
+            except ValueError:
+                # Unreadable FEN tag
+                continue
+    if min_weight > 1:
+        book.prune(min_weight)
+    return book
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help='book file to write')
+    parser.add_argument('sources', nargs='+', help='PGN files, ICCS move list files or cc_records shard directories')
+    parser.add_argument('--plies', type=int, default=20, help='book depth in plies')
+    parser.add_argument('--min-weight', type=int, default=1, help='drop moves with a smaller total weight')
+    args = parser.parse_args(argv)
+
+    book = build_book(args.sources, args.plies, min_weight=args.min_weight)
+    book.save(args.output)
+    print(f"{args.output}: {len(book)} positions, "
+          f"{sum(len(moves) for moves in book.entries.values())} moves")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,80 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from chinese_chess import ChineseChess
+from chinese_chess import (
+    make_game, LegalMoveCache, COLS, NUM_SQUARES, SQUARE_POS, RAYS, HORSE_MOVES, ADVISOR_MOVES, ELEPHANT_MOVES,
+    ADVISOR_SQUARES, ELEPHANT_SQUARES
+)
+
+
+# 固定动作编码：起点格 * 90 + 终点格，共 90 * 90 = 8100 个动作
+ACTION_SIZE = NUM_SQUARES * NUM_SQUARES
+
+
+def encode_action(from_pos, to_pos):
+    # ((r, c), (r, c)) -> 动作索引
+    return (from_pos[0] * COLS + from_pos[1]) * NUM_SQUARES + to_pos[0] * COLS + to_pos[1]
+
+
+def decode_action(index):
+    # 动作索引 -> ((r, c), (r, c))
+    from_sq, to_sq = divmod(int(index), NUM_SQUARES)
+    return SQUARE_POS[from_sq], SQUARE_POS[to_sq]
+
+
+def _build_compact_actions():
+    # 合法局面中所有几何上可能的着法：同行同列的直线移动（车、炮、帅、兵），
+    # 马步，以及士、象在其能到达的格子（与parse_fen的检查一致）上的斜线着法
+    moves = set()
+    for sq in range(NUM_SQUARES):
+        for ray in RAYS[sq]:
+            moves.update((sq, to_sq) for to_sq in ray)
+        moves.update((sq, to_sq) for to_sq, _ in HORSE_MOVES[sq])
+    for color in range(2):
+        moves.update((sq, to_sq) for sq in ADVISOR_SQUARES[color] for to_sq in ADVISOR_MOVES[color][sq])
+        moves.update((sq, to_sq) for sq in ELEPHANT_SQUARES[color] for to_sq, _ in ELEPHANT_MOVES[color][sq])
+    return sorted(moves)
+
+
+# 紧凑动作编码：2086个几何上可能的着法
+COMPACT_ACTIONS = tuple(
+    (SQUARE_POS[from_sq], SQUARE_POS[to_sq]) for from_sq, to_sq in _build_compact_actions()
+)
+COMPACT_ACTION_SIZE = len(COMPACT_ACTIONS)
+assert COMPACT_ACTION_SIZE == 2086
+# 两种编码之间的转换表，SQUARE_TO_COMPACT中不可能的着法为-1
+COMPACT_TO_SQUARE = np.array([encode_action(*move) for move in COMPACT_ACTIONS], dtype=np.int16)
+SQUARE_TO_COMPACT = np.full(ACTION_SIZE, -1, dtype=np.int16)
+SQUARE_TO_COMPACT[COMPACT_TO_SQUARE] = np.arange(COMPACT_ACTION_SIZE, dtype=np.int16)
+_COMPACT_INDEX = {move: index for index, move in enumerate(COMPACT_ACTIONS)}
+
+
+def encode_compact_action(from_pos, to_pos):
+    # ((r, c), (r, c)) -> 紧凑动作索引
+    return _COMPACT_INDEX[(tuple(from_pos), tuple(to_pos))]
+
+
+def decode_compact_action(index):
+    # 紧凑动作索引 -> ((r, c), (r, c))
+    return COMPACT_ACTIONS[index]
+
+
+# 固定动作编码名称 -> (动作数量, 编码函数, 解码函数)
+ACTION_ENCODINGS = {
+    "square": (ACTION_SIZE, encode_action, decode_action),
+    "compact": (COMPACT_ACTION_SIZE, encode_compact_action, decode_compact_action),
+}
+
+
+# one-hot平面编码：第k个平面表示棋子编码为k+1的棋子（红方帅..兵，黑方将..卒）
+NUM_PIECE_PLANES = 14
+_PLANE_PIECE_IDS = np.arange(1, NUM_PIECE_PLANES + 1, dtype=np.uint8).reshape(NUM_PIECE_PLANES, 1, 1)
+
+
+def encode_planes(boards, out=None):
+    # (..., 10, 9) 的棋子编码 -> (..., 14, 10, 9) 的one-hot平面，没有逐格的Python循环
+    planes = np.equal(np.asarray(boards)[..., np.newaxis, :, :], _PLANE_PIECE_IDS, out=out)
+    return planes if out is not None else planes.view(np.uint8)
 
 
 class ChineseChessEnv(gym.Env):
@@ -11,19 +84,82 @@ class ChineseChessEnv(gym.Env):
         "name": "ChineseChessEnv",
         "description": "A custom environment for playing Chinese Chess.",
     }
-    def __init__(self, render_mode=None):
+    def __init__(self, render_mode=None, action_encoding=None, observation_mode="board",
+                 history_length=0, side_to_move_plane=False, copy_obs=True, shaping_scale=0.0,
+                 backend="array", repetition_limit=3, no_capture_limit=120, tablebase=None,
+                 opening_book=None, book_plies=0, profile_interval=0, move_cache=None):
         super(ChineseChessEnv, self).__init__()
-        self.chess_game = ChineseChess()
+        # backend="bitboard"时车炮走法查表生成（见cc_bitboard）
+        # 同一局面出现repetition_limit次时判和（长将、长捉一方判负），
+        # 连续no_capture_limit步（半回合）无吃子时截断对局；为None时不限制
+        # move_cache为None时不缓存合法着法；为整数时使用该容量的独立缓存；也可传入共享的LegalMoveCache
+        if isinstance(move_cache, int):
+            move_cache = LegalMoveCache(move_cache)
+        self.chess_game = make_game(backend, move_cache=move_cache, repetition_limit=repetition_limit,
+                                    no_capture_limit=no_capture_limit)
         self.render_mode = render_mode
+        # 渲染器只在第一次调用render()时创建，无渲染的训练进程不会加载pygame
+        self.renderer = None
         
-        # 动态动作空间 - 会在每次调用reset()和step()后更新
-        self.action_space = spaces.Discrete(1)  # 初始化为1，之后动态更新
+        # action_encoding为None时使用动态动作空间（动作是valid_actions列表中的索引）；
+        # 为"square"(8100)或"compact"(2086)时使用固定动作空间，合法动作掩码放在info["action_mask"]中
+        self.action_encoding = action_encoding
+        if action_encoding is None:
+            # 动态动作空间 - 会在每次调用reset()和step()后更新
+            self.action_space = spaces.Discrete(1)  # 初始化为1，之后动态更新
+        else:
+            if action_encoding not in ACTION_ENCODINGS:
+                raise ValueError(f"未知的动作编码: {action_encoding}, 可选: {list(ACTION_ENCODINGS)}")
+            action_size, self.encode_action, self.decode_action = ACTION_ENCODINGS[action_encoding]
+            self.action_space = spaces.Discrete(action_size)
+            self.action_mask = np.zeros(action_size, dtype=bool)
         
-        # 观察空间 - 10x9 棋盘，每个位置有14种可能状态（空、红方7种棋子、黑方7种棋子）
-        # 0: 空, 1-7: 红方(帅1,仕2,相3,马4,车5,炮6,兵7), 8-14: 黑方(将8,士9,象10,马11,车12,炮13,卒14)
-        self.observation_space = spaces.Box(
-            low=0, high=14, shape=(10, 9), dtype=np.uint8
-        )
+        # 观察写入预分配的缓冲区；copy_obs=False时直接返回该缓冲区（下一步会被覆盖）
+        self.observation_mode = observation_mode
+        self.history_length = history_length
+        self.side_to_move_plane = side_to_move_plane
+        self.copy_obs = copy_obs
+        if observation_mode == "board":
+            # 观察空间 - 10x9 棋盘，每个位置有14种可能状态（空、红方7种棋子、黑方7种棋子）
+            # 0: 空, 1-7: 红方(帅1,仕2,相3,马4,车5,炮6,兵7), 8-14: 黑方(将8,士9,象10,马11,车12,炮13,卒14)
+            self.observation_space = spaces.Box(
+                low=0, high=14, shape=(10, 9), dtype=np.uint8
+            )
+        elif observation_mode == "planes":
+            # 观察空间 - 当前局面和history_length个历史局面各14个one-hot平面，
+            # 可选再加一个行棋方平面（黑方走棋时全为1）
+            num_planes = NUM_PIECE_PLANES * (1 + history_length) + (1 if side_to_move_plane else 0)
+            self.observation_space = spaces.Box(
+                low=0, high=1, shape=(num_planes, 10, 9), dtype=np.uint8
+            )
+        else:
+            raise ValueError(f"未知的观察模式: {observation_mode}, 可选: ['board', 'planes']")
+        self._obs_buffer = np.zeros(self.observation_space.shape, dtype=np.uint8)
+
+        # shaping_scale>0时，每步奖励加上 shaping_scale * 评估分变化（红方视角，以兵值100为1）
+        self.shaping_scale = shaping_scale
+
+        # 残局库（cc_tablebase.Tablebase或其目录）：局面进入库中的子力组合时直接以准确结果结束对局
+        if isinstance(tablebase, str):
+            from cc_tablebase import Tablebase
+            tablebase = Tablebase(tablebase)
+        self.tablebase = tablebase
+
+        # 开局库（cc_book.OpeningBook或其文件路径）：reset后按权重随机走前book_plies步，增加开局多样性
+        if isinstance(opening_book, str):
+            from cc_book import OpeningBook
+            opening_book = OpeningBook.load(opening_book)
+        self.opening_book = opening_book
+        self.book_plies = book_plies
+
+        # profile_interval>0时开启引擎计时（见cc_profile，进程内全局生效，close()时撤销），
+        # 每profile_interval步把各方法的调用次数和累计耗时放在info["profile"]中
+        self.profile_interval = profile_interval
+        self._profile_steps = 0
+        if profile_interval:
+            import cc_profile
+            cc_profile.enable()
+            self._profiler = cc_profile.PROFILER
         
         # 棋子映射
         self.piece_to_id = {
@@ -38,41 +174,76 @@ class ChineseChessEnv(gym.Env):
         self.state = None
 
     def _get_obs(self):
-        # 将棋盘状态转换为神经网络可用的张量格式
-        board_tensor = np.zeros((10, 9), dtype=np.uint8)
-        
-        for row in range(10):
-            for col in range(9):
-                piece = self.chess_game.board[row][col]
-                if piece is None:
-                    board_tensor[row][col] = self.piece_to_id['empty']
-                else:
-                    piece_id = f"{piece['color']}_{piece['type']}"
-                    board_tensor[row][col] = self.piece_to_id[piece_id]
-                    
-        return board_tensor
+        # 引擎的棋盘本身就是与piece_to_id一致的整数编码，直接从引擎缓冲区写入观察缓冲区
+        game = self.chess_game
+        board = np.frombuffer(game.squares, dtype=np.uint8).reshape(10, 9)
+        obs = self._obs_buffer
+        if self.observation_mode == "board":
+            obs[...] = board
+        else:
+            encode_planes(board, out=obs[:NUM_PIECE_PLANES])
+            if self.history_length:
+                # 历史局面由引擎的悔棋栈倒推得到，一次性编码，不足的部分填0
+                history = b''.join(game.previous_positions(self.history_length))
+                filled = len(history) // NUM_SQUARES
+                if filled:
+                    history_planes = obs[NUM_PIECE_PLANES:NUM_PIECE_PLANES * (1 + filled)]
+                    encode_planes(np.frombuffer(history, dtype=np.uint8).reshape(filled, 10, 9),
+                                  out=history_planes.reshape(filled, NUM_PIECE_PLANES, 10, 9))
+                obs[NUM_PIECE_PLANES * (1 + filled):NUM_PIECE_PLANES * (1 + self.history_length)] = 0
+            if self.side_to_move_plane:
+                obs[-1] = 1 if game.turn == 'black' else 0
+        return obs.copy() if self.copy_obs else obs
     
     def _get_info(self):
         # 返回额外的状态信息
-        return {
+        info = {
             "turn": self.chess_game.turn,
             "in_check": self.chess_game.is_in_check(self.chess_game.turn),
             "game_over": self.chess_game.game_over,
             "winner": self.chess_game.winner,
+            "termination": self.chess_game.termination,
+            # 64位无符号哈希用np.uint64，否则gymnasium向量环境拼接info时会溢出int64
+            "hash": np.uint64(self.chess_game.zobrist_hash),
+            "score": self.chess_game.score,
             "valid_actions": self.valid_actions,
         }
+        if self.action_encoding is not None:
+            info["action_mask"] = self.action_mask.copy()
+        return info
+
+    def _update_action_space(self):
+        # 获取有效动作
+        self.valid_actions = self.chess_game.get_action_space()
+        
+        if self.action_encoding is None:
+            # 更新动态动作空间
+            terminated = self.chess_game.game_over or not self.valid_actions
+            self.action_space = spaces.Discrete(1) if terminated else spaces.Discrete(len(self.valid_actions))
+        else:
+            # 固定动作空间只需更新掩码
+            self.action_mask[:] = False
+            if self.valid_actions and not self.chess_game.game_over:
+                self.action_mask[[self.encode_action(*move) for move in self.valid_actions]] = True
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         
-        # 重置棋盘
-        self.chess_game.reset()
-        
-        # 获取有效动作
-        self.valid_actions = self.chess_game.get_action_space()
+        # 重置棋盘，options={"fen": ...} 时从指定局面开始
+        if options and options.get("fen"):
+            self.chess_game.load_fen(options["fen"])
+        else:
+            self.chess_game.reset()
+
+        # 从开局库走前几步，出库即停止
+        if self.opening_book is not None:
+            for _ in range(self.book_plies):
+                move = self.opening_book.choose(self.chess_game, self.np_random)
+                if move is None or not self.chess_game.make_move(*move) or self.chess_game.game_over:
+                    break
         
-        # 更新动态动作空间
-        self.action_space = spaces.Discrete(len(self.valid_actions))
+        # 获取有效动作，更新动作空间
+        self._update_action_space()
         
         # 获取观察
         observation = self._get_obs()
@@ -81,64 +252,104 @@ class ChineseChessEnv(gym.Env):
         return observation, info
 
     def step(self, action):
-        # action是valid_actions列表中的索引
-        if action >= len(self.valid_actions):
-            raise ValueError(f"无效动作索引: {action}, 有效动作数量: {len(self.valid_actions)}")
-        
-        # 获取动作对应的起始位置和目标位置
-        from_pos, to_pos = self.valid_actions[action]
+        if self.action_encoding is None:
+            # action是valid_actions列表中的索引
+            if action >= len(self.valid_actions):
+                raise ValueError(f"无效动作索引: {action}, 有效动作数量: {len(self.valid_actions)}")
+            
+            # 获取动作对应的起始位置和目标位置
+            from_pos, to_pos = self.valid_actions[action]
+        else:
+            # action是固定编码中的索引，必须是合法动作
+            if not self.action_mask[action]:
+                raise ValueError(f"非法动作: {action} {self.decode_action(action)}")
+            from_pos, to_pos = self.decode_action(action)
         
         # 执行移动
+        score_before = self.chess_game.score
         move_success = self.chess_game.make_move(from_pos, to_pos)
         
         # 如果移动失败（不应该发生，因为我们使用的是有效动作）
         if not move_success:
             print("警告: 选择了有效动作列表中的动作，但移动失败")
+
+        if self.tablebase is not None and not self.chess_game.game_over:
+            self._probe_tablebase()
         
-        # 判断是否终止
-        terminated = self.chess_game.game_over
-        
-        # 截断标志，在这个环境中与终止相同
-        truncated = False
+        # 判断是否终止；无吃子步数达到上限不是真正的对局结果，作为截断返回
+        truncated = self.chess_game.termination == 'move_limit'
+        terminated = self.chess_game.game_over and not truncated
 
         # 获取新的观察
         observation = self._get_obs()
         
-        # 更新有效动作
-        self.valid_actions = self.chess_game.get_action_space()
-        
-        # 更新动态动作空间
+        # 更新有效动作和动作空间
+        self._update_action_space()
         if not terminated:
             assert len(self.valid_actions) > 0, f"{self._get_info()}\n\n{self.chess_game.board_to_string()}"
-        self.action_space = spaces.Discrete(len(self.valid_actions)) if not terminated else spaces.Discrete(1)
         
         # 计算奖励
         reward = 0
-        if self.chess_game.game_over:
+        if self.chess_game.winner is not None:
             reward = 1.0 if self.chess_game.winner == 'red' else -1.0
+        if self.shaping_scale:
+            reward += self.shaping_scale * (self.chess_game.score - score_before) / 100.0
         
         # 额外信息
         info = self._get_info()
+        if self.profile_interval:
+            self._profile_steps += 1
+            if self._profile_steps % self.profile_interval == 0:
+                info["profile"] = self._profiler.snapshot()
         
         return observation, reward, terminated, truncated, info
 
+    def _probe_tablebase(self):
+        # 残局库命中时按库中结果结束对局（结果以行棋方视角给出）
+        game = self.chess_game
+        entry = self.tablebase.probe(game)
+        if entry is None:
+            return
+        result, _ = entry
+        game.game_over = True
+        game.termination = 'tablebase'
+        if result == 'draw':
+            game.winner = None
+        elif result == 'win':
+            game.winner = game.turn
+        else:
+            game.winner = 'red' if game.turn == 'black' else 'black'
+
+    def undo(self):
+        # 撤销上一步（供MCTS等树搜索复用环境），返回撤销后的观察和信息
+        self.chess_game.pop()
+        self._update_action_space()
+        
+        observation = self._get_obs()
+        info = self._get_info()
+        
+        return observation, info
+
     def render(self):
         if self.render_mode == "human":
             # 使用pygame窗口渲染
-            self.chess_game.draw_board()
-            self.chess_game.draw_pieces()
-            self.chess_game.draw_game_status()
-            
-            import pygame
-            pygame.display.flip()
+            if self.renderer is None:
+                from cc_render import ChineseChessRenderer
+                self.renderer = ChineseChessRenderer(self.chess_game)
+            self.renderer.render()
             return None
         
         elif self.render_mode == "rgb_array":
             raise NotImplementedError("RGB array rendering is not implemented yet.")
 
     def close(self):
-        import pygame
-        pygame.quit()
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
+        if self.profile_interval:
+            # 与__init__中的enable()配对；其他环境或调用方仍在计时时不会撤销
+            self._profiler.disable()
+            self.profile_interval = 0
 
 
 def simple_test():
@@ -148,7 +359,7 @@ def simple_test():
         action = env.action_space.sample()
         observation, reward, terminated, truncated, info = env.step(action)
         env.render()
-        if terminated:
+        if terminated or truncated:
             observation, info = env.reset()
     env.close()
 
@@ -0,0 +1,326 @@
+import math
+
+import numpy as np
+
+from chinese_chess import COLS, COLORS, NUM_SQUARES
+from cc_gym import ACTION_ENCODINGS, SQUARE_TO_COMPACT
+
+# 节点数组按需倍增的初始容量
+INITIAL_CAPACITY = 1 << 14
+
+
+def uniform_evaluator(observations, action_masks, turns):
+    """Evaluator with uniform priors over legal actions and a value of 0, for testing"""
+    priors = action_masks.astype(np.float32)
+    return priors, np.zeros(len(action_masks), dtype=np.float32)
+
+
+def board_observation(game):
+    """(10, 9) uint8 piece codes of the position, the "board" observation of ChineseChessEnv"""
+    return np.frombuffer(game.squares, dtype=np.uint8).reshape(10, 9)
+
+
+class MCTS:
+    """PUCT Monte Carlo tree search over a ChineseChess position, guided by a network.
+
+    ``evaluator(observations, action_masks, turns)`` is called once per batch
+    of up to ``batch_size`` leaves with stacked observations (``observation_fn``
+    applied to each leaf, board piece codes by default), their legal-action
+    masks in ``action_encoding`` and the side to move (0 = red, 1 = black).
+    It returns ``(priors, values)``: non-negative priors of shape
+    ``(K, action_size)`` (only legal entries are used, renormalised) and
+    values in [-1, 1] from the side to move's point of view. Virtual loss
+    spreads the leaves of one batch over different lines.
+
+    Nodes live in flat NumPy arrays, one row per node, with the children of
+    a node stored contiguously. ``advance`` keeps the subtree of the move
+    played and compacts it, so consecutive searches reuse earlier visits.
+    """
+
+    def __init__(self, evaluator, action_encoding="compact", c_puct=1.5, batch_size=16, virtual_loss=1.0,
+                 observation_fn=board_observation, dirichlet_alpha=None, noise_fraction=0.25, seed=None):
+        self.evaluator = evaluator
+        self.action_encoding = action_encoding
+        self.action_size = ACTION_ENCODINGS[action_encoding][0]
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.observation_fn = observation_fn
+        # dirichlet_alpha不为None时，在根节点先验上混入Dirichlet噪声（自我对弈探索用）
+        self.dirichlet_alpha = dirichlet_alpha
+        self.noise_fraction = noise_fraction
+        self.rng = np.random.default_rng(seed)
+        self.game = None
+        self._allocate_arrays(INITIAL_CAPACITY)
+
+    def _allocate_arrays(self, capacity):
+        # 每个节点一行：父节点、第一个子节点（-1表示未展开）、子节点数、
+        # 访问次数和价值和（含虚拟损失）、先验、走到该节点的着法和动作编号、
+        # 终局价值（NaN表示非终局）。价值以走到该节点的一方的视角计算
+        self.capacity = capacity
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.visits = np.zeros(capacity, dtype=np.float64)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.from_sq = np.zeros(capacity, dtype=np.int16)
+        self.to_sq = np.zeros(capacity, dtype=np.int16)
+        self.action = np.zeros(capacity, dtype=np.int32)
+        self.terminal_value = np.full(capacity, np.nan, dtype=np.float32)
+        self.size = 0
+
+    _FIELDS = ('parent', 'first_child', 'num_children', 'visits', 'value_sum', 'prior',
+               'from_sq', 'to_sq', 'action', 'terminal_value')
+    _FILL = {'parent': -1, 'first_child': -1, 'terminal_value': np.nan}
+
+    def _new_nodes(self, count):
+        # 分配count个连续节点，容量不足时倍增
+        start = self.size
+        if start + count > self.capacity:
+            capacity = self.capacity
+            while start + count > capacity:
+                capacity *= 2
+            for field in self._FIELDS:
+                old = getattr(self, field)
+                new = np.full(capacity, self._FILL.get(field, 0), dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, field, new)
+            self.capacity = capacity
+        self.size = start + count
+        return start
+
+    def reset(self, game):
+        """Start a new tree at a copy of game"""
+        self.game = game.copy()
+        self._clear_tree()
+
+    def _clear_tree(self):
+        self.size = 0
+        for field in self._FIELDS:
+            getattr(self, field).fill(self._FILL.get(field, 0))
+        self.root = self._new_nodes(1)
+        self._noised = False
+
+    @property
+    def root_visits(self):
+        return int(self.visits[self.root])
+
+    @property
+    def root_value(self):
+        """Mean value of the root from the side to move's point of view"""
+        visits = self.visits[self.root]
+        return -self.value_sum[self.root] / visits if visits else 0.0
+
+    def _action_indices(self, from_sq, to_sq):
+        actions = from_sq * NUM_SQUARES + to_sq
+        if self.action_encoding == "compact":
+            actions = SQUARE_TO_COMPACT[actions]
+        return actions
+
+    def _select_child(self, node):
+        # PUCT: Q + c * P * sqrt(N_parent) / (1 + N)，未访问的子节点Q取0
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        visits = self.visits[start:end]
+        q = np.divide(self.value_sum[start:end], visits, out=np.zeros(end - start), where=visits > 0)
+        u = self.c_puct * math.sqrt(self.visits[node]) * self.prior[start:end] / (1.0 + visits)
+        return start + int(np.argmax(q + u))
+
+    def search(self, num_simulations):
+        """Run num_simulations playouts from the root and return the root visit counts over actions"""
+        if self.game is None:
+            raise RuntimeError("call reset(game) before search()")
+        game = self.game
+        if game.game_over:
+            return self.visit_counts()
+
+        target = self.visits[self.root] + num_simulations
+        virtual_loss = self.virtual_loss
+        while self.visits[self.root] < target:
+            batch_size = int(min(self.batch_size, target - self.visits[self.root]))
+            leaves = []
+            pending = set()
+            for _ in range(batch_size):
+                # 从根节点向下选择，沿途加虚拟损失
+                node = self.root
+                path = [node]
+                hashes = {game._hash}
+                while self.first_child[node] >= 0 and math.isnan(self.terminal_value[node]):
+                    node = self._select_child(node)
+                    game._push(int(self.from_sq[node]), int(self.to_sq[node]))
+                    path.append(node)
+                    hashes.add(game._hash)
+                path = np.array(path)
+                self.visits[path] += virtual_loss
+                self.value_sum[path] -= virtual_loss
+
+                if node in pending:
+                    # 与本批已选中的叶子重复：撤销虚拟损失，先评估已有的叶子
+                    self.visits[path] -= virtual_loss
+                    self.value_sum[path] += virtual_loss
+                    self._unwind(len(path) - 1)
+                    break
+
+                value = self._terminal_value(node, len(hashes) < len(path))
+                if value is not None:
+                    self._backup(path, value)
+                else:
+                    moves = game._legal_actions()
+                    from_sq = np.array([from_row * COLS + from_col for (from_row, from_col), _ in moves],
+                                       dtype=np.int16)
+                    to_sq = np.array([to_row * COLS + to_col for _, (to_row, to_col) in moves], dtype=np.int16)
+                    leaves.append((path, node, from_sq, to_sq, np.array(self.observation_fn(game)),
+                                   COLORS.index(game.turn)))
+                    pending.add(node)
+                self._unwind(len(path) - 1)
+
+            if leaves:
+                self._evaluate(leaves)
+            if self.dirichlet_alpha is not None:
+                self._add_noise()
+        return self.visit_counts()
+
+    def _unwind(self, plies):
+        for _ in range(plies):
+            self.game._pop()
+
+    def _terminal_value(self, node, repeated):
+        # 叶子局面的终局价值（行棋方视角），非终局返回None：
+        # 无合法着法判负，在搜索路径或已走过的对局中重复出现的局面按和棋计
+        value = self.terminal_value[node]
+        if not math.isnan(value):
+            return float(value)
+        game = self.game
+        if repeated or (game._hash in game._last_seen and len(game._undo_stack) > game._history[-1][0]):
+            value = 0.0
+        elif not game.has_legal_move():
+            value = -1.0
+        else:
+            return None
+        self.terminal_value[node] = value
+        return value
+
+    def _evaluate(self, leaves):
+        # 一次调用评估函数，展开所有叶子并回传价值
+        count = len(leaves)
+        observations = np.stack([leaf[4] for leaf in leaves])
+        masks = np.zeros((count, self.action_size), dtype=bool)
+        turns = np.array([leaf[5] for leaf in leaves], dtype=np.int8)
+        actions = [self._action_indices(leaf[2].astype(np.intp), leaf[3].astype(np.intp)) for leaf in leaves]
+        for i, leaf_actions in enumerate(actions):
+            masks[i, leaf_actions] = True
+        priors, values = self.evaluator(observations, masks, turns)
+        priors = np.asarray(priors, dtype=np.float32)
+        values = np.asarray(values, dtype=np.float64).reshape(count)
+
+        for i, (path, node, from_sq, to_sq, _, _) in enumerate(leaves):
+            leaf_actions = actions[i]
+            prior = priors[i, leaf_actions]
+            total = prior.sum()
+            prior = prior / total if total > 0 else np.full(len(prior), 1.0 / len(prior), dtype=np.float32)
+            start = self._new_nodes(len(leaf_actions))
+            end = start + len(leaf_actions)
+            self.parent[start:end] = node
+            self.prior[start:end] = prior
+            self.from_sq[start:end] = from_sq
+            self.to_sq[start:end] = to_sq
+            self.action[start:end] = leaf_actions
+            self.first_child[node] = start
+            self.num_children[node] = len(leaf_actions)
+            self._backup(path, values[i])
+
+    def _backup(self, path, value):
+        # value为叶子行棋方视角；节点价值以走到该节点的一方视角累加，逐层取反，同时撤销虚拟损失
+        signs = np.where(np.arange(len(path))[::-1] % 2 == 0, -1.0, 1.0)
+        self.visits[path] += 1.0 - self.virtual_loss
+        self.value_sum[path] += signs * value + self.virtual_loss
+
+    def _add_noise(self):
+        # 每个根节点只在展开后混入一次噪声
+        root = self.root
+        if self._noised or self.first_child[root] < 0:
+            return
+        start = self.first_child[root]
+        end = start + self.num_children[root]
+        noise = self.rng.dirichlet([self.dirichlet_alpha] * (end - start))
+        self.prior[start:end] = (1 - self.noise_fraction) * self.prior[start:end] + self.noise_fraction * noise
+        self._noised = True
+
+    def visit_counts(self):
+        """Visit counts of the root's children as an (action_size,) array"""
+        counts = np.zeros(self.action_size, dtype=np.float64)
+        start = self.first_child[self.root]
+        if start >= 0:
+            end = start + self.num_children[self.root]
+            counts[self.action[start:end]] = self.visits[start:end]
+        return counts
+
+    def policy(self, temperature=1.0):
+        """Visit-count distribution over actions; temperature 0 puts all mass on the most visited action"""
+        counts = self.visit_counts()
+        if counts.sum() == 0:
+            return counts
+        if temperature == 0:
+            probs = np.zeros_like(counts)
+            probs[np.argmax(counts)] = 1.0
+            return probs
+        counts = counts ** (1.0 / temperature)
+        return counts / counts.sum()
+
+    def select_action(self, temperature=0):
+        """Sample an action from policy(temperature)"""
+        probs = self.policy(temperature)
+        if temperature == 0:
+            return int(np.argmax(probs))
+        return int(self.rng.choice(self.action_size, p=probs))
+
+    def advance(self, action):
+        """Play action on the root position and keep its subtree for the next search"""
+        if self.game is None:
+            raise RuntimeError("call reset(game) before advance()")
+        from_pos, to_pos = ACTION_ENCODINGS[self.action_encoding][2](action)
+        if not self.game.make_move(from_pos, to_pos):
+            raise ValueError(f"illegal action {action}: {from_pos} -> {to_pos}")
+
+        child = -1
+        start = self.first_child[self.root]
+        if start >= 0:
+            end = start + self.num_children[self.root]
+            matches = np.flatnonzero(self.action[start:end] == action)
+            if len(matches):
+                child = start + int(matches[0])
+        if child < 0 or self.game.game_over:
+            self._clear_tree()
+        else:
+            self._compact(child)
+
+    def _compact(self, new_root):
+        # 只保留new_root的子树，按广度优先重新排列，子节点仍然连续存放
+        order = [new_root]
+        new_first = [-1]
+        i = 0
+        while i < len(order):
+            start = self.first_child[order[i]]
+            if start >= 0:
+                new_first[i] = len(order)
+                count = int(self.num_children[order[i]])
+                order.extend(range(start, start + count))
+                new_first.extend([-1] * count)
+            i += 1
+
+        order = np.array(order, dtype=np.intp)
+        new_index = np.full(self.size, -1, dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+        fields = {field: getattr(self, field)[order] for field in self._FIELDS}
+        fields['first_child'] = np.array(new_first, dtype=np.int32)
+        parent = fields['parent']
+        fields['parent'] = np.where(parent >= 0, new_index[parent], -1).astype(np.int32)
+        fields['parent'][0] = -1
+
+        self._clear_tree()
+        self.size = 0
+        self._new_nodes(len(order))
+        for field, values in fields.items():
+            getattr(self, field)[:len(order)] = values
+        self.root = 0
@@ -0,0 +1,159 @@
+"""Opt-in call counts and timings for the engine's hot paths.
+
+``enable()`` wraps the entry points of ChineseChess (and of every subclass,
+such as the bitboard backend) with counting and timing wrappers, and
+``disable()`` puts the original methods back, so a disabled profiler costs
+nothing. Calls are reference counted: the methods are restored once every
+``enable()`` has been matched by a ``disable()``. Times are inclusive wall
+times: ``make_move`` includes the move generation it triggers, and a
+method reached through ``super()`` counts at each level.
+
+    import cc_profile
+    cc_profile.enable()
+    ...  # play games
+    print(cc_profile.prometheus_text())
+"""
+import functools
+import time
+
+from chinese_chess import ChineseChess
+
+# Public entry points and the internal methods they spend their time in
+METHODS = (
+    'make_move', '_play', 'push', 'pop', 'get_action_space', 'get_valid_moves', 'has_legal_move',
+    'is_in_check', 'is_checkmate', 'get_captures', 'static_exchange',
+    '_legal_actions', '_has_legal_move', '_legal_moves_from', '_pseudo_moves', '_is_in_check', '_is_attacked',
+)
+
+# Per piece type move generators
+PIECE_METHODS = {
+    '_general_moves': 'general',
+    '_advisor_moves': 'advisor',
+    '_elephant_moves': 'elephant',
+    '_horse_moves': 'horse',
+    '_chariot_moves': 'chariot',
+    '_cannon_moves': 'cannon',
+    '_soldier_moves': 'soldier',
+}
+
+
+def _subclasses(cls):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _subclasses(subclass)
+
+
+class Profiler:
+    """Call counts and accumulated seconds per engine method and per piece type"""
+
+    def __init__(self):
+        # key -> [calls, seconds]; keys are method names, or piece names for move generation
+        self.methods = {}
+        self.pieces = {}
+        self._patched = []
+        self._users = 0
+
+    @property
+    def enabled(self):
+        return bool(self._patched)
+
+    def _wrap(self, function, counter):
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter[1] += perf_counter() - start
+                counter[0] += 1
+
+        wrapper._profiled = True
+        return wrapper
+
+    def enable(self, base=ChineseChess):
+        """Wrap the methods of base and of all its subclasses defined so far"""
+        self._users += 1
+        if self._patched:
+            return
+        for cls in _subclasses(base):
+            for name in METHODS + tuple(PIECE_METHODS):
+                function = cls.__dict__.get(name)
+                if function is None or getattr(function, '_profiled', False):
+                    continue
+                if name in PIECE_METHODS:
+                    counter = self.pieces.setdefault(PIECE_METHODS[name], [0, 0.0])
+                else:
+                    counter = self.methods.setdefault(name, [0, 0.0])
+                setattr(cls, name, self._wrap(function, counter))
+                self._patched.append((cls, name, function))
+
+    def disable(self):
+        """Drop one enable(), restoring the original methods after the last; the counts are kept"""
+        if self._users == 0:
+            return
+        self._users -= 1
+        if self._users:
+            return
+        for cls, name, function in reversed(self._patched):
+            setattr(cls, name, function)
+        self._patched = []
+
+    def reset(self):
+        """Zero every count without changing whether profiling is enabled"""
+        for counter in list(self.methods.values()) + list(self.pieces.values()):
+            counter[0] = 0
+            counter[1] = 0.0
+
+    def snapshot(self):
+        """{'methods': {name: {'calls', 'seconds'}}, 'pieces': {piece: {'calls', 'seconds'}}}"""
+        return {
+            group: {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in counters.items()}
+            for group, counters in (('methods', self.methods), ('pieces', self.pieces))
+        }
+
+    def prometheus_text(self, prefix='chinese_chess'):
+        """The counters in the Prometheus text exposition format"""
+        lines = []
+        for group, label, counters in (('method', 'method', self.methods),
+                                       ('move_generation', 'piece', self.pieces)):
+            for unit, index, description in (('calls', 0, 'Calls of'), ('seconds', 1, 'Inclusive seconds spent in')):
+                metric = f"{prefix}_{group}_{unit}_total"
+                subject = 'instrumented engine methods' if group == 'method' else 'move generation per piece type'
+                lines.append(f"# HELP {metric} {description} {subject}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, counter in sorted(counters.items()):
+                    lines.append(f'{metric}{{{label}="{name}"}} {counter[index]}')
+        return '\n'.join(lines) + '\n'
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+
+# Process-wide profiler used by the module functions and ChineseChessEnv
+PROFILER = Profiler()
+
+
+def enable(base=ChineseChess):
+    PROFILER.enable(base)
+
+
+def disable():
+    PROFILER.disable()
+
+
+def reset():
+    PROFILER.reset()
+
+
+def snapshot():
+    return PROFILER.snapshot()
+
+
+def prometheus_text(prefix='chinese_chess'):
+    return PROFILER.prometheus_text(prefix)
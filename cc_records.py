@@ -0,0 +1,367 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from chinese_chess import COLORS, NUM_SQUARES, START_FEN, parse_fen
+from cc_gym import ACTION_ENCODINGS, COMPACT_TO_SQUARE, SQUARE_TO_COMPACT
+
+# 分片文件：文件头之后是首尾相接的对局记录，只追加不修改
+SHARD_MAGIC = b'CCTR'
+SHARD_VERSION = 1
+SHARD_HEADER = struct.Struct('<4sH')
+SHARD_PATTERN = 'shard-{:05d}.cctr'
+
+# 对局记录头：记录长度（不含这4字节）、结果、标志位、快照间隔、着法数
+RECORD_HEADER = struct.Struct('<IBBHH')
+FLAG_FEN = 1
+FLAG_POLICY = 2
+FLAG_SNAPSHOTS = 4
+
+# 对局结果编码
+RED_WIN, BLACK_WIN, DRAW, UNFINISHED = range(4)
+RESULTS = {'red': RED_WIN, 'black': BLACK_WIN, 'draw': DRAW, None: UNFINISHED}
+
+_START_SQUARES, _START_TURN, _, _ = parse_fen(START_FEN)
+
+GameRecord = namedtuple('GameRecord', ['fen', 'moves', 'result', 'snapshot_interval', 'has_policy'])
+GameRecord.__doc__ = "One stored game: moves are from_sq * 90 + to_sq (the 'square' action encoding)"
+
+Position = namedtuple('Position', ['squares', 'turn', 'move', 'value', 'game', 'ply'])
+Position.__doc__ = "Position before move ply of game; value is the game result for the side to move (+1 win, -1 loss)"
+
+
+def encode_move(move):
+    """((from_row, from_col), (to_row, to_col)) or an int -> from_sq * 90 + to_sq"""
+    if isinstance(move, (int, np.integer)):
+        return int(move)
+    (from_row, from_col), (to_row, to_col) = move
+    return (from_row * 9 + from_col) * NUM_SQUARES + to_row * 9 + to_col
+
+
+def game_moves(game):
+    """Starting FEN and moves of a ChineseChess game, recovered from its undo stack"""
+    start = game.copy()
+    while start._undo_stack:
+        start._pop()
+    fen = start.to_fen()
+    return (None if fen == START_FEN else fen), [from_sq * NUM_SQUARES + to_sq
+                                                  for from_sq, to_sq, *_ in game._undo_stack]
+
+
+def game_result(game):
+    """Result code of a ChineseChess game (UNFINISHED while it is still going)"""
+    if not game.game_over:
+        return UNFINISHED
+    return RESULTS['draw' if game.winner is None else game.winner]
+
+
+def _replay(squares, moves):
+    # 不检查规则，直接在棋盘字节上重放着法
+    for move in moves:
+        from_sq, to_sq = divmod(int(move), NUM_SQUARES)
+        squares[to_sq] = squares[from_sq]
+        squares[from_sq] = 0
+
+
+class ShardWriter:
+    """Append-only writer of compact binary game records, split into shards in a directory.
+
+    A record holds the starting FEN (omitted for the standard start), the
+    moves as 2-byte ``from_sq * 90 + to_sq`` codes, the result and
+    optionally per-move policy targets, stored sparsely as (action, float16
+    probability) pairs. With ``snapshot_interval`` the board is also saved
+    every that many plies so readers replay at most that many moves. Every
+    writer starts a new shard and moves on to the next one after
+    ``max_shard_bytes``, so existing shards are never modified. Several
+    writers, e.g. one per rollout worker, may share a directory.
+    """
+
+    def __init__(self, directory, max_shard_bytes=256 << 20, snapshot_interval=0, action_encoding="compact"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_shard_bytes = max_shard_bytes
+        self.snapshot_interval = snapshot_interval
+        # 策略目标按此编码传入，统一转换为"square"编码存储
+        self.action_encoding = action_encoding
+        existing = [int(name[6:11]) for name in os.listdir(directory)
+                    if name.startswith('shard-') and name.endswith('.cctr')]
+        self.shard_index = max(existing, default=-1) + 1
+        self.file = None
+        self.games_written = 0
+
+    def _open_shard(self):
+        # 以'xb'创建文件来占用编号，其他写入进程已占用时顺延到下一个编号
+        while True:
+            path = os.path.join(self.directory, SHARD_PATTERN.format(self.shard_index))
+            try:
+                self.file = open(path, 'xb')
+                break
+            except FileExistsError:
+                self.shard_index += 1
+        self.file.write(SHARD_HEADER.pack(SHARD_MAGIC, SHARD_VERSION))
+
+    def write_game(self, moves, result, fen=None, policies=None):
+        """Append one game: moves as ((r, c), (r, c)) tuples or square codes, result a code or 'red'/'black'/'draw'/None.
+
+        policies, if given, holds one (action_size,) array per move in the writer's action encoding.
+        """
+        moves = np.array([encode_move(move) for move in moves], dtype='<u2')
+        if isinstance(result, str) or result is None:
+            result = RESULTS[result]
+        if len(moves) > 0xFFFF:
+            raise ValueError(f"game too long to record: {len(moves)} moves")
+
+        flags = 0
+        parts = []
+        if fen is not None and fen != START_FEN:
+            flags |= FLAG_FEN
+            encoded = fen.encode('ascii')
+            parts.append(struct.pack('<H', len(encoded)) + encoded)
+        parts.append(moves.tobytes())
+
+        interval = self.snapshot_interval
+        if interval and len(moves) > interval:
+            flags |= FLAG_SNAPSHOTS
+            squares = parse_fen(fen)[0] if flags & FLAG_FEN else bytearray(_START_SQUARES)
+            for ply in range(interval, len(moves), interval):
+                _replay(squares, moves[ply - interval:ply])
+                parts.append(bytes(squares))
+        else:
+            interval = 0
+
+        if policies is not None:
+            if len(policies) != len(moves):
+                raise ValueError(f"{len(policies)} policies for {len(moves)} moves")
+            flags |= FLAG_POLICY
+            actions, probs, offsets = [], [], [0]
+            for policy in policies:
+                index = np.flatnonzero(policy)
+                probs.append(np.asarray(policy)[index])
+                if self.action_encoding == "compact":
+                    index = COMPACT_TO_SQUARE[index]
+                actions.append(index)
+                offsets.append(offsets[-1] + len(index))
+            # 每步的起始下标，然后是全部动作和概率，读取任意一步都是O(1)
+            parts.append(np.array(offsets, dtype='<u4').tobytes())
+            parts.append(np.concatenate(actions or [[]]).astype('<u2').tobytes())
+            parts.append(np.concatenate(probs or [[]]).astype('<f2').tobytes())
+
+        payload = b''.join(parts)
+        header = RECORD_HEADER.pack(RECORD_HEADER.size - 4 + len(payload), result, flags, interval, len(moves))
+        if self.file is None:
+            self._open_shard()
+        self.file.write(header + payload)
+        self.games_written += 1
+        if self.file.tell() >= self.max_shard_bytes:
+            self.file.close()
+            self.file = None
+            self.shard_index += 1
+
+    def write_chess_game(self, game, policies=None):
+        """Append a ChineseChess game, moves and result taken from the game itself"""
+        fen, moves = game_moves(game)
+        self.write_game(moves, game_result(game), fen=fen, policies=policies)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.shard_index += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ShardReader:
+    """Random access to the positions of game record shards through memory maps.
+
+    Opening a directory maps every shard and indexes the record headers;
+    moves, snapshots and policies are read from the mapped files on demand,
+    so only the index lives in memory. A record cut short at the end of a
+    shard (e.g. by a crashed writer) is ignored.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        names = sorted(name for name in os.listdir(directory)
+                       if name.startswith('shard-') and name.endswith('.cctr'))
+        self._files = []
+        self._maps = []
+        shards, offsets, counts, results, flags, intervals = [], [], [], [], [], []
+        for name in names:
+            file = open(os.path.join(directory, name), 'rb')
+            size = os.fstat(file.fileno()).st_size
+            if size <= SHARD_HEADER.size:
+                file.close()
+                continue
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version = SHARD_HEADER.unpack_from(buffer, 0)
+            if magic != SHARD_MAGIC or version != SHARD_VERSION:
+                raise ValueError(f"{name} is not a version {SHARD_VERSION} trajectory shard")
+            shard = len(self._maps)
+            self._files.append(file)
+            self._maps.append(buffer)
+
+            offset = SHARD_HEADER.size
+            while offset + RECORD_HEADER.size <= size:
+                length, result, flag, interval, num_moves = RECORD_HEADER.unpack_from(buffer, offset)
+                if offset + 4 + length > size:
+                    break
+                shards.append(shard)
+                offsets.append(offset)
+                counts.append(num_moves)
+                results.append(result)
+                flags.append(flag)
+                intervals.append(interval)
+                offset += 4 + length
+
+        self.shards = np.array(shards, dtype=np.int32)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.num_moves = np.array(counts, dtype=np.int64)
+        self.results = np.array(results, dtype=np.uint8)
+        self.flags = np.array(flags, dtype=np.uint8)
+        self.intervals = np.array(intervals, dtype=np.int64)
+        # 第i局第一个局面的全局下标
+        self.position_starts = np.concatenate([[0], np.cumsum(self.num_moves)])
+
+    @property
+    def num_games(self):
+        return len(self.offsets)
+
+    @property
+    def num_positions(self):
+        return int(self.position_starts[-1])
+
+    def __len__(self):
+        return self.num_positions
+
+    def _sections(self, index):
+        # 第index局的(缓冲区, FEN, 着法数组起点, 快照起点, 策略起点)
+        buffer = self._maps[self.shards[index]]
+        offset = int(self.offsets[index]) + RECORD_HEADER.size
+        fen = None
+        if self.flags[index] & FLAG_FEN:
+            (length,) = struct.unpack_from('<H', buffer, offset)
+            fen = bytes(buffer[offset + 2:offset + 2 + length]).decode('ascii')
+            offset += 2 + length
+        moves_offset = offset
+        offset += 2 * int(self.num_moves[index])
+        snapshots_offset = offset
+        interval = int(self.intervals[index])
+        if interval:
+            offset += NUM_SQUARES * ((int(self.num_moves[index]) - 1) // interval)
+        return buffer, fen, moves_offset, snapshots_offset, offset
+
+    def game(self, index):
+        """GameRecord of game index, with moves viewed straight from the memory map"""
+        buffer, fen, moves_offset, _, _ = self._sections(index)
+        moves = np.frombuffer(buffer, dtype='<u2', count=int(self.num_moves[index]), offset=moves_offset)
+        return GameRecord(fen or START_FEN, moves, int(self.results[index]), int(self.intervals[index]),
+                          bool(self.flags[index] & FLAG_POLICY))
+
+    def _locate(self, position):
+        if not 0 <= position < self.num_positions:
+            raise IndexError(f"position {position} out of range")
+        index = int(np.searchsorted(self.position_starts, position, side='right')) - 1
+        return index, position - int(self.position_starts[index])
+
+    def position(self, position):
+        """Position by global index over all games, rebuilt from the nearest snapshot"""
+        index, ply = self._locate(position)
+        buffer, fen, moves_offset, snapshots_offset, _ = self._sections(index)
+        moves = np.frombuffer(buffer, dtype='<u2', count=int(self.num_moves[index]), offset=moves_offset)
+        if fen is None:
+            squares, turn = bytearray(_START_SQUARES), _START_TURN
+        else:
+            squares, turn, _, _ = parse_fen(fen)
+
+        start = 0
+        interval = int(self.intervals[index])
+        if interval and ply >= interval:
+            start = ply // interval * interval
+            snapshot = snapshots_offset + NUM_SQUARES * (start // interval - 1)
+            squares = bytearray(buffer[snapshot:snapshot + NUM_SQUARES])
+        _replay(squares, moves[start:ply])
+
+        color = (COLORS.index(turn) + ply) % 2
+        result = int(self.results[index])
+        value = 1.0 if result == color else -1.0 if result in (RED_WIN, BLACK_WIN) else 0.0
+        return Position(np.frombuffer(bytes(squares), dtype=np.uint8), color, int(moves[ply]), value, index, ply)
+
+    def policy(self, position, action_encoding="compact"):
+        """Stored policy target of a position as a dense array, or None if its game has none"""
+        index, ply = self._locate(position)
+        if not self.flags[index] & FLAG_POLICY:
+            return None
+        buffer, _, _, _, offset = self._sections(index)
+        num_moves = int(self.num_moves[index])
+        begin, end = np.frombuffer(buffer, dtype='<u4', count=2, offset=offset + 4 * ply)
+        total = int(np.frombuffer(buffer, dtype='<u4', count=1, offset=offset + 4 * num_moves)[0])
+        actions_offset = offset + 4 * (num_moves + 1)
+        probs_offset = actions_offset + 2 * total
+        actions = np.frombuffer(buffer, dtype='<u2', count=int(end - begin), offset=actions_offset + 2 * int(begin))
+        probs = np.frombuffer(buffer, dtype='<f2', count=int(end - begin), offset=probs_offset + 2 * int(begin))
+        if action_encoding == "compact":
+            actions = SQUARE_TO_COMPACT[actions]
+        dense = np.zeros(ACTION_ENCODINGS[action_encoding][0], dtype=np.float32)
+        dense[actions] = probs
+        return dense
+
+    def sample(self, batch_size, rng=None, action_encoding="compact"):
+        """Uniformly sample a training batch of positions.
+
+        Returns observation (B, 10, 9), turn, action (played move in
+        action_encoding), value and policy (B, action_size); positions whose
+        game has no stored policy get the played move as a one-hot target.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        indices = rng.integers(0, self.num_positions, size=batch_size)
+        action_size = ACTION_ENCODINGS[action_encoding][0]
+        batch = {
+            'observation': np.zeros((batch_size, 10, 9), dtype=np.uint8),
+            'turn': np.zeros(batch_size, dtype=np.int8),
+            'action': np.zeros(batch_size, dtype=np.int64),
+            'value': np.zeros(batch_size, dtype=np.float32),
+            'policy': np.zeros((batch_size, action_size), dtype=np.float32),
+        }
+        for i, position in enumerate(indices):
+            record = self.position(int(position))
+            action = record.move if action_encoding == "square" else int(SQUARE_TO_COMPACT[record.move])
+            batch['observation'][i] = record.squares.reshape(10, 9)
+            batch['turn'][i] = record.turn
+            batch['action'][i] = action
+            batch['value'][i] = record.value
+            policy = self.policy(int(position), action_encoding)
+            if policy is None:
+                batch['policy'][i, action] = 1.0
+            else:
+                batch['policy'][i] = policy
+        return batch
+
+    def close(self):
+        for buffer in self._maps:
+            try:
+                buffer.close()
+            except BufferError:
+                # 仍有数组引用着映射（如game()返回的着法），由垃圾回收在其释放后关闭
+                pass
+        for file in self._files:
+            file.close()
+        self._maps = []
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,301 @@
+import pygame
+
+from chinese_chess import ChineseChess
+
+
+class ChineseChessRenderer:
+    def __init__(self, game, window_size=(400, 450), board_margin=50):
+        pygame.init()
+
+        # Game being displayed
+        self.game = game
+        self.selected_piece = None
+
+        # Board configuration
+        self.window_size = window_size
+        self.board_margin = board_margin
+        self.board_width = window_size[0] - 2 * board_margin
+        self.board_height = window_size[0] - 2 * board_margin  # Square board area
+        self.cell_size = self.board_width / 8
+
+        # Screen setup
+        self.screen = pygame.display.set_mode(window_size)
+        pygame.display.set_caption("Chinese Chess")
+
+        # Colors
+        self.BACKGROUND_COLOR = (240, 217, 181)
+        self.LINE_COLOR = (0, 0, 0)
+        self.RED_COLOR = (200, 0, 0)
+        self.BLACK_COLOR = (0, 0, 0)
+        self.HIGHLIGHT_COLOR = (0, 255, 0, 128)
+        self.MOVE_HINT_COLOR = (0, 0, 255, 128)
+
+        # Load assets or set up piece representations
+        self.setup_pieces()
+
+        # Font for rendering text
+        self.font = pygame.font.SysFont('simsun', 24)
+        self.small_font = pygame.font.SysFont('simsun', 16)
+
+    def setup_pieces(self):
+        """Set up piece representations - using simple Unicode characters"""
+        self.pieces = {
+            'red': {
+                'general': '帅',
+                'advisor': '仕',
+                'elephant': '相',
+                'horse': '马',
+                'chariot': '车',
+                'cannon': '炮',
+                'soldier': '兵'
+            },
+            'black': {
+                'general': '将',
+                'advisor': '士',
+                'elephant': '象',
+                'horse': '马',
+                'chariot': '车',
+                'cannon': '炮',
+                'soldier': '卒'
+            }
+        }
+
+    def draw_board(self):
+        """Draw the Chinese Chess board"""
+        # Fill background
+        self.screen.fill(self.BACKGROUND_COLOR)
+
+        # Draw board area
+        board_rect = pygame.Rect(
+            self.board_margin,
+            self.board_margin,
+            self.board_width,
+            self.board_height + self.cell_size
+        )
+        pygame.draw.rect(self.screen, (220, 179, 92), board_rect)
+
+        # Draw grid lines
+        for i in range(10):  # Horizontal lines
+            y = self.board_margin + i * self.cell_size
+            pygame.draw.line(
+                self.screen,
+                self.LINE_COLOR,
+                (self.board_margin, y),
+                (self.board_margin + self.board_width, y),
+                2
+            )
+
+        for i in range(9):  # Vertical lines
+            x = self.board_margin + i * self.cell_size
+            # Top half
+            pygame.draw.line(
+                self.screen,
+                self.LINE_COLOR,
+                (x, self.board_margin),
+                (x, self.board_margin + 4 * self.cell_size),
+                2
+            )
+            # Bottom half
+            pygame.draw.line(
+                self.screen,
+                self.LINE_COLOR,
+                (x, self.board_margin + 5 * self.cell_size),
+                (x, self.board_margin + 9 * self.cell_size),
+                2
+            )
+
+        # Draw palace diagonal lines
+        # Black palace
+        pygame.draw.line(
+            self.screen,
+            self.LINE_COLOR,
+            (self.board_margin + 3 * self.cell_size, self.board_margin),
+            (self.board_margin + 5 * self.cell_size, self.board_margin + 2 * self.cell_size),
+            2
+        )
+        pygame.draw.line(
+            self.screen,
+            self.LINE_COLOR,
+            (self.board_margin + 5 * self.cell_size, self.board_margin),
+            (self.board_margin + 3 * self.cell_size, self.board_margin + 2 * self.cell_size),
+            2
+        )
+
+        # Red palace
+        pygame.draw.line(
+            self.screen,
+            self.LINE_COLOR,
+            (self.board_margin + 3 * self.cell_size, self.board_margin + 7 * self.cell_size),
+            (self.board_margin + 5 * self.cell_size, self.board_margin + 9 * self.cell_size),
+            2
+        )
+        pygame.draw.line(
+            self.screen,
+            self.LINE_COLOR,
+            (self.board_margin + 5 * self.cell_size, self.board_margin + 7 * self.cell_size),
+            (self.board_margin + 3 * self.cell_size, self.board_margin + 9 * self.cell_size),
+            2
+        )
+
+        # Draw river text
+        river_text = self.font.render("楚 河        汉 界", True, self.LINE_COLOR)
+        text_rect = river_text.get_rect(center=(self.window_size[0] // 2, self.board_margin + 4.5 * self.cell_size))
+        self.screen.blit(river_text, text_rect)
+
+    def draw_pieces(self):
+        """Draw all pieces on the board"""
+        board = self.game.board
+        for row in range(10):
+            for col in range(9):
+                piece = board[row][col]
+                if piece:
+                    # Calculate position
+                    x = self.board_margin + col * self.cell_size
+                    y = self.board_margin + row * self.cell_size
+
+                    # Draw piece background
+                    pygame.draw.circle(
+                        self.screen,
+                        (230, 200, 140),
+                        (x, y),
+                        self.cell_size // 2 - 4
+                    )
+                    pygame.draw.circle(
+                        self.screen,
+                        self.RED_COLOR if piece['color'] == 'red' else self.BLACK_COLOR,
+                        (x, y),
+                        self.cell_size // 2 - 4,
+                        2
+                    )
+
+                    # Draw piece text
+                    piece_text = self.pieces[piece['color']][piece['type']]
+                    text_surface = self.font.render(
+                        piece_text,
+                        True,
+                        self.RED_COLOR if piece['color'] == 'red' else self.BLACK_COLOR
+                    )
+                    text_rect = text_surface.get_rect(center=(x, y))
+                    self.screen.blit(text_surface, text_rect)
+
+                    # Highlight selected piece
+                    if self.selected_piece and self.selected_piece == (row, col):
+                        highlight_surface = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
+                        highlight_surface.fill((0, 255, 0, 80))
+                        self.screen.blit(
+                            highlight_surface,
+                            (x - self.cell_size // 2, y - self.cell_size // 2)
+                        )
+
+    def draw_valid_moves(self, moves):
+        """Draw indicators for valid moves"""
+        for row, col in moves:
+            x = self.board_margin + col * self.cell_size
+            y = self.board_margin + row * self.cell_size
+
+            # Draw move hint
+            pygame.draw.circle(
+                self.screen,
+                (0, 0, 255, 128),
+                (x, y),
+                self.cell_size // 6
+            )
+
+    def draw_game_status(self):
+        """Draw game status information"""
+        game = self.game
+        # Draw whose turn it is
+        turn_text = f"{len(game.move_history)} rounds\nTurn: {'Red' if game.turn == 'red' else 'Black'}"
+        text_surface = self.small_font.render(turn_text, True, self.LINE_COLOR)
+        self.screen.blit(text_surface, (10, 10))
+
+        # Draw game over message if applicable
+        if game.game_over:
+            msg = "Game Over! Draw!" if game.winner is None else f"Game Over! {game.winner.capitalize()} wins!"
+            text_surface = self.font.render(msg, True, self.RED_COLOR if game.winner == 'red' else self.BLACK_COLOR)
+            text_rect = text_surface.get_rect(center=(self.window_size[0] // 2, self.window_size[1] - 40))
+            self.screen.blit(text_surface, text_rect)
+
+    def handle_click(self, pos):
+        """Handle mouse click at the given position"""
+        game = self.game
+        if game.game_over:
+            return
+
+        # Convert screen position to board coordinates
+        x, y = pos
+        col = round((x - self.board_margin) / self.cell_size)
+        row = round((y - self.board_margin) / self.cell_size)
+
+        # Check if click is on the board
+        if not (0 <= row < 10 and 0 <= col < 9):
+            return
+
+        # If a piece is already selected
+        if self.selected_piece:
+            selected_row, selected_col = self.selected_piece
+
+            # If clicking on the same piece, deselect it
+            if (row, col) == (selected_row, selected_col):
+                self.selected_piece = None
+                return
+
+            # If clicking on a valid move, make the move
+            valid_moves = game.get_valid_moves(selected_row, selected_col)
+            if (row, col) in valid_moves:
+                game.make_move((selected_row, selected_col), (row, col))
+                self.selected_piece = None
+                return
+
+            # If clicking on another piece of the same color, select that piece instead
+            piece_at_click = game.board[row][col]
+            if piece_at_click and piece_at_click['color'] == game.turn:
+                self.selected_piece = (row, col)
+                return
+
+            # Otherwise, deselect
+            self.selected_piece = None
+        else:
+            # Select a piece if it belongs to the current player
+            piece = game.board[row][col]
+            if piece and piece['color'] == game.turn:
+                self.selected_piece = (row, col)
+
+    def render(self):
+        """Draw the current position and flip the display"""
+        self.draw_board()
+        self.draw_pieces()
+        if self.selected_piece:
+            valid_moves = self.game.get_valid_moves(*self.selected_piece)
+            self.draw_valid_moves(valid_moves)
+        self.draw_game_status()
+
+        pygame.display.flip()
+
+    def close(self):
+        pygame.quit()
+
+
+def main():
+    game = ChineseChess()
+    renderer = ChineseChessRenderer(game)
+
+    # Main game loop
+    running = True
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  # Left click
+                    renderer.handle_click(event.pos)
+
+        # Draw everything
+        renderer.render()
+
+    renderer.close()
+
+
+if __name__ == "__main__":
+    main()
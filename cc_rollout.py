@@ -0,0 +1,194 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from cc_gym import ChineseChessEnv
+
+
+def random_policy(observation, action_mask, turn):
+    """Pick a uniformly random legal action"""
+    return np.random.choice(np.flatnonzero(action_mask))
+
+
+class _RingBuffer:
+    """Fixed-capacity trajectory arrays laid out in one shared-memory block"""
+
+    def __init__(self, capacity, obs_shape, action_size, name=None):
+        self.capacity = capacity
+        self.fields = (
+            ('observation', np.uint8, (capacity,) + tuple(obs_shape)),
+            ('action', np.int32, (capacity,)),
+            ('action_mask', np.bool_, (capacity, action_size)),
+            ('reward', np.float32, (capacity,)),
+            ('terminated', np.bool_, (capacity,)),
+            ('truncated', np.bool_, (capacity,)),
+            ('turn', np.int8, (capacity,)),
+            ('episode', np.int64, (capacity,)),
+        )
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in self.fields)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.arrays = {}
+        offset = 0
+        for field, dtype, shape in self.fields:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            self.arrays[field] = array
+            offset += array.nbytes
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+
+
+def _worker(worker_id, ring_spec, counters_name, num_workers, policies, env_kwargs, seed, stop_event):
+    # 每个工作进程独占一个环形缓冲区：只有它写入数据和写计数，主进程只写读计数
+    np.random.seed(seed)
+    ring = _RingBuffer(*ring_spec)
+    counters_shm = shared_memory.SharedMemory(name=counters_name)
+    counters = np.ndarray((num_workers, 2), dtype=np.int64, buffer=counters_shm.buf)
+    arrays = ring.arrays
+    capacity = ring.capacity
+
+    env = ChineseChessEnv(copy_obs=False, **env_kwargs)
+    observation, info = env.reset(seed=seed)
+    episode = 0
+    written = 0
+    try:
+        while not stop_event.is_set():
+            # 缓冲区满时等待主进程读取
+            if written - counters[worker_id, 1] >= capacity:
+                time.sleep(0.0005)
+                continue
+
+            turn = info["turn"]
+            policy = policies[0] if turn == 'red' else policies[1]
+            action_mask = info["action_mask"]
+            action = int(policy(observation, action_mask, turn))
+
+            slot = written % capacity
+            arrays['observation'][slot] = observation
+            arrays['action_mask'][slot] = action_mask
+            arrays['action'][slot] = action
+            arrays['turn'][slot] = 0 if turn == 'red' else 1
+            arrays['episode'][slot] = episode
+
+            observation, reward, terminated, truncated, info = env.step(action)
+            arrays['reward'][slot] = reward
+            arrays['terminated'][slot] = terminated
+            arrays['truncated'][slot] = truncated
+
+            # 数据写完之后再发布写计数
+            written += 1
+            counters[worker_id, 0] = written
+
+            if terminated or truncated:
+                observation, info = env.reset()
+                episode += 1
+    finally:
+        del arrays, counters
+        ring.close()
+        counters_shm.close()
+
+
+class RolloutPool:
+    """Self-play workers writing trajectories into shared-memory ring buffers.
+
+    Each worker process plays ``ChineseChessEnv`` games with a fixed action
+    encoding, choosing moves with ``policy(observation, action_mask, turn)``.
+    ``policy`` is one callable for both sides or a ``(red, black)`` pair, and
+    must be picklable when the start method is not ``fork``. Transitions go
+    straight into per-worker ring buffers in shared memory; ``collect`` copies
+    out whatever has been produced since the last call.
+    """
+
+    def __init__(self, num_workers, policy=random_policy, capacity=4096, action_encoding="compact",
+                 observation_mode="board", env_kwargs=None, seed=0, start_method=None):
+        self.num_workers = num_workers
+        policies = tuple(policy) if isinstance(policy, (tuple, list)) else (policy, policy)
+        env_kwargs = dict(env_kwargs or {}, action_encoding=action_encoding, observation_mode=observation_mode)
+
+        # 用一个环境确定观察和动作的形状
+        probe = ChineseChessEnv(**env_kwargs)
+        obs_shape = probe.observation_space.shape
+        action_size = probe.action_space.n
+
+        self.rings = [_RingBuffer(capacity, obs_shape, action_size) for _ in range(num_workers)]
+        self._counters_shm = shared_memory.SharedMemory(create=True, size=num_workers * 2 * 8)
+        # 每个工作进程一行：[已写入的步数, 已读取的步数]
+        self.counters = np.ndarray((num_workers, 2), dtype=np.int64, buffer=self._counters_shm.buf)
+        self.counters[:] = 0
+
+        ctx = mp.get_context(start_method)
+        self._stop_event = ctx.Event()
+        self.workers = []
+        for worker_id, ring in enumerate(self.rings):
+            ring_spec = (capacity, obs_shape, action_size, ring.shm.name)
+            process = ctx.Process(
+                target=_worker,
+                args=(worker_id, ring_spec, self._counters_shm.name, num_workers, policies,
+                      env_kwargs, seed + worker_id, self._stop_event),
+                daemon=True,
+            )
+            process.start()
+            self.workers.append(process)
+
+    def collect(self, min_steps=1, timeout=None):
+        """Return all transitions produced so far, waiting for at least min_steps.
+
+        The result maps field names to arrays concatenated over workers, plus
+        a ``worker`` array. Within one worker, transitions are in play order
+        and ``episode`` numbers increase.
+        """
+        # 缓冲区总容量之外的步数永远等不到
+        min_steps = min(min_steps, sum(ring.capacity for ring in self.rings))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while int((self.counters[:, 0] - self.counters[:, 1]).sum()) < min_steps:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            if not any(process.is_alive() for process in self.workers):
+                raise RuntimeError("所有工作进程都已退出")
+            time.sleep(0.001)
+
+        chunks = {field: [] for field, _, _ in self.rings[0].fields}
+        chunks['worker'] = []
+        for worker_id, ring in enumerate(self.rings):
+            written = int(self.counters[worker_id, 0])
+            read = int(self.counters[worker_id, 1])
+            if written == read:
+                continue
+            # 环形缓冲区中 [read, written) 的位置，可能跨越末尾
+            slots = np.arange(read, written) % ring.capacity
+            for field, array in ring.arrays.items():
+                chunks[field].append(array[slots])
+            chunks['worker'].append(np.full(written - read, worker_id, dtype=np.int32))
+            self.counters[worker_id, 1] = written
+
+        empty = dict(self.rings[0].arrays, worker=np.zeros(0, dtype=np.int32))
+        return {
+            field: np.concatenate(parts) if parts else empty[field][:0].copy()
+            for field, parts in chunks.items()
+        }
+
+    def close(self):
+        self._stop_event.set()
+        for process in self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.rings:
+            ring.close()
+            ring.shm.unlink()
+        self.counters = None
+        self._counters_shm.close()
+        self._counters_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,326 @@
+import time
+from collections import namedtuple
+
+from chinese_chess import CODE_COLOR, CODE_VALUES, COLORS, EMPTY, NUM_SQUARES, SQUARE_POS
+
+INFINITY = 1000000
+MATE_SCORE = 100000
+# Scores beyond this are mates, stored in the transposition table relative to the node
+MATE_BOUND = MATE_SCORE - 1000
+MAX_PLY = 128
+
+# Transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SearchLimit = namedtuple('SearchLimit', ['depth', 'nodes', 'time'], defaults=(None, None, None))
+SearchLimit.__doc__ = "Stop at the first of max depth, node count or seconds; all None searches to MAX_PLY"
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'time', 'pv'])
+SearchResult.__doc__ = "Best move ((from_row, from_col), (to_row, to_col)), its score for the side to move and stats"
+
+
+def evaluate(game):
+    """Incremental material and piece-square score from the point of view of the side to move"""
+    return game._score if game.turn == 'red' else -game._score
+
+
+class _SearchAborted(Exception):
+    pass
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results indexed by Zobrist hash.
+
+    An entry is replaced by a search of equal or greater depth, or by any
+    result from a newer search.
+    """
+
+    def __init__(self, size_log2=20):
+        self.mask = (1 << size_log2) - 1
+        self.entries = [None] * (self.mask + 1)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * (self.mask + 1)
+        self.generation = 0
+
+    def probe(self, key):
+        """Return (depth, bound, score, move) stored for key, or None"""
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            # Keep the old best move when a shallower bound without one replaces the entry
+            if move is None and entry is not None and entry[0] == key:
+                move = entry[4]
+            self.entries[index] = (key, depth, bound, score, move, self.generation)
+
+
+class Searcher:
+    """Negamax alpha-beta with iterative deepening over a ChineseChess position.
+
+    Leaves are resolved by a quiescence search over captures that do not
+    lose material by static exchange evaluation. Moves are ordered by
+    transposition table move, captures by MVV-LVA, two killer moves per ply,
+    then the history heuristic. The searcher keeps its transposition table
+    and history between calls so it can be reused move after move.
+    """
+
+    def __init__(self, tt_size_log2=20, evaluate=evaluate):
+        self.tt = TranspositionTable(tt_size_log2)
+        self.evaluate = evaluate
+        self.history = [0] * (NUM_SQUARES * NUM_SQUARES)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.nodes = 0
+
+    def search(self, position, limit=None):
+        """Search position and return a SearchResult; position itself is left untouched"""
+        if limit is None:
+            limit = SearchLimit(depth=4)
+        elif isinstance(limit, (int, float)):
+            limit = SearchLimit(time=limit)
+
+        game = position.copy()
+        game.move_cache = None
+        self.game = game
+        self.tt.new_search()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [value // 8 for value in self.history]
+        self.nodes = 0
+        self.max_nodes = limit.nodes
+        start = time.perf_counter()
+        self.deadline = None if limit.time is None else start + limit.time
+        self._can_abort = False
+
+        max_depth = min(limit.depth or MAX_PLY, MAX_PLY)
+        root_ply = len(game._undo_stack)
+        result = SearchResult(None, 0, 0, 0, 0.0, [])
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self._search(depth, -INFINITY, INFINITY, 0)
+            except _SearchAborted:
+                while len(game._undo_stack) > root_ply:
+                    game._pop()
+                break
+            pv = self._principal_variation(depth)
+            elapsed = time.perf_counter() - start
+            result = SearchResult(pv[0] if pv else None, score, depth, self.nodes, elapsed, pv)
+            # Depth 1 always completes so there is a move to return
+            self._can_abort = True
+            if not pv or abs(score) >= MATE_BOUND:
+                break
+        return result._replace(nodes=self.nodes, time=time.perf_counter() - start)
+
+    def _check_limits(self):
+        if not self._can_abort:
+            return
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise _SearchAborted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise _SearchAborted
+
+    def _principal_variation(self, depth):
+        """Follow best moves through the transposition table"""
+        game = self.game
+        pv = []
+        seen = set()
+        while len(pv) < depth:
+            entry = self.tt.probe(game._hash)
+            if entry is None or entry[3] is None or game._hash in seen:
+                break
+            seen.add(game._hash)
+            from_sq, to_sq = entry[3]
+            pv.append((SQUARE_POS[from_sq], SQUARE_POS[to_sq]))
+            game._push(from_sq, to_sq)
+        for _ in pv:
+            game._pop()
+        return pv
+
+    def _ordered_moves(self, tt_move, ply):
+        """Pseudo-legal (from_sq, to_sq) moves of the side to move, best first"""
+        game = self.game
+        squares = game.squares
+        color = COLORS.index(game.turn)
+        killers = self.killers[ply]
+        history = self.history
+        scored = []
+        for from_sq in range(NUM_SQUARES):
+            piece = squares[from_sq]
+            if CODE_COLOR[piece] != color:
+                continue
+            attacker = CODE_VALUES[piece]
+            for to_sq in game._pseudo_moves(from_sq):
+                move = (from_sq, to_sq)
+                victim = squares[to_sq]
+                if move == tt_move:
+                    key = 1 << 40
+                elif victim != EMPTY:
+                    # Most valuable victim first, then least valuable attacker
+                    key = (1 << 30) + CODE_VALUES[victim] * 16 - attacker // 100
+                elif move == killers[0]:
+                    key = (1 << 29) + 1
+                elif move == killers[1]:
+                    key = 1 << 29
+                else:
+                    key = history[from_sq * NUM_SQUARES + to_sq]
+                scored.append((key, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _quiesce(self, alpha, beta, ply):
+        """Resolve captures (and check evasions) until the position is quiet"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+
+        game = self.game
+        color = COLORS.index(game.turn)
+        if ply >= MAX_PLY - 1:
+            return self.evaluate(game)
+
+        in_check = game._is_in_check(color)
+        if in_check:
+            # Standing pat is not an option in check: try every evasion
+            moves = self._ordered_moves(None, ply)
+            best_score = -INFINITY
+        else:
+            best_score = self.evaluate(game)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            squares = game.squares
+            captures = []
+            for from_sq, to_sq in game._captures(color):
+                # Skip captures that lose material in the exchange
+                if CODE_VALUES[squares[to_sq]] < CODE_VALUES[squares[from_sq]] and game._see(from_sq, to_sq) < 0:
+                    continue
+                captures.append((CODE_VALUES[squares[to_sq]] * 16 - CODE_VALUES[squares[from_sq]] // 100,
+                                 (from_sq, to_sq)))
+            captures.sort(reverse=True)
+            moves = [move for _, move in captures]
+
+        for from_sq, to_sq in moves:
+            game._push(from_sq, to_sq)
+            if game._is_in_check(color):
+                game._pop()
+                continue
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            game._pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if in_check and best_score == -INFINITY:
+            return -MATE_SCORE + ply
+        return best_score
+
+    def _search(self, depth, alpha, beta, ply):
+        if depth <= 0:
+            return self._quiesce(alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_limits()
+
+        game = self.game
+        if ply >= MAX_PLY - 1:
+            return self.evaluate(game)
+
+        key = game._hash
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, bound, tt_score, tt_move = entry
+            if tt_depth >= depth and ply > 0:
+                tt_score = _score_from_tt(tt_score, ply)
+                if bound == EXACT:
+                    return tt_score
+                if bound == LOWER and tt_score >= beta:
+                    return tt_score
+                if bound == UPPER and tt_score <= alpha:
+                    return tt_score
+
+        color = COLORS.index(game.turn)
+        squares = game.squares
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._ordered_moves(tt_move, ply):
+            from_sq, to_sq = move
+            captured = squares[to_sq]
+            game._push(from_sq, to_sq)
+            if game._is_in_check(color):
+                game._pop()
+                continue
+            score = -self._search(depth - 1, -beta, -alpha, ply + 1)
+            game._pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if captured == EMPTY:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[from_sq * NUM_SQUARES + to_sq] += depth * depth
+                        break
+
+        if best_move is None:
+            # No legal move: checkmate or stalemate, both lost in Xiangqi
+            return -MATE_SCORE + ply
+
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.tt.store(key, depth, bound, _score_to_tt(best_score, ply), best_move)
+        return best_score
+
+
+def _score_to_tt(score, ply):
+    # Mate scores are stored as distance from this node rather than from the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def best_move(position, limit=None, searcher=None, book=None):
+    """Best move for the side to move as ((from_row, from_col), (to_row, to_col)), or None if there is none.
+
+    limit is a SearchLimit, or a number of seconds; the default searches to depth 4.
+    With a cc_book.OpeningBook, a book move is returned without searching.
+    """
+    if book is not None:
+        move = book.choose(position)
+        if move is not None:
+            return move
+    searcher = searcher or Searcher()
+    return searcher.search(position, limit).move
@@ -0,0 +1,367 @@
+"""Endgame tablebases for small material sets, built by retrograde analysis.
+
+A table covers one material signature such as ``KRvK`` (red pieces, then
+black, in FEN letters) and stores, for every placement of those pieces and
+both sides to move, whether the side to move wins, loses or draws and the
+number of plies to mate. Tables are written as ``<signature>.cctb`` files
+and memory-mapped when probed, so a probe costs one array lookup.
+
+Values follow the basic rules only: the side without a legal move loses;
+repetition and perpetual check/chase adjudication is not modelled.
+"""
+import argparse
+import itertools
+import os
+import struct
+import sys
+import time
+from array import array
+
+import numpy as np
+
+from chinese_chess import (
+    ADVISOR, ADVISOR_SQUARES, BLACK_OFFSET, CODE_COLOR, CODE_TYPE, COLORS, COLS, ELEPHANT, ELEPHANT_SQUARES,
+    EMPTY, FEN_CHARS, GENERAL, NUM_SQUARES, PIECE_VALUES, ROWS, SOLDIER, SOLDIER_SQUARES, SQUARE_POS,
+    ChineseChess, _in_palace,
+)
+
+TABLE_MAGIC = b'CCTB'
+TABLE_VERSION = 1
+TABLE_HEADER = struct.Struct('<4sHB15sI')
+
+# Stored code per position: result in the top two bits, plies to mate below
+DRAW, WIN, LOSS = 0, 1, 2
+RESULT_NAMES = ('draw', 'win', 'loss')
+DTM_BITS = 14
+DTM_MASK = (1 << DTM_BITS) - 1
+
+
+def _piece_squares(color, piece_type):
+    """Sorted squares a piece of the given color and type can ever stand on"""
+    if piece_type == GENERAL:
+        squares = {sq for sq in range(NUM_SQUARES) if _in_palace(*SQUARE_POS[sq], color)}
+    elif piece_type == ADVISOR:
+        squares = ADVISOR_SQUARES[color]
+    elif piece_type == ELEPHANT:
+        squares = ELEPHANT_SQUARES[color]
+    elif piece_type == SOLDIER:
+        squares = SOLDIER_SQUARES[color]
+    else:
+        squares = range(NUM_SQUARES)
+    return tuple(sorted(squares))
+
+
+def _side_string(types):
+    return ''.join(FEN_CHARS[piece_type].upper() for piece_type in sorted(types))
+
+
+def parse_signature(signature):
+    """'KRvKA' -> ((red piece types), (black piece types)), each sorted by type"""
+    letters = {char.upper(): piece_type for piece_type, char in enumerate(FEN_CHARS) if char}
+    letters['E'], letters['H'] = letters['B'], letters['N']
+    try:
+        red, black = signature.split('v')
+        sides = tuple(tuple(sorted(letters[char] for char in side.upper())) for side in (red, black))
+    except (KeyError, ValueError):
+        raise ValueError(f"invalid material signature {signature!r}, expected e.g. 'KRvKA'") from None
+    if any(side.count(GENERAL) != 1 for side in sides):
+        raise ValueError(f"each side needs exactly one general: {signature!r}")
+    return sides
+
+
+def _strength(types):
+    return sum(PIECE_VALUES[piece_type] for piece_type in types), _side_string(types)
+
+
+def canonical_signature(red, black):
+    """(signature, flipped): tables store the stronger side as red; flipped means colors are swapped"""
+    if _strength(black) > _strength(red):
+        return _side_string(black) + 'v' + _side_string(red), True
+    return _side_string(red) + 'v' + _side_string(black), False
+
+
+def material(squares):
+    """(red piece types, black piece types) on the board, each sorted"""
+    sides = ([], [])
+    for code in squares:
+        if code != EMPTY:
+            sides[CODE_COLOR[code]].append(CODE_TYPE[code])
+    return tuple(sorted(sides[0])), tuple(sorted(sides[1]))
+
+
+def flip_position(squares, turn):
+    """Mirror the board top to bottom and swap the colors of all pieces and the side to move"""
+    flipped = bytearray(NUM_SQUARES)
+    for sq, code in enumerate(squares):
+        if code != EMPTY:
+            row, col = SQUARE_POS[sq]
+            flipped[(ROWS - 1 - row) * COLS + col] = code + BLACK_OFFSET if code <= BLACK_OFFSET else code - BLACK_OFFSET
+    return flipped, 'black' if turn == 'red' else 'red'
+
+
+class _Layout:
+    """Mixed-radix indexing of the placements of one signature: turn + 2 * sum(square_index * stride)"""
+
+    def __init__(self, signature):
+        red, black = parse_signature(signature)
+        self.signature = signature
+        # One slot per piece, red pieces first, each with the squares it may occupy
+        self.slots = [(color, piece_type) for color, types in enumerate((red, black)) for piece_type in types]
+        self.codes = [piece_type + BLACK_OFFSET * color for color, piece_type in self.slots]
+        self.slot_squares = [_piece_squares(color, piece_type) for color, piece_type in self.slots]
+        self.square_index = []
+        for squares in self.slot_squares:
+            index = [-1] * NUM_SQUARES
+            for i, sq in enumerate(squares):
+                index[sq] = i
+            self.square_index.append(index)
+        self.strides = []
+        stride = 2
+        for squares in self.slot_squares:
+            self.strides.append(stride)
+            stride *= len(squares)
+        self.size = stride
+
+    def index(self, squares, turn):
+        """Index of a position with exactly this material, or -1 if a piece is off its squares"""
+        by_code = {}
+        for sq, code in enumerate(squares):
+            if code != EMPTY:
+                by_code.setdefault(code, []).append(sq)
+        index = 0 if turn == 'red' else 1
+        for slot, code in enumerate(self.codes):
+            # Identical pieces may take their slots in either order: both placements hold the same value
+            i = self.square_index[slot][by_code[code].pop()]
+            if i < 0:
+                return -1
+            index += i * self.strides[slot]
+        return index
+
+
+class Tablebase:
+    """Probe endgame tables stored as .cctb files in a directory.
+
+    ``probe(game)`` returns ``(result, dtm)`` for the side to move, with
+    result one of 'win', 'loss' or 'draw' and dtm the plies to mate, or
+    None when no table covers the material on the board.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.tables = {}
+        self.layouts = {}
+        self.max_pieces = 0
+        if directory is not None and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.cctb'):
+                    self.load(os.path.join(directory, name))
+
+    def load(self, path):
+        """Memory-map one table file"""
+        with open(path, 'rb') as file:
+            magic, version, length, signature, size = TABLE_HEADER.unpack(file.read(TABLE_HEADER.size))
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            raise ValueError(f"{path} is not a version {TABLE_VERSION} tablebase file")
+        signature = signature[:length].decode('ascii')
+        codes = np.memmap(path, dtype='<u2', mode='r', offset=TABLE_HEADER.size, shape=(size,))
+        self.add(signature, codes)
+
+    def add(self, signature, codes):
+        layout = _Layout(signature)
+        if len(codes) != layout.size:
+            raise ValueError(f"{signature} table has {len(codes)} entries, expected {layout.size}")
+        self.tables[signature] = codes
+        self.layouts[signature] = layout
+        self.max_pieces = max(self.max_pieces, len(layout.slots))
+
+    def __contains__(self, signature):
+        return signature in self.tables
+
+    def probe_position(self, squares, turn):
+        """(result, dtm) of a position for the side to move, or None without a table"""
+        if NUM_SQUARES - squares.count(EMPTY) > self.max_pieces:
+            return None
+        signature, flipped = canonical_signature(*material(squares))
+        codes = self.tables.get(signature)
+        if codes is None:
+            return None
+        if flipped:
+            squares, turn = flip_position(squares, turn)
+        index = self.layouts[signature].index(squares, turn)
+        if index < 0:
+            return None
+        code = int(codes[index])
+        return RESULT_NAMES[code >> DTM_BITS], code & DTM_MASK
+
+    def probe(self, game):
+        """(result, dtm) of a ChineseChess position for the side to move, or None without a table"""
+        return self.probe_position(game.squares, game.turn)
+
+    def best_move(self, game):
+        """A legal move keeping the best tablebase result (fastest win, slowest loss), or None"""
+        best, best_key = None, None
+        for move in game.get_action_space():
+            game.push(move)
+            entry = self.probe(game)
+            game.pop()
+            if entry is None:
+                return None
+            result, dtm = entry
+            # Ranked from the mover's point of view: the opponent losing is best
+            key = (2, -dtm) if result == 'loss' else (1, 0) if result == 'draw' else (0, dtm)
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def write(self, signature, directory=None):
+        """Write a table held in memory to <directory>/<signature>.cctb"""
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        codes = np.asarray(self.tables[signature], dtype='<u2')
+        encoded = signature.encode('ascii')
+        path = os.path.join(directory, signature + '.cctb')
+        with open(path, 'wb') as file:
+            file.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(encoded), encoded, len(codes)))
+            file.write(codes.tobytes())
+        return path
+
+
+def _sub_signatures(signature):
+    """Canonical signatures left after one capture"""
+    sides = parse_signature(signature)
+    result = set()
+    for color, types in enumerate(sides):
+        for i, piece_type in enumerate(types):
+            if piece_type != GENERAL:
+                reduced = list(sides)
+                reduced[color] = types[:i] + types[i + 1:]
+                result.add(canonical_signature(*reduced)[0])
+    return result
+
+
+def generate(signature, tablebase=None, directory=None, verbose=False):
+    """Build the table of signature, and first any smaller table a capture leads to.
+
+    Tables already in tablebase are reused. New tables are added to it and,
+    given a directory, written there. Returns the tablebase.
+    """
+    if tablebase is None:
+        tablebase = Tablebase(directory)
+    signature = canonical_signature(*parse_signature(signature))[0]
+    if signature in tablebase:
+        return tablebase
+    for sub in sorted(_sub_signatures(signature)):
+        generate(sub, tablebase, directory, verbose)
+
+    start = time.perf_counter()
+    codes = _retrograde(_Layout(signature), tablebase)
+    tablebase.add(signature, codes)
+    if directory is not None:
+        tablebase.write(signature, directory)
+    if verbose:
+        counts = np.bincount(codes >> DTM_BITS, minlength=3)
+        print(f"{signature}: {len(codes)} positions, {counts[WIN]} won, {counts[LOSS]} lost, "
+              f"max dtm {int((codes & DTM_MASK).max())}, {time.perf_counter() - start:.1f}s")
+    return tablebase
+
+
+def _retrograde(layout, tablebase):
+    """Results of every position of layout, given tables for every capture"""
+    size = layout.size
+    slots = len(layout.slots)
+    # Known result (-1 unknown) and plies to mate; captures become extra nodes appended after the positions
+    results = np.full(size, -1, dtype=np.int8)
+    dtm = np.zeros(size, dtype=np.int32)
+    extra_results, extra_dtm = array('b'), array('i')
+    owners, targets = array('q'), array('q')
+
+    game = ChineseChess(move_cache=None, repetition_limit=None)
+    squares = bytearray(NUM_SQUARES)
+    for placement in itertools.product(*[range(len(s)) for s in layout.slot_squares]):
+        occupied = [layout.slot_squares[slot][i] for slot, i in enumerate(placement)]
+        if len(set(occupied)) < slots:
+            continue
+        squares[:] = bytes(NUM_SQUARES)
+        for sq, code in zip(occupied, layout.codes):
+            squares[sq] = code
+        game._set_squares(squares)
+        base = sum(i * stride for i, stride in zip(placement, layout.strides))
+
+        for color in range(2):
+            # Illegal: the side that just moved left its general attacked
+            if game._is_in_check(1 - color):
+                continue
+            index = base + color
+            game.turn = COLORS[color]
+            moves = 0
+            for slot, from_sq in enumerate(occupied):
+                if layout.slots[slot][0] != color:
+                    continue
+                for to_sq in game._legal_moves_from(from_sq, color):
+                    moves += 1
+                    owners.append(index)
+                    if squares[to_sq] == EMPTY:
+                        square_index = layout.square_index[slot]
+                        targets.append(index + 1 - 2 * color
+                                       + (square_index[to_sq] - square_index[from_sq]) * layout.strides[slot])
+                    else:
+                        captured = game._move_piece(from_sq, to_sq)
+                        result, plies = tablebase.probe_position(squares, COLORS[1 - color])
+                        game._unmove_piece(from_sq, to_sq, captured)
+                        targets.append(size + len(extra_results))
+                        extra_results.append(RESULT_NAMES.index(result))
+                        extra_dtm.append(plies)
+            if moves == 0:
+                # No legal move: checkmate or stalemate, both lost
+                results[index] = LOSS
+
+    owners = np.frombuffer(owners, dtype=np.int64)
+    targets = np.frombuffer(targets, dtype=np.int64)
+    degree = np.bincount(owners, minlength=size)
+    results = np.concatenate([results, np.frombuffer(extra_results, dtype=np.int8)])
+    dtm = np.concatenate([dtm, np.frombuffer(extra_dtm, dtype=np.int32)])
+    # Captures into a drawn table are known draws; treated as unknown they can never decide a position
+    results[size:][results[size:] == DRAW] = -1
+
+    # Plies n = 1, 2, ...: a position is won in n if some move reaches a position lost in
+    # at most n - 1, and lost in n once every move reaches a position won in at most n - 1
+    ply = 0
+    max_extra = int(dtm[size:].max()) if len(dtm) > size else 0
+    while True:
+        ply += 1
+        pending = results[owners] == -1
+        owners, targets = owners[pending], targets[pending]
+        child_results = results[targets]
+        child_done = dtm[targets] <= ply - 1
+        win = np.zeros(size, dtype=bool)
+        win[owners[(child_results == LOSS) & child_done]] = True
+        won_children = np.bincount(owners[(child_results == WIN) & child_done], minlength=size)
+        loss = (won_children == degree) & (degree > 0) & ~win & (results[:size] == -1)
+        win &= results[:size] == -1
+        if not win.any() and not loss.any() and ply > max_extra + 1:
+            break
+        results[:size][win] = WIN
+        results[:size][loss] = LOSS
+        dtm[:size][win | loss] = ply
+
+    results = results[:size]
+    dtm = dtm[:size]
+    results[results == -1] = DRAW
+    dtm[results == DRAW] = 0
+    return (results.astype(np.uint16) << DTM_BITS) | np.minimum(dtm, DTM_MASK).astype(np.uint16)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('signatures', nargs='+', help="material signatures such as KRvKA or KNPvK")
+    parser.add_argument('--dir', default='tablebases', help='directory to write the .cctb files to')
+    args = parser.parse_args(argv)
+
+    tablebase = Tablebase(args.dir)
+    for signature in args.signatures:
+        generate(signature, tablebase, args.dir, verbose=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
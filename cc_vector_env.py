@@ -0,0 +1,131 @@
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from chinese_chess import LegalMoveCache, make_game
+from cc_batch import legal_action_mask
+from cc_gym import ACTION_ENCODINGS
+
+
+class ChineseChessVectorEnv(VectorEnv):
+    """N Chinese Chess games stepped together in one process.
+
+    Observations are a single ``(N, 10, 9)`` uint8 array of piece codes and
+    actions use one of the fixed ``cc_gym.ACTION_ENCODINGS`` ("square" or
+    "compact"). Legal-action masks of shape ``(N, action_size)`` are returned
+    in ``infos["action_mask"]``; they are generated for the whole batch at
+    once by ``cc_batch.legal_action_mask``.
+    Games also end in draws by repetition and are truncated after
+    ``no_capture_limit`` plies without a capture.
+    Finished games are reset within the same step; their last observation
+    and info are kept under ``final_obs`` / ``final_info``.
+    """
+
+    metadata = {
+        "autoreset_mode": AutoresetMode.SAME_STEP,
+        "name": "ChineseChessVectorEnv",
+    }
+
+    def __init__(self, num_envs, action_encoding="square", copy=True, backend="array",
+                 repetition_limit=3, no_capture_limit=120, move_cache=None):
+        super().__init__()
+        self.num_envs = num_envs
+        self.copy = copy
+        self.action_encoding = action_encoding
+        action_size, self.encode_action, self.decode_action = ACTION_ENCODINGS[action_encoding]
+
+        # move_cache为None时不缓存合法着法；为整数或LegalMoveCache时所有对局共用一个缓存；
+        # 和棋规则与ChineseChessEnv相同
+        if isinstance(move_cache, int):
+            move_cache = LegalMoveCache(move_cache)
+        self.games = [make_game(backend, move_cache=move_cache, repetition_limit=repetition_limit,
+                                no_capture_limit=no_capture_limit)
+                      for _ in range(num_envs)]
+
+        self.single_observation_space = spaces.Box(low=0, high=14, shape=(10, 9), dtype=np.uint8)
+        self.single_action_space = spaces.Discrete(action_size)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        # 预分配的批量缓冲区
+        self.boards = np.zeros((num_envs, 10, 9), dtype=np.uint8)
+        self.action_masks = np.zeros((num_envs, action_size), dtype=bool)
+        self.turns = np.zeros(num_envs, dtype=np.int8)  # 0: 红方走, 1: 黑方走
+        self._rewards = np.zeros(num_envs, dtype=np.float64)
+        self._terminations = np.zeros(num_envs, dtype=bool)
+        self._truncations = np.zeros(num_envs, dtype=bool)
+
+    def _sync(self):
+        # 把所有对局的棋盘和行棋方写入批量缓冲区，再用cc_batch一次性生成全部合法动作掩码
+        boards = self.boards.reshape(self.num_envs, -1)
+        for i, game in enumerate(self.games):
+            boards[i] = np.frombuffer(game.squares, dtype=np.uint8)
+            self.turns[i] = 0 if game.turn == 'red' else 1
+        legal_action_mask(self.boards, self.turns, self.action_encoding, out=self.action_masks)
+
+    def _get_infos(self):
+        return {
+            "turn": self.turns.copy(),
+            "action_mask": self.action_masks.copy() if self.copy else self.action_masks,
+        }
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        for game in self.games:
+            game.reset()
+        self._sync()
+
+        observations = self.boards.copy() if self.copy else self.boards
+        return observations, self._get_infos()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self._rewards[:] = 0.0
+        self._terminations[:] = False
+        self._truncations[:] = False
+        final_obs = None
+        winners = None
+
+        # 先检查全部动作再走棋，有非法动作时所有对局都保持不变
+        legal = self.action_masks[np.arange(self.num_envs), actions]
+        if not legal.all():
+            i = int(np.flatnonzero(~legal)[0])
+            raise ValueError(f"第{i}个环境的无效动作: {int(actions[i])}")
+
+        for i, game in enumerate(self.games):
+            action = int(actions[i])
+            # 掩码已保证动作合法，跳过make_move中逐局生成合法着法的检查
+            game._play(self.decode_action(action))
+
+            if game.game_over:
+                # 奖励以红方视角计算，与ChineseChessEnv一致，和棋为0；无吃子步数达到上限时截断
+                if game.winner is not None:
+                    self._rewards[i] = 1.0 if game.winner == 'red' else -1.0
+                if game.termination == 'move_limit':
+                    self._truncations[i] = True
+                else:
+                    self._terminations[i] = True
+                if final_obs is None:
+                    final_obs = np.zeros_like(self.boards)
+                    winners = np.full(self.num_envs, None, dtype=object)
+                winners[i] = game.winner
+                final_obs[i] = np.frombuffer(game.squares, dtype=np.uint8).reshape(10, 9)
+                game.reset()
+
+        self._sync()
+        infos = self._get_infos()
+        if final_obs is not None:
+            done = self._terminations | self._truncations
+            infos["final_obs"] = final_obs
+            infos["_final_obs"] = done
+            infos["final_info"] = {"winner": winners, "_winner": done.copy()}
+
+        observations = self.boards.copy() if self.copy else self.boards
+        return (
+            observations,
+            self._rewards.copy(),
+            self._terminations.copy(),
+            self._truncations.copy(),
+            infos,
+        )
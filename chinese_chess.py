@@ -1,48 +1,499 @@
-import pygame
+import random
+from collections import OrderedDict
+
+# Piece codes, shared with cc_gym.ChineseChessEnv.piece_to_id:
+# 0: empty, 1-7: red (general, advisor, elephant, horse, chariot, cannon, soldier),
+# 8-14: black, same order
+EMPTY = 0
+GENERAL, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER = range(1, 8)
+BLACK_OFFSET = 7
+
+COLORS = ('red', 'black')
+PIECE_TYPES = (None, 'general', 'advisor', 'elephant', 'horse', 'chariot', 'cannon', 'soldier')
+
+# Lookup tables indexed by piece code
+CODE_COLOR = (-1,) + (0,) * 7 + (1,) * 7  # 0 = red, 1 = black, -1 = empty
+CODE_TYPE = (EMPTY,) + tuple(range(1, 8)) * 2
+
+# Material values indexed by piece type, used by static exchange evaluation
+# and search; the general is valued so that it is never traded
+PIECE_VALUES = (0, 10000, 200, 200, 400, 900, 450, 100)
+CODE_VALUES = tuple(PIECE_VALUES[CODE_TYPE[code]] for code in range(2 * BLACK_OFFSET + 1))
+
+ROWS, COLS = 10, 9
+NUM_SQUARES = ROWS * COLS
+
+
+def _in_palace(row, col, color):
+    """Return True if (row, col) lies inside the palace of the given color index"""
+    if not 3 <= col <= 5:
+        return False
+    return 7 <= row <= 9 if color == 0 else 0 <= row <= 2
+
+
+def _build_rays():
+    rays = []
+    for sq in range(NUM_SQUARES):
+        row, col = divmod(sq, COLS)
+        rays.append((
+            tuple(row * COLS + c for c in range(col + 1, COLS)),
+            tuple(row * COLS + c for c in range(col - 1, -1, -1)),
+            tuple(r * COLS + col for r in range(row + 1, ROWS)),
+            tuple(r * COLS + col for r in range(row - 1, -1, -1)),
+        ))
+    return tuple(rays)
+
+
+def _on_board(row, col):
+    return 0 <= row < ROWS and 0 <= col < COLS
+
+
+def _build_leaper_table(offsets, allowed, blocker=None):
+    """Build a per-square table of destination squares for a leaping piece.
+
+    ``allowed(row, col)`` filters destinations; with ``blocker`` each entry is
+    a ``(to, block)`` pair where ``block`` is the square that must be empty.
+    """
+    table = []
+    for sq in range(NUM_SQUARES):
+        row, col = divmod(sq, COLS)
+        entries = []
+        for dr, dc in offsets:
+            to_row, to_col = row + dr, col + dc
+            if not (_on_board(to_row, to_col) and allowed(to_row, to_col)):
+                continue
+            to = to_row * COLS + to_col
+            if blocker is None:
+                entries.append(to)
+            else:
+                block_row, block_col = blocker(row, col, dr, dc)
+                entries.append((to, block_row * COLS + block_col))
+        table.append(tuple(entries))
+    return tuple(table)
+
+
+def _invert_table(table):
+    """Turn a from-square move table into a to-square table of origins"""
+    inverted = [[] for _ in range(NUM_SQUARES)]
+    for sq, entries in enumerate(table):
+        for entry in entries:
+            if isinstance(entry, tuple):
+                inverted[entry[0]].append((sq, entry[1]))
+            else:
+                inverted[entry].append(sq)
+    return tuple(tuple(entries) for entries in inverted)
+
+
+def _horse_leg(row, col, dr, dc):
+    # The leg is next to the horse, in the direction of the two-point step
+    if abs(dr) == 2:
+        return row + dr // 2, col
+    return row, col + dc // 2
+
+
+def _elephant_eye(row, col, dr, dc):
+    return row + dr // 2, col + dc // 2
+
+
+def _soldier_table(color):
+    table = []
+    forward = -1 if color == 0 else 1
+    for sq in range(NUM_SQUARES):
+        row, col = divmod(sq, COLS)
+        candidates = [(row + forward, col)]
+        # Once across the river soldiers may also move sideways
+        if (row < 5) if color == 0 else (row > 4):
+            candidates.extend([(row, col - 1), (row, col + 1)])
+        table.append(tuple(r * COLS + c for r, c in candidates if _on_board(r, c)))
+    return tuple(table)
+
+
+HORSE_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+ELEPHANT_OFFSETS = ((-2, -2), (-2, 2), (2, -2), (2, 2))
+ADVISOR_OFFSETS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+GENERAL_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Squares along each orthogonal direction from every square: right, left, down, up
+RAYS = _build_rays()
+DOWN, UP = 2, 3
+
+# Per-square move tables, indexed [sq] or [color][sq]. Horse and elephant
+# entries are (to, block) pairs whose block square (leg / eye) must be empty.
+HORSE_MOVES = _build_leaper_table(HORSE_OFFSETS, lambda r, c: True, _horse_leg)
+ELEPHANT_MOVES = tuple(
+    _build_leaper_table(ELEPHANT_OFFSETS, lambda r, c, color=color: (r > 4) if color == 0 else (r < 5),
+                        _elephant_eye)
+    for color in range(2)
+)
+ADVISOR_MOVES = tuple(
+    _build_leaper_table(ADVISOR_OFFSETS, lambda r, c, color=color: _in_palace(r, c, color))
+    for color in range(2)
+)
+GENERAL_MOVES = tuple(
+    _build_leaper_table(GENERAL_OFFSETS, lambda r, c, color=color: _in_palace(r, c, color))
+    for color in range(2)
+)
+SOLDIER_MOVES = tuple(_soldier_table(color) for color in range(2))
+
+# The same tables inverted: the squares a piece could reach sq from
+HORSE_ATTACKERS = _invert_table(HORSE_MOVES)
+ELEPHANT_ATTACKERS = tuple(_invert_table(table) for table in ELEPHANT_MOVES)
+ADVISOR_ATTACKERS = tuple(_invert_table(table) for table in ADVISOR_MOVES)
+GENERAL_ATTACKERS = tuple(_invert_table(table) for table in GENERAL_MOVES)
+SOLDIER_ATTACKERS = tuple(_invert_table(table) for table in SOLDIER_MOVES)
+
+# (row, col) of every square
+SQUARE_POS = tuple(divmod(sq, COLS) for sq in range(NUM_SQUARES))
+
+
+def _reachable_squares(table, start_sq):
+    """Squares a piece can reach from start_sq following a move table"""
+    seen = {start_sq}
+    frontier = [start_sq]
+    while frontier:
+        sq = frontier.pop()
+        for entry in table[sq]:
+            to_sq = entry[0] if isinstance(entry, tuple) else entry
+            if to_sq not in seen:
+                seen.add(to_sq)
+                frontier.append(to_sq)
+    return frozenset(seen)
+
+
+# Squares the restricted pieces can ever stand on, indexed [color]: advisors and
+# elephants reachable from their starting squares, and soldiers on their starting
+# files or anywhere across the river
+ADVISOR_SQUARES = tuple(_reachable_squares(ADVISOR_MOVES[color], (9 if color == 0 else 0) * COLS + 3)
+                        for color in range(2))
+ELEPHANT_SQUARES = tuple(_reachable_squares(ELEPHANT_MOVES[color], (9 if color == 0 else 0) * COLS + 2)
+                         for color in range(2))
+SOLDIER_SQUARES = tuple(
+    frozenset(row * COLS + col for row in range(ROWS) for col in range(COLS)
+              if ((row < 5) if color == 0 else (row > 4))
+              or (row in ((5, 6) if color == 0 else (3, 4)) and col % 2 == 0))
+    for color in range(2)
+)
+
+# Piece-square bonuses for red, one row per rank from black's back rank
+# (row 0) to red's (row 9); black uses the vertically mirrored table
+PIECE_SQUARE_TABLES = (
+    None,
+    # General: stay on the back rank, preferably the central file
+    ((0,) * 9,) * 7 + (
+        (0, 0, 0, -9, -9, -9, 0, 0, 0),
+        (0, 0, 0, -8, -8, -8, 0, 0, 0),
+        (0, 0, 0, 1, 5, 1, 0, 0, 0),
+    ),
+    # Advisor
+    ((0,) * 9,) * 7 + (
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 3, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ),
+    # Elephant
+    ((0,) * 9,) * 5 + (
+        (0, 0, -2, 0, 0, 0, -2, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (-2, 0, 0, 0, 3, 0, 0, 0, -2),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ),
+    # Horse: centralised and advanced, not on the edge
+    (
+        (4, 8, 16, 12, 4, 12, 16, 8, 4),
+        (4, 10, 28, 16, 8, 16, 28, 10, 4),
+        (12, 14, 16, 20, 18, 20, 16, 14, 12),
+        (8, 24, 18, 24, 20, 24, 18, 24, 8),
+        (6, 16, 14, 18, 16, 18, 14, 16, 6),
+        (4, 12, 16, 14, 12, 14, 16, 12, 4),
+        (2, 6, 8, 6, 10, 6, 8, 6, 2),
+        (4, 2, 8, 8, 4, 8, 8, 2, 4),
+        (0, 2, 4, 4, -2, 4, 4, 2, 0),
+        (0, -4, 0, 0, 0, 0, 0, -4, 0),
+    ),
+    # Chariot: open files and the opponent's ranks
+    (
+        (14, 14, 12, 18, 16, 18, 12, 14, 14),
+        (16, 20, 18, 24, 26, 24, 18, 20, 16),
+        (12, 12, 12, 18, 18, 18, 12, 12, 12),
+        (12, 18, 16, 22, 22, 22, 16, 18, 12),
+        (12, 14, 12, 18, 18, 18, 12, 14, 12),
+        (12, 16, 14, 20, 20, 20, 14, 16, 12),
+        (6, 10, 8, 14, 14, 14, 8, 10, 6),
+        (4, 8, 6, 14, 12, 14, 6, 8, 4),
+        (8, 4, 8, 16, 8, 16, 8, 4, 8),
+        (-2, 10, 6, 14, 12, 14, 6, 10, -2),
+    ),
+    # Cannon: central file and the home rank behind screens
+    (
+        (6, 4, 0, -10, -12, -10, 0, 4, 6),
+        (2, 2, 0, -4, -14, -4, 0, 2, 2),
+        (2, 2, 0, -10, -8, -10, 0, 2, 2),
+        (0, 0, -2, 4, 10, 4, -2, 0, 0),
+        (0, 0, 0, 2, 8, 2, 0, 0, 0),
+        (-2, 0, 4, 2, 6, 2, 4, 0, -2),
+        (0, 0, 0, 2, 4, 2, 0, 0, 0),
+        (4, 0, 8, 6, 10, 6, 8, 0, 4),
+        (0, 2, 4, 6, 6, 6, 4, 2, 0),
+        (0, 0, 2, 6, 6, 6, 2, 0, 0),
+    ),
+    # Soldier: worth much more across the river, most near the palace
+    (
+        (0, 3, 6, 9, 12, 9, 6, 3, 0),
+        (18, 36, 56, 80, 120, 80, 56, 36, 18),
+        (14, 26, 42, 60, 80, 60, 42, 26, 14),
+        (10, 20, 30, 34, 40, 34, 30, 20, 10),
+        (6, 12, 18, 18, 20, 18, 18, 12, 6),
+        (2, 0, 8, 0, 8, 0, 8, 0, 2),
+        (0, 0, -2, 0, 4, 0, -2, 0, 0),
+        (0,) * 9,
+        (0,) * 9,
+        (0,) * 9,
+    ),
+)
+
+
+def _build_square_values():
+    """Material plus piece-square bonus for every (piece code, square), positive for red"""
+    values = [(0,) * NUM_SQUARES]
+    for color in range(2):
+        for piece_type in range(1, 8):
+            table = PIECE_SQUARE_TABLES[piece_type]
+            row_values = []
+            for sq in range(NUM_SQUARES):
+                row, col = divmod(sq, COLS)
+                bonus = table[row][col] if color == 0 else table[ROWS - 1 - row][col]
+                value = PIECE_VALUES[piece_type] + bonus
+                row_values.append(value if color == 0 else -value)
+            values.append(tuple(row_values))
+    return tuple(values)
+
+
+SQUARE_VALUES = _build_square_values()
+
+
+def compute_score(squares):
+    """Material and piece-square score of a position from red's point of view"""
+    return sum(SQUARE_VALUES[code][sq] for sq, code in enumerate(squares))
+
+
+# Zobrist keys: one 64-bit key per (piece code, square), all zero for empty
+# squares, plus a key toggled when black is to move. Seeded so hashes are
+# stable across processes and runs.
+_zobrist_rng = random.Random(0x5A0B1257)
+ZOBRIST_PIECES = tuple(
+    (0,) * NUM_SQUARES if code == EMPTY else tuple(_zobrist_rng.getrandbits(64) for _ in range(NUM_SQUARES))
+    for code in range(2 * BLACK_OFFSET + 1)
+)
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+del _zobrist_rng
+
+
+def compute_hash(squares, turn):
+    """Compute the Zobrist hash of a position from scratch"""
+    h = ZOBRIST_BLACK_TO_MOVE if turn == 'black' else 0
+    for sq, code in enumerate(squares):
+        if code != EMPTY:
+            h ^= ZOBRIST_PIECES[code][sq]
+    return h
+
+
+def piece_code(color, piece_type):
+    """Return the integer code of a piece given its color and type name"""
+    code = PIECE_TYPES.index(piece_type)
+    return code + BLACK_OFFSET if color == 'black' else code
+
+
+# FEN letters for red pieces (black uses lower case); 'e' and 'h' are
+# accepted as aliases of 'b' and 'n' when parsing
+FEN_PIECES = {'k': GENERAL, 'a': ADVISOR, 'b': ELEPHANT, 'e': ELEPHANT, 'n': HORSE, 'h': HORSE,
+              'r': CHARIOT, 'c': CANNON, 'p': SOLDIER}
+FEN_CHARS = (None, 'k', 'a', 'b', 'n', 'r', 'c', 'p')
+START_FEN = 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'
+
+
+def parse_fen(fen):
+    """Parse a FEN string into (squares, turn, halfmove, fullmove); raise ValueError if it is malformed"""
+    fields = fen.split()
+    if not fields:
+        raise ValueError("empty FEN")
+    ranks = fields[0].split('/')
+    if len(ranks) != ROWS:
+        raise ValueError(f"FEN must have {ROWS} ranks: {fen!r}")
+
+    squares = bytearray()
+    for row, rank in enumerate(ranks):
+        for char in rank:
+            if char in '123456789':
+                squares.extend(bytes(int(char)))
+            elif char.lower() in FEN_PIECES:
+                squares.append(FEN_PIECES[char.lower()] + (BLACK_OFFSET if char.islower() else 0))
+            else:
+                raise ValueError(f"invalid FEN character {char!r}: {fen!r}")
+        if len(squares) != (row + 1) * COLS:
+            raise ValueError(f"FEN rank must have {COLS} files: {rank!r}")
+
+    for color in range(2):
+        general = GENERAL + BLACK_OFFSET * color
+        if squares.count(general) != 1:
+            raise ValueError(f"FEN must have exactly one {COLORS[color]} general: {fen!r}")
+        if not _in_palace(*SQUARE_POS[squares.index(general)], color):
+            raise ValueError(f"{COLORS[color]} general outside the palace: {fen!r}")
+    # Advisors, elephants and soldiers on squares they can never reach would have no place in the move encodings
+    for sq, code in enumerate(squares):
+        color, piece_type = CODE_COLOR[code], CODE_TYPE[code]
+        allowed = (ADVISOR_SQUARES if piece_type == ADVISOR else ELEPHANT_SQUARES if piece_type == ELEPHANT
+                   else SOLDIER_SQUARES if piece_type == SOLDIER else None)
+        if allowed is not None and sq not in allowed[color]:
+            raise ValueError(f"{COLORS[color]} {PIECE_TYPES[piece_type]} on unreachable square "
+                             f"{SQUARE_POS[sq]}: {fen!r}")
+
+    side = fields[1].lower() if len(fields) > 1 else 'w'
+    if side not in ('w', 'r', 'b'):
+        raise ValueError(f"invalid FEN side to move {fields[1]!r}: {fen!r}")
+    # Fields 3 and 4 (castling, en passant) are always '-' in Xiangqi; then the two move counters
+    try:
+        halfmove = int(fields[4]) if len(fields) > 4 else 0
+        fullmove = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise ValueError(f"invalid FEN move counters: {fen!r}") from None
+    if halfmove < 0 or fullmove < 1:
+        raise ValueError(f"invalid FEN move counters: {fen!r}")
+    return squares, 'black' if side == 'b' else 'red', halfmove, fullmove
+
+
+def format_fen(squares, turn, fullmove=1, halfmove=0):
+    """Format a position as a FEN string"""
+    ranks = []
+    for row in range(ROWS):
+        rank = ''
+        empty = 0
+        for code in squares[row * COLS:(row + 1) * COLS]:
+            if code == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            char = FEN_CHARS[CODE_TYPE[code]]
+            rank += char if CODE_COLOR[code] else char.upper()
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return f"{'/'.join(ranks)} {'b' if turn == 'black' else 'w'} - - {halfmove} {fullmove}"
+
+
+def piece_dict(code):
+    """Return the legacy {'type', 'color'} dict for a piece code, or None for empty"""
+    if code == EMPTY:
+        return None
+    return {'type': PIECE_TYPES[CODE_TYPE[code]], 'color': COLORS[CODE_COLOR[code]]}
+
+
+class LegalMoveCache:
+    """Bounded LRU cache of legal action tuples keyed by (position hash, side to move)"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached actions for key, or None on a miss"""
+        actions = self._entries.get(key)
+        if actions is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return actions
+
+    def peek(self, key):
+        """Return the cached actions for key, or None, without touching stats or recency"""
+        return self._entries.get(key)
+
+    def put(self, key, actions):
+        """Store actions for key, evicting the least recently used entry when full"""
+        self._entries[key] = actions
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
 
 
 class ChineseChess:
-    def __init__(self, window_size=(400, 450), board_margin=50):
-        pygame.init()
-        
+    """Rules and state engine for Chinese Chess.
+
+    Pure Python with no display dependencies; drawing lives in
+    ``cc_render.ChineseChessRenderer``. The position is a flat 90-cell
+    ``bytearray`` of piece codes (``squares[row * 9 + col]``); the
+    ``board`` property exposes the legacy 10x9 grid of dicts.
+    """
+
+    def __init__(self, move_cache=None, repetition_limit=3, no_capture_limit=None):
         # Game state
-        self.selected_piece = None
         self.turn = 'red'  # Red starts first
         self.game_over = False
         self.winner = None
-        
-        # Board configuration
-        self.window_size = window_size
-        self.board_margin = board_margin
-        self.board_width = window_size[0] - 2 * board_margin
-        self.board_height = window_size[0] - 2 * board_margin  # Square board area
-        self.cell_size = self.board_width / 8
-        
-        # Screen setup
-        self.screen = pygame.display.set_mode(window_size)
-        pygame.display.set_caption("Chinese Chess")
-        
-        # Colors
-        self.BACKGROUND_COLOR = (240, 217, 181)
-        self.LINE_COLOR = (0, 0, 0)
-        self.RED_COLOR = (200, 0, 0)
-        self.BLACK_COLOR = (0, 0, 0)
-        self.HIGHLIGHT_COLOR = (0, 255, 0, 128)
-        self.MOVE_HINT_COLOR = (0, 0, 255, 128)
-        
-        # Load assets or set up piece representations
-        self.setup_pieces()
-        
+
         # Initialize board state (9x10 grid for Chinese Chess)
-        self.board = self.create_initial_board()
-        
-        # Font for rendering text
-        self.font = pygame.font.SysFont('simsun', 24)
-        self.small_font = pygame.font.SysFont('simsun', 16)
-        
-        # Move history
-        self.move_history = []
-    
+        self._set_squares(self.create_initial_board())
+
+        # Zobrist hash of the position, updated incrementally by push/pop
+        self._hash = compute_hash(self.squares, self.turn)
+        # Material and piece-square score for red, updated incrementally by push/pop
+        self._score = compute_score(self.squares)
+
+        # Undo stack of (from_sq, to_sq, piece, captured, game_over, winner, hash), one entry per move
+        self._undo_stack = []
+
+        # Optional LegalMoveCache of legal move lists keyed by position, which
+        # games may share; off by default since random play rarely revisits positions
+        self.move_cache = move_cache
+        # (hash, actions) of the last legal move list generated, kept even without a move cache
+        self._last_actions = None
+
+        # Rules applied by make_move: a position occurring repetition_limit times
+        # ends the game, and so do no_capture_limit plies without a capture; None disables either
+        self.repetition_limit = repetition_limit
+        self.no_capture_limit = no_capture_limit
+        self._reset_history()
+
+    @property
+    def board(self):
+        """10x9 grid of {'type', 'color'} dicts (None for empty), built on demand"""
+        squares = self.squares
+        return [[piece_dict(squares[row * COLS + col]) for col in range(COLS)] for row in range(ROWS)]
+
+    def copy(self):
+        """Return an independent copy of the game state"""
+        game = self.__class__.__new__(self.__class__)
+        game.__dict__.update(self.__dict__)
+        game.squares = bytearray(self.squares)
+        game.generals = list(self.generals)
+        game._undo_stack = list(self._undo_stack)
+        game._history = list(self._history)
+        game._last_seen = dict(self._last_seen)
+        # The copy generates its own legal moves rather than sharing the memo
+        game._last_actions = None
+        return game
+
     def load_board(self, board, turn='red'):
         # Not Tested
         """Load a custom board state"""
@@ -50,652 +501,781 @@ class ChineseChess:
             raise ValueError("Board must be a 10x9 grid")
         self.reset()
         """Reset the game to its initial state"""
-        self.board = board
-        self.selected_piece = None
+        self._set_squares(bytearray(
+            EMPTY if piece is None else piece_code(piece['color'], piece['type'])
+            for row in board for piece in row
+        ))
         self.turn = turn
         self.game_over = False
         self.winner = None
-        self.move_history = []
+        self._hash = compute_hash(self.squares, self.turn)
+        self._score = compute_score(self.squares)
+        self._undo_stack = []
+        self._reset_history()
         return
 
+    def load_fen(self, fen):
+        """Load a position from a FEN string such as START_FEN; a rejected FEN leaves the game unchanged"""
+        squares, turn, halfmove, fullmove = parse_fen(fen)
+        # The side that just moved may not have left its general attacked; checked on a scratch board
+        scratch = ChineseChess.__new__(ChineseChess)
+        scratch._set_squares(squares)
+        if scratch._is_in_check(1 - COLORS.index(turn)):
+            raise ValueError(f"FEN side not to move is in check: {fen!r}")
+
+        self.reset()
+        self._set_squares(squares)
+        self.turn = turn
+        self._hash = compute_hash(self.squares, self.turn)
+        self._score = compute_score(self.squares)
+        self._reset_history(halfmove, fullmove)
+
+        # A position without legal moves is already decided
+        if not self.has_legal_move():
+            self.game_over = True
+            self.winner = 'red' if turn == 'black' else 'black'
+            self.termination = 'checkmate'
+
+    def to_fen(self):
+        """Return the position as a FEN string, with the move counters carried on from the loaded FEN"""
+        # Plies since the last capture, counting on from the loaded clock when none was played
+        halfmove = 0
+        for entry in reversed(self._undo_stack):
+            if entry[3] != EMPTY:
+                break
+            halfmove += 1
+        else:
+            halfmove += self._history[0][4]
+        fullmove = 1 + (self._start_ply + len(self._undo_stack)) // 2
+        return format_fen(self.squares, self.turn, fullmove, halfmove)
+
+    def _set_squares(self, squares):
+        """Replace the whole position, e.g. when resetting or loading a board"""
+        self.squares = squares
+        # Squares of the red and black generals, kept in sync by _move_piece
+        self.generals = self._locate_generals()
+
+    def _locate_generals(self):
+        """Find both generals on the board (-1 when missing)"""
+        return [self.squares.find(GENERAL), self.squares.find(GENERAL + BLACK_OFFSET)]
+
+    def _move_piece(self, from_sq, to_sq):
+        """Move a piece without any rule checks and return the captured code"""
+        squares = self.squares
+        piece = squares[from_sq]
+        captured = squares[to_sq]
+        squares[to_sq] = piece
+        squares[from_sq] = EMPTY
+        if CODE_TYPE[piece] == GENERAL:
+            self.generals[CODE_COLOR[piece]] = to_sq
+        if CODE_TYPE[captured] == GENERAL:
+            self.generals[CODE_COLOR[captured]] = -1
+        return captured
+
+    def _unmove_piece(self, from_sq, to_sq, captured):
+        """Take back a move made with _move_piece"""
+        squares = self.squares
+        piece = squares[to_sq]
+        squares[from_sq] = piece
+        squares[to_sq] = captured
+        if CODE_TYPE[piece] == GENERAL:
+            self.generals[CODE_COLOR[piece]] = from_sq
+        if CODE_TYPE[captured] == GENERAL:
+            self.generals[CODE_COLOR[captured]] = to_sq
+
     def create_initial_board(self):
         """Create the initial board setup for Chinese Chess"""
         # Create empty 9x10 board
-        board = [[None for _ in range(9)] for _ in range(10)]
-        
+        board = bytearray(NUM_SQUARES)
+
+        def place(row, col, piece_type, color):
+            board[row * COLS + col] = piece_code(color, piece_type)
+
         # Place pieces - standard Xiangqi setup
         # Chariot (Rook)
-        board[0][0] = {'type': 'chariot', 'color': 'black'}
-        board[0][8] = {'type': 'chariot', 'color': 'black'}
-        board[9][0] = {'type': 'chariot', 'color': 'red'}
-        board[9][8] = {'type': 'chariot', 'color': 'red'}
-        
+        place(0, 0, 'chariot', 'black')
+        place(0, 8, 'chariot', 'black')
+        place(9, 0, 'chariot', 'red')
+        place(9, 8, 'chariot', 'red')
+
         # Horse (Knight)
-        board[0][1] = {'type': 'horse', 'color': 'black'}
-        board[0][7] = {'type': 'horse', 'color': 'black'}
-        board[9][1] = {'type': 'horse', 'color': 'red'}
-        board[9][7] = {'type': 'horse', 'color': 'red'}
-        
+        place(0, 1, 'horse', 'black')
+        place(0, 7, 'horse', 'black')
+        place(9, 1, 'horse', 'red')
+        place(9, 7, 'horse', 'red')
+
         # Elephant
-        board[0][2] = {'type': 'elephant', 'color': 'black'}
-        board[0][6] = {'type': 'elephant', 'color': 'black'}
-        board[9][2] = {'type': 'elephant', 'color': 'red'}
-        board[9][6] = {'type': 'elephant', 'color': 'red'}
-        
+        place(0, 2, 'elephant', 'black')
+        place(0, 6, 'elephant', 'black')
+        place(9, 2, 'elephant', 'red')
+        place(9, 6, 'elephant', 'red')
+
         # Advisor
-        board[0][3] = {'type': 'advisor', 'color': 'black'}
-        board[0][5] = {'type': 'advisor', 'color': 'black'}
-        board[9][3] = {'type': 'advisor', 'color': 'red'}
-        board[9][5] = {'type': 'advisor', 'color': 'red'}
-        
+        place(0, 3, 'advisor', 'black')
+        place(0, 5, 'advisor', 'black')
+        place(9, 3, 'advisor', 'red')
+        place(9, 5, 'advisor', 'red')
+
         # General (King)
-        board[0][4] = {'type': 'general', 'color': 'black'}
-        board[9][4] = {'type': 'general', 'color': 'red'}
-        
+        place(0, 4, 'general', 'black')
+        place(9, 4, 'general', 'red')
+
         # Cannon
-        board[2][1] = {'type': 'cannon', 'color': 'black'}
-        board[2][7] = {'type': 'cannon', 'color': 'black'}
-        board[7][1] = {'type': 'cannon', 'color': 'red'}
-        board[7][7] = {'type': 'cannon', 'color': 'red'}
-        
+        place(2, 1, 'cannon', 'black')
+        place(2, 7, 'cannon', 'black')
+        place(7, 1, 'cannon', 'red')
+        place(7, 7, 'cannon', 'red')
+
         # Soldier (Pawn)
         for i in range(0, 9, 2):
-            board[3][i] = {'type': 'soldier', 'color': 'black'}
-            board[6][i] = {'type': 'soldier', 'color': 'red'}
-        
+            place(3, i, 'soldier', 'black')
+            place(6, i, 'soldier', 'red')
+
         return board
-    
-    def setup_pieces(self):
-        """Set up piece representations - using simple Unicode characters"""
-        self.pieces = {
-            'red': {
-                'general': '帅',
-                'advisor': '仕',
-                'elephant': '相',
-                'horse': '马',
-                'chariot': '车',
-                'cannon': '炮',
-                'soldier': '兵'
-            },
-            'black': {
-                'general': '将',
-                'advisor': '士',
-                'elephant': '象',
-                'horse': '马',
-                'chariot': '车',
-                'cannon': '炮',
-                'soldier': '卒'
-            }
-        }
-    
-    def draw_board(self):
-        """Draw the Chinese Chess board"""
-        # Fill background
-        self.screen.fill(self.BACKGROUND_COLOR)
-        
-        # Draw board area
-        board_rect = pygame.Rect(
-            self.board_margin, 
-            self.board_margin, 
-            self.board_width, 
-            self.board_height + self.cell_size
-        )
-        pygame.draw.rect(self.screen, (220, 179, 92), board_rect)
-        
-        # Draw grid lines
-        for i in range(10):  # Horizontal lines
-            y = self.board_margin + i * self.cell_size
-            pygame.draw.line(
-                self.screen, 
-                self.LINE_COLOR,
-                (self.board_margin, y),
-                (self.board_margin + self.board_width, y),
-                2
-            )
-        
-        for i in range(9):  # Vertical lines
-            x = self.board_margin + i * self.cell_size
-            # Top half
-            pygame.draw.line(
-                self.screen, 
-                self.LINE_COLOR,
-                (x, self.board_margin),
-                (x, self.board_margin + 4 * self.cell_size),
-                2
-            )
-            # Bottom half
-            pygame.draw.line(
-                self.screen, 
-                self.LINE_COLOR,
-                (x, self.board_margin + 5 * self.cell_size),
-                (x, self.board_margin + 9 * self.cell_size),
-                2
-            )
-        
-        # Draw palace diagonal lines
-        # Black palace
-        pygame.draw.line(
-            self.screen, 
-            self.LINE_COLOR,
-            (self.board_margin + 3 * self.cell_size, self.board_margin),
-            (self.board_margin + 5 * self.cell_size, self.board_margin + 2 * self.cell_size),
-            2
-        )
-        pygame.draw.line(
-            self.screen, 
-            self.LINE_COLOR,
-            (self.board_margin + 5 * self.cell_size, self.board_margin),
-            (self.board_margin + 3 * self.cell_size, self.board_margin + 2 * self.cell_size),
-            2
-        )
-        
-        # Red palace
-        pygame.draw.line(
-            self.screen, 
-            self.LINE_COLOR,
-            (self.board_margin + 3 * self.cell_size, self.board_margin + 7 * self.cell_size),
-            (self.board_margin + 5 * self.cell_size, self.board_margin + 9 * self.cell_size),
-            2
-        )
-        pygame.draw.line(
-            self.screen, 
-            self.LINE_COLOR,
-            (self.board_margin + 5 * self.cell_size, self.board_margin + 7 * self.cell_size),
-            (self.board_margin + 3 * self.cell_size, self.board_margin + 9 * self.cell_size),
-            2
-        )
-        
-        # Draw river text
-        river_text = self.font.render("楚 河        汉 界", True, self.LINE_COLOR)
-        text_rect = river_text.get_rect(center=(self.window_size[0] // 2, self.board_margin + 4.5 * self.cell_size))
-        self.screen.blit(river_text, text_rect)
-    
-    def draw_pieces(self):
-        """Draw all pieces on the board"""
-        for row in range(10):
-            for col in range(9):
-                piece = self.board[row][col]
-                if piece:
-                    # Calculate position
-                    x = self.board_margin + col * self.cell_size
-                    y = self.board_margin + row * self.cell_size
-                    
-                    # Draw piece background
-                    pygame.draw.circle(
-                        self.screen,
-                        (230, 200, 140),
-                        (x, y),
-                        self.cell_size // 2 - 4
-                    )
-                    pygame.draw.circle(
-                        self.screen,
-                        self.RED_COLOR if piece['color'] == 'red' else self.BLACK_COLOR,
-                        (x, y),
-                        self.cell_size // 2 - 4,
-                        2
-                    )
-                    
-                    # Draw piece text
-                    piece_text = self.pieces[piece['color']][piece['type']]
-                    text_surface = self.font.render(
-                        piece_text, 
-                        True, 
-                        self.RED_COLOR if piece['color'] == 'red' else self.BLACK_COLOR
-                    )
-                    text_rect = text_surface.get_rect(center=(x, y))
-                    self.screen.blit(text_surface, text_rect)
-                    
-                    # Highlight selected piece
-                    if self.selected_piece and self.selected_piece == (row, col):
-                        highlight_surface = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
-                        highlight_surface.fill((0, 255, 0, 80))
-                        self.screen.blit(
-                            highlight_surface, 
-                            (x - self.cell_size // 2, y - self.cell_size // 2)
-                        )
-    
-    def draw_game_status(self):
-        """Draw game status information"""
-        # Draw whose turn it is
-        turn_text = f"{len(self.move_history)} rounds\nTurn: {'Red' if self.turn == 'red' else 'Black'}"
-        text_surface = self.small_font.render(turn_text, True, self.LINE_COLOR)
-        self.screen.blit(text_surface, (10, 10))
-        
-        # Draw game over message if applicable
-        if self.game_over:
-            msg = f"Game Over! {self.winner.capitalize()} wins!"
-            text_surface = self.font.render(msg, True, self.RED_COLOR if self.winner == 'red' else self.BLACK_COLOR)
-            text_rect = text_surface.get_rect(center=(self.window_size[0] // 2, self.window_size[1] - 40))
-            self.screen.blit(text_surface, text_rect)
 
     def get_action_space(self):
         """Get the action space for the game"""
+        return list(self._legal_actions())
+
+    def _legal_actions(self):
+        """Legal ((from_row, from_col), (to_row, to_col)) tuples for the side to move.
+
+        Served from the move cache when the position has been seen before.
+        """
+        last = self._last_actions
+        if last is not None and last[0] == self._hash:
+            return last[1]
+        cache = self.move_cache
+        if cache is not None:
+            key = (self._hash, self.turn)
+            actions = cache.get(key)
+            if actions is not None:
+                self._last_actions = (self._hash, actions)
+                return actions
+
         action_space = []
-        for row in range(10):
-            for col in range(9):
-                piece = self.board[row][col]
-                if piece and piece['color'] == self.turn:
-                    valid_moves = self.get_valid_moves(row, col)
-                    for move in valid_moves:
-                        action_space.append(((row, col), move))
-        return action_space
+        squares = self.squares
+        color = COLORS.index(self.turn)
+        for from_sq in range(NUM_SQUARES):
+            if CODE_COLOR[squares[from_sq]] == color:
+                from_pos = SQUARE_POS[from_sq]
+                for to_sq in self._legal_moves_from(from_sq, color):
+                    action_space.append((from_pos, SQUARE_POS[to_sq]))
+        actions = tuple(action_space)
+
+        if cache is not None:
+            cache.put(key, actions)
+        self._last_actions = (self._hash, actions)
+        return actions
+
+    def has_legal_move(self):
+        """Whether the side to move has any legal move, stopping at the first one found"""
+        return self._has_legal_move(COLORS.index(self.turn))
+
+    def _has_legal_move(self, color):
+        if color == COLORS.index(self.turn):
+            # Reuse a legal move list that is already known
+            last = self._last_actions
+            if last is not None and last[0] == self._hash:
+                return bool(last[1])
+            if self.move_cache is not None:
+                actions = self.move_cache.peek((self._hash, self.turn))
+                if actions is not None:
+                    return bool(actions)
+
+        squares = self.squares
+        general_sq = self.generals[color]
+        if general_sq < 0:
+            return False
+        # Out of check, moves of pieces off the general's rank and file are
+        # almost never illegal, so try those first and the general last; in
+        # check, the general is the most likely to have an escape
+        general_row, general_col = SQUARE_POS[general_sq]
+        likely, others = [], []
+        for sq in range(NUM_SQUARES):
+            if CODE_COLOR[squares[sq]] == color and sq != general_sq:
+                row, col = SQUARE_POS[sq]
+                (others if row == general_row or col == general_col else likely).append(sq)
+        if self._is_in_check(color):
+            order = [general_sq] + likely + others
+        else:
+            order = likely + others + [general_sq]
+
+        for from_sq in order:
+            for to_sq in self._pseudo_moves(from_sq):
+                captured = self._move_piece(from_sq, to_sq)
+                legal = not self._is_in_check(color)
+                self._unmove_piece(from_sq, to_sq, captured)
+                if legal:
+                    return True
+        return False
 
     def get_valid_moves(self, row, col):
         """Get all valid moves for the piece at the given position and check for check"""
-        possible_moves = self._get_valid_moves(row, col)
-        valid_moves = []
-        for move in possible_moves:
-            to_row, to_col = move
+        from_sq = row * COLS + col
+        color = COLORS.index(self.turn)
+        return [SQUARE_POS[to_sq] for to_sq in self._legal_moves_from(from_sq, color)]
+
+    def _legal_moves_from(self, from_sq, color):
+        """Destination squares from from_sq that do not leave color's general in check"""
+        legal = []
+        for to_sq in self._pseudo_moves(from_sq):
             # Temporarily make the move
-            old_piece = self.board[to_row][to_col]
-            self.board[to_row][to_col] = self.board[row][col]
-            self.board[row][col] = None
+            captured = self._move_piece(from_sq, to_sq)
             # Check if the move puts the player's general in check
-            if not self.is_in_check(self.turn):
-                valid_moves.append(move)
+            if not self._is_in_check(color):
+                legal.append(to_sq)
             # Undo the move
-            self.board[row][col] = self.board[to_row][to_col]
-            self.board[to_row][to_col] = old_piece
-        return valid_moves
+            self._unmove_piece(from_sq, to_sq, captured)
+        return legal
+
+    def _is_legal_move(self, from_sq, to_sq):
+        """Whether from_sq -> to_sq is legal for the side to move, tested without generating other moves"""
+        color = COLORS.index(self.turn)
+        if CODE_COLOR[self.squares[from_sq]] != color or to_sq not in self._pseudo_moves(from_sq):
+            return False
+        captured = self._move_piece(from_sq, to_sq)
+        legal = not self._is_in_check(color)
+        self._unmove_piece(from_sq, to_sq, captured)
+        return legal
 
     def _get_valid_moves(self, row, col):
         """Get all valid moves for the piece at the given position without checking for check"""
-        piece = self.board[row][col]
-        if not piece:
-            return []
-        
-        valid_moves = []
-        
+        return [SQUARE_POS[to_sq] for to_sq in self._pseudo_moves(row * COLS + col)]
+
+    def _pseudo_moves(self, sq):
+        """Destination squares of the piece on sq, ignoring checks"""
+        piece = self.squares[sq]
+        piece_type = CODE_TYPE[piece]
+        color = CODE_COLOR[piece]
+
         # Different movement rules for each piece type
-        if piece['type'] == 'chariot':  # Rook movement
-            # Horizontal moves
-            for c in range(col + 1, 9):
-                if self.board[row][c] is None:
-                    valid_moves.append((row, c))
-                else:
-                    if self.board[row][c]['color'] != piece['color']:
-                        valid_moves.append((row, c))
-                    break
-            
-            for c in range(col - 1, -1, -1):
-                if self.board[row][c] is None:
-                    valid_moves.append((row, c))
-                else:
-                    if self.board[row][c]['color'] != piece['color']:
-                        valid_moves.append((row, c))
-                    break
-            
-            # Vertical moves
-            for r in range(row + 1, 10):
-                if self.board[r][col] is None:
-                    valid_moves.append((r, col))
-                else:
-                    if self.board[r][col]['color'] != piece['color']:
-                        valid_moves.append((r, col))
-                    break
-            
-            for r in range(row - 1, -1, -1):
-                if self.board[r][col] is None:
-                    valid_moves.append((r, col))
+        if piece_type == CHARIOT:
+            return self._chariot_moves(sq, color)
+        elif piece_type == HORSE:
+            return self._horse_moves(sq, color)
+        elif piece_type == CANNON:
+            return self._cannon_moves(sq, color)
+        elif piece_type == SOLDIER:
+            return self._soldier_moves(sq, color)
+        elif piece_type == ELEPHANT:
+            return self._elephant_moves(sq, color)
+        elif piece_type == ADVISOR:
+            return self._advisor_moves(sq, color)
+        elif piece_type == GENERAL:
+            return self._general_moves(sq, color)
+        return []
+
+    def _chariot_moves(self, sq, color):
+        """Rook movement: slide until the first piece, capturing it if it is an opponent's"""
+        squares = self.squares
+        moves = []
+        for ray in RAYS[sq]:
+            for to_sq in ray:
+                target = squares[to_sq]
+                if target == EMPTY:
+                    moves.append(to_sq)
                 else:
-                    if self.board[r][col]['color'] != piece['color']:
-                        valid_moves.append((r, col))
+                    if CODE_COLOR[target] != color:
+                        moves.append(to_sq)
                     break
-                
-        elif piece['type'] == 'horse':  # Knight movement
-            # All possible knight moves
-            possible_moves = [
-                (row - 2, col - 1), (row - 2, col + 1),
-                (row - 1, col - 2), (row - 1, col + 2),
-                (row + 1, col - 2), (row + 1, col + 2),
-                (row + 2, col - 1), (row + 2, col + 1)
-            ]
-            
-            # Check for blocking pieces (horse leg)
-            for move_row, move_col in possible_moves:
-                if 0 <= move_row < 10 and 0 <= move_col < 9:
-                    # Check if the path is blocked
-                    blocked = False
-                    
-                    # Determine the blocking position
-                    if abs(move_row - row) == 2:  # Moving vertically first
-                        block_row = row + (1 if move_row > row else -1)
-                        block_col = col
-                    else:  # Moving horizontally first
-                        block_row = row
-                        block_col = col + (1 if move_col > col else -1)
-                    
-                    if self.board[block_row][block_col] is not None:
-                        blocked = True
-                    
-                    if not blocked and (self.board[move_row][move_col] is None or 
-                                      self.board[move_row][move_col]['color'] != piece['color']):
-                        valid_moves.append((move_row, move_col))
-        
-        elif piece['type'] == 'elephant':  # Elephant movement
-            # Elephant moves diagonally by 2 points
-            possible_moves = [
-                (row - 2, col - 2), (row - 2, col + 2),
-                (row + 2, col - 2), (row + 2, col + 2)
-            ]
-            
-            for move_row, move_col in possible_moves:
-                # Check if in bounds and not crossing the river
-                river_check = True
-                if piece['color'] == 'red' and move_row < 5:
-                    river_check = False
-                if piece['color'] == 'black' and move_row > 4:
-                    river_check = False
-                
-                if (0 <= move_row < 10 and 0 <= move_col < 9 and river_check):
-                    # Check if the diagonal path is blocked
-                    block_row = row + (1 if move_row > row else -1)
-                    block_col = col + (1 if move_col > col else -1)
-                    
-                    if self.board[block_row][block_col] is None and (
-                            self.board[move_row][move_col] is None or 
-                            self.board[move_row][move_col]['color'] != piece['color']):
-                        valid_moves.append((move_row, move_col))
-        
-        elif piece['type'] == 'advisor':  # Advisor movement
-            # Advisor moves diagonally by 1 point within the palace
-            possible_moves = [
-                (row - 1, col - 1), (row - 1, col + 1),
-                (row + 1, col - 1), (row + 1, col + 1)
-            ]
-            
-            for move_row, move_col in possible_moves:
-                # Check if in palace bounds
-                in_palace = False
-                if piece['color'] == 'red':
-                    if 7 <= move_row <= 9 and 3 <= move_col <= 5:
-                        in_palace = True
-                else:  # black
-                    if 0 <= move_row <= 2 and 3 <= move_col <= 5:
-                        in_palace = True
-                
-                if in_palace and (self.board[move_row][move_col] is None or 
-                                 self.board[move_row][move_col]['color'] != piece['color']):
-                    valid_moves.append((move_row, move_col))
-        
-        elif piece['type'] == 'general':  # General movement
-            # General moves orthogonally by 1 point within the palace
-            possible_moves = [
-                (row - 1, col), (row + 1, col),
-                (row, col - 1), (row, col + 1)
-            ]
-            
-            for move_row, move_col in possible_moves:
-                # Check if in palace bounds
-                in_palace = False
-                if piece['color'] == 'red':
-                    if 7 <= move_row <= 9 and 3 <= move_col <= 5:
-                        in_palace = True
-                else:  # black
-                    if 0 <= move_row <= 2 and 3 <= move_col <= 5:
-                        in_palace = True
-                
-                if in_palace and (self.board[move_row][move_col] is None or 
-                                 self.board[move_row][move_col]['color'] != piece['color']):
-                    valid_moves.append((move_row, move_col))
-            
-            # Check for flying general rule
-            opposing_general_col = col
-            found_piece = False
-            
-            if piece['color'] == 'red':
-                # Look upward for black general
-                for r in range(row - 1, -1, -1):
-                    if self.board[r][col] is not None:
-                        found_piece = True
-                        if (self.board[r][col]['type'] == 'general' and 
-                            self.board[r][col]['color'] != piece['color']):
-                            valid_moves.append((r, col))
-                        break
-            else:
-                # Look downward for red general
-                for r in range(row + 1, 10):
-                    if self.board[r][col] is not None:
-                        found_piece = True
-                        if (self.board[r][col]['type'] == 'general' and 
-                            self.board[r][col]['color'] != piece['color']):
-                            valid_moves.append((r, col))
-                        break
-        
-        elif piece['type'] == 'cannon':  # Cannon movement
-            # Horizontal moves
-            found_platform = False
-            for c in range(col + 1, 9):
-                if not found_platform:
-                    if self.board[row][c] is None:
-                        valid_moves.append((row, c))
-                    else:
-                        found_platform = True
-                else:
-                    if self.board[row][c] is not None:
-                        if self.board[row][c]['color'] != piece['color']:
-                            valid_moves.append((row, c))
-                        break
-            
-            found_platform = False
-            for c in range(col - 1, -1, -1):
-                if not found_platform:
-                    if self.board[row][c] is None:
-                        valid_moves.append((row, c))
-                    else:
-                        found_platform = True
-                else:
-                    if self.board[row][c] is not None:
-                        if self.board[row][c]['color'] != piece['color']:
-                            valid_moves.append((row, c))
-                        break
-            
-            # Vertical moves
-            found_platform = False
-            for r in range(row + 1, 10):
-                if not found_platform:
-                    if self.board[r][col] is None:
-                        valid_moves.append((r, col))
-                    else:
-                        found_platform = True
-                else:
-                    if self.board[r][col] is not None:
-                        if self.board[r][col]['color'] != piece['color']:
-                            valid_moves.append((r, col))
-                        break
-            
+        return moves
+
+    def _cannon_moves(self, sq, color):
+        """Slide like a chariot, but capture by jumping over exactly one platform"""
+        squares = self.squares
+        moves = []
+        for ray in RAYS[sq]:
             found_platform = False
-            for r in range(row - 1, -1, -1):
+            for to_sq in ray:
+                target = squares[to_sq]
                 if not found_platform:
-                    if self.board[r][col] is None:
-                        valid_moves.append((r, col))
+                    if target == EMPTY:
+                        moves.append(to_sq)
                     else:
                         found_platform = True
-                else:
-                    if self.board[r][col] is not None:
-                        if self.board[r][col]['color'] != piece['color']:
-                            valid_moves.append((r, col))
-                        break
-        
-        elif piece['type'] == 'soldier':  # Soldier movement
-            if piece['color'] == 'red':
-                # Red soldiers move up or horizontally if across the river
-                possible_moves = [(row - 1, col)]  # Always can move forward
-                
-                # If crossed the river, can also move horizontally
-                if row < 5:
-                    possible_moves.extend([(row, col - 1), (row, col + 1)])
+                elif target != EMPTY:
+                    if CODE_COLOR[target] != color:
+                        moves.append(to_sq)
+                    break
+        return moves
+
+    def _horse_moves(self, sq, color):
+        """Knight movement, blocked by a piece on the horse leg"""
+        squares = self.squares
+        return [to_sq for to_sq, leg in HORSE_MOVES[sq]
+                if squares[leg] == EMPTY and CODE_COLOR[squares[to_sq]] != color]
+
+    def _elephant_moves(self, sq, color):
+        """Two points diagonally on its own side of the river, blocked by a piece on the eye"""
+        squares = self.squares
+        return [to_sq for to_sq, eye in ELEPHANT_MOVES[color][sq]
+                if squares[eye] == EMPTY and CODE_COLOR[squares[to_sq]] != color]
+
+    def _advisor_moves(self, sq, color):
+        """One point diagonally within the palace"""
+        squares = self.squares
+        return [to_sq for to_sq in ADVISOR_MOVES[color][sq] if CODE_COLOR[squares[to_sq]] != color]
+
+    def _general_moves(self, sq, color):
+        """One point orthogonally within the palace, plus the flying general capture"""
+        squares = self.squares
+        moves = [to_sq for to_sq in GENERAL_MOVES[color][sq] if CODE_COLOR[squares[to_sq]] != color]
+        # Look towards the opponent's palace for a facing general
+        opposing_general = GENERAL + BLACK_OFFSET if color == 0 else GENERAL
+        for to_sq in RAYS[sq][UP if color == 0 else DOWN]:
+            target = squares[to_sq]
+            if target != EMPTY:
+                if target == opposing_general:
+                    moves.append(to_sq)
+                break
+        return moves
+
+    def _soldier_moves(self, sq, color):
+        """One point forward, or sideways once across the river"""
+        squares = self.squares
+        return [to_sq for to_sq in SOLDIER_MOVES[color][sq] if CODE_COLOR[squares[to_sq]] != color]
+
+    def get_captures(self):
+        """Legal capturing moves of the side to move as ((from_row, from_col), (to_row, to_col)) tuples"""
+        color = COLORS.index(self.turn)
+        captures = []
+        for from_sq, to_sq in self._captures(color):
+            captured = self._move_piece(from_sq, to_sq)
+            if not self._is_in_check(color):
+                captures.append((SQUARE_POS[from_sq], SQUARE_POS[to_sq]))
+            self._unmove_piece(from_sq, to_sq, captured)
+        return captures
+
+    def _captures(self, color):
+        """Pseudo-legal (from_sq, to_sq) captures of color, found without generating quiet moves"""
+        squares = self.squares
+        enemy = 1 - color
+        captures = []
+        for sq in range(NUM_SQUARES):
+            piece = squares[sq]
+            if CODE_COLOR[piece] != color:
+                continue
+            piece_type = CODE_TYPE[piece]
+            if piece_type == CHARIOT or piece_type == CANNON:
+                # The chariot takes the first piece on a ray, the cannon the second
+                skip = 0 if piece_type == CHARIOT else 1
+                for ray in RAYS[sq]:
+                    seen = 0
+                    for to_sq in ray:
+                        target = squares[to_sq]
+                        if target != EMPTY:
+                            if seen == skip:
+                                if CODE_COLOR[target] == enemy:
+                                    captures.append((sq, to_sq))
+                                break
+                            seen += 1
+            elif piece_type == HORSE:
+                for to_sq, leg in HORSE_MOVES[sq]:
+                    if CODE_COLOR[squares[to_sq]] == enemy and squares[leg] == EMPTY:
+                        captures.append((sq, to_sq))
+            elif piece_type == ELEPHANT:
+                for to_sq, eye in ELEPHANT_MOVES[color][sq]:
+                    if CODE_COLOR[squares[to_sq]] == enemy and squares[eye] == EMPTY:
+                        captures.append((sq, to_sq))
             else:
-                # Black soldiers move down or horizontally if across the river
-                possible_moves = [(row + 1, col)]  # Always can move forward
-                
-                # If crossed the river, can also move horizontally
-                if row > 4:
-                    possible_moves.extend([(row, col - 1), (row, col + 1)])
-            
-            for move_row, move_col in possible_moves:
-                if (0 <= move_row < 10 and 0 <= move_col < 9 and
-                    (self.board[move_row][move_col] is None or 
-                     self.board[move_row][move_col]['color'] != piece['color'])):
-                    valid_moves.append((move_row, move_col))
-        
-        return valid_moves
-
-    def draw_valid_moves(self, moves):
-        """Draw indicators for valid moves"""
-        for row, col in moves:
-            x = self.board_margin + col * self.cell_size
-            y = self.board_margin + row * self.cell_size
-            
-            # Draw move hint
-            pygame.draw.circle(
-                self.screen,
-                (0, 0, 255, 128),
-                (x, y),
-                self.cell_size // 6
-            )
-    
+                if piece_type == SOLDIER:
+                    targets = SOLDIER_MOVES[color][sq]
+                elif piece_type == ADVISOR:
+                    targets = ADVISOR_MOVES[color][sq]
+                else:
+                    targets = self._general_moves(sq, color)
+                for to_sq in targets:
+                    if CODE_COLOR[squares[to_sq]] == enemy:
+                        captures.append((sq, to_sq))
+        return captures
+
+    def static_exchange(self, from_pos, to_pos):
+        """Material balance for the mover of the capture sequence started by from_pos -> to_pos"""
+        return self._see(from_pos[0] * COLS + from_pos[1], to_pos[0] * COLS + to_pos[1])
+
+    def _see(self, from_sq, to_sq):
+        """Static exchange evaluation: both sides keep recapturing on to_sq with
+        their least valuable attacker and may stop whenever that is better.
+        Pins and checks are ignored.
+        """
+        squares = self.squares
+        saved = bytearray(squares)
+        gains = [CODE_VALUES[squares[to_sq]]]
+        attacker = squares[from_sq]
+        side = 1 - CODE_COLOR[attacker]
+        while True:
+            # Move the last attacker onto the target, opening lines behind it
+            squares[to_sq] = attacker
+            squares[from_sq] = EMPTY
+            from_sq = self._least_valuable_attacker(to_sq, side)
+            if from_sq < 0:
+                break
+            gains.append(CODE_VALUES[attacker] - gains[-1])
+            attacker = squares[from_sq]
+            side = 1 - side
+        squares[:] = saved
+
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def _least_valuable_attacker(self, sq, by):
+        """Square of the cheapest piece of color index `by` attacking sq, or -1"""
+        squares = self.squares
+        offset = BLACK_OFFSET if by else 0
+
+        soldier = SOLDIER + offset
+        for soldier_sq in SOLDIER_ATTACKERS[by][sq]:
+            if squares[soldier_sq] == soldier:
+                return soldier_sq
+        advisor = ADVISOR + offset
+        for advisor_sq in ADVISOR_ATTACKERS[by][sq]:
+            if squares[advisor_sq] == advisor:
+                return advisor_sq
+        elephant = ELEPHANT + offset
+        for elephant_sq, eye in ELEPHANT_ATTACKERS[by][sq]:
+            if squares[elephant_sq] == elephant and squares[eye] == EMPTY:
+                return elephant_sq
+        horse = HORSE + offset
+        for horse_sq, leg in HORSE_ATTACKERS[sq]:
+            if squares[horse_sq] == horse and squares[leg] == EMPTY:
+                return horse_sq
+
+        chariot = CHARIOT + offset
+        cannon = CANNON + offset
+        chariot_sq = -1
+        for ray in RAYS[sq]:
+            screened = False
+            for s in ray:
+                piece = squares[s]
+                if piece == EMPTY:
+                    continue
+                if screened:
+                    if piece == cannon:
+                        return s
+                    break
+                if piece == chariot:
+                    chariot_sq = s
+                screened = True
+        if chariot_sq >= 0:
+            return chariot_sq
+
+        general = GENERAL + offset
+        for general_sq in GENERAL_ATTACKERS[by][sq]:
+            if squares[general_sq] == general:
+                return general_sq
+        return -1
+
     def is_in_check(self, color):
         """Check if the given color's general is in check"""
-        # Find the general
-        general_pos = None
-        for row in range(10):
-            for col in range(9):
-                piece = self.board[row][col]
-                if piece and piece['type'] == 'general' and piece['color'] == color:
-                    general_pos = (row, col)
-                    break
-            if general_pos:
-                break
-        
-        assert general_pos is not None, f"{color} general not found on the board"
-        
-        # Check if any opponent piece can capture the general
-        opponent_color = 'black' if color == 'red' else 'red'
-        for row in range(10):
-            for col in range(9):
-                piece = self.board[row][col]
-                if piece and piece['color'] == opponent_color:
-                    valid_moves = self._get_valid_moves(row, col)
-                    if general_pos in valid_moves:
+        return self._is_in_check(COLORS.index(color))
+
+    def _is_in_check(self, color):
+        general_sq = self.generals[color]
+        assert general_sq >= 0, f"{COLORS[color]} general not found on the board"
+        return self._is_attacked(general_sq, 1 - color)
+
+    def is_square_attacked(self, row, col, color):
+        """Check if any piece of the given color could move to (row, col)"""
+        return self._is_attacked(row * COLS + col, COLORS.index(color))
+
+    def _is_attacked(self, sq, by):
+        """Check if a piece of color index `by` could capture on square sq.
+
+        Casts rays and leaper patterns outward from sq instead of generating
+        the attacker's moves. The occupant of sq is ignored, except that the
+        flying-general rule only applies when sq holds the other general.
+        """
+        # Chariots and cannons along ranks and files, generals facing each other
+        if self._line_attacked(sq, by):
+            return True
+
+        squares = self.squares
+        offset = BLACK_OFFSET if by else 0
+
+        # Horses whose leg is free
+        horse = HORSE + offset
+        for horse_sq, leg in HORSE_ATTACKERS[sq]:
+            if squares[horse_sq] == horse and squares[leg] == EMPTY:
+                return True
+
+        # Soldiers: forward moves, and sideways once across the river
+        soldier = SOLDIER + offset
+        for soldier_sq in SOLDIER_ATTACKERS[by][sq]:
+            if squares[soldier_sq] == soldier:
+                return True
+
+        # General and advisors only move inside their own palace
+        general = GENERAL + offset
+        for general_sq in GENERAL_ATTACKERS[by][sq]:
+            if squares[general_sq] == general:
+                return True
+        advisor = ADVISOR + offset
+        for advisor_sq in ADVISOR_ATTACKERS[by][sq]:
+            if squares[advisor_sq] == advisor:
+                return True
+
+        # Elephants stay on their own side of the river
+        elephant = ELEPHANT + offset
+        for elephant_sq, eye in ELEPHANT_ATTACKERS[by][sq]:
+            if squares[elephant_sq] == elephant and squares[eye] == EMPTY:
+                return True
+
+        return False
+
+    def _line_attacked(self, sq, by):
+        """Check for a chariot or cannon of color index `by` attacking sq, or its general facing sq"""
+        squares = self.squares
+        offset = BLACK_OFFSET if by else 0
+        chariot = CHARIOT + offset
+        cannon = CANNON + offset
+        general = GENERAL + offset
+
+        flying_ray = DOWN if by == 0 else UP
+        target_is_general = squares[sq] == GENERAL + BLACK_OFFSET - offset
+        for direction, ray in enumerate(RAYS[sq]):
+            screened = False
+            for s in ray:
+                piece = squares[s]
+                if piece == EMPTY:
+                    continue
+                if screened:
+                    if piece == cannon:
                         return True
-        
+                    break
+                if piece == chariot:
+                    return True
+                if piece == general and direction == flying_ray and target_is_general:
+                    return True
+                screened = True
         return False
 
     def make_move(self, from_pos, to_pos):
         """Move a piece and handle captures"""
 
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        # Check if the move is valid
-        valid_moves = self.get_valid_moves(from_row, from_col)
-        if (to_row, to_col) not in valid_moves:
-            return False
-        
-        # Check if the piece belongs to the current player
-        piece = self.board[from_row][from_col]
-        if piece['color'] != self.turn:
+        from_pos = tuple(from_pos)
+        to_pos = tuple(to_pos)
+
+        # Check if the move is valid: the legal actions only contain moves of
+        # the current player's pieces that do not leave the general in check
+        if (from_pos, to_pos) not in self._legal_actions():
             return False
-        
-        # Save the current board state to check for check after the move
-        old_board = [row[:] for row in self.board]
-        captured_piece = self.board[to_row][to_col]
-        
+
+        self._play((from_pos, to_pos))
+        return True
+
+    def _play(self, move):
+        """Play a move known to be legal, e.g. checked against a batched legal-action mask, and apply the game-end rules"""
         # Move the piece
-        self.board[to_row][to_col] = self.board[from_row][from_col]
-        self.board[from_row][from_col] = None
-        
-        # Check if the move puts or leaves the player's general in check
-        if self.is_in_check(self.turn):
-            # Undo the move
-            self.board = old_board
-            return False
-        
-        # Record the move
-        self.move_history.append({
-            'piece': piece,
-            'from': from_pos,
-            'to': to_pos,
-            'captured': captured_piece
-        })
-        
-        # Check if the opponent's general is in checkmate
-        self.turn = 'black' if self.turn == 'red' else 'red'
-        
-        # Check for game over conditions
-        if captured_piece and captured_piece['type'] == 'general':
-            self.game_over = True
-            self.winner = piece['color']
-        
+        self.push(move)
+
         # Check if the new turn's player is in checkmate
-        if self.is_checkmate(self.turn):
+        if not self.game_over and self.is_checkmate(self.turn):
             self.game_over = True
             self.winner = 'red' if self.turn == 'black' else 'black'
+            self.termination = 'checkmate'
 
-        # test action space
-        # print(f"{self.turn}'s action space: {self.get_action_space()}")
+        self._record_position()
+        if not self.game_over:
+            self._adjudicate()
 
-        return True
+    def _reset_history(self, halfmove=0, fullmove=1):
+        """Start the position history used for repetition and move limit rules at the current position.
 
-    def is_checkmate(self, color):
-        """Check if the given color is in checkmate"""
+        halfmove and fullmove are the FEN move counters of the position.
+        """
+        # Plies before the current position, counted from red's first move
+        self._start_ply = 2 * (fullmove - 1) + (self.turn == 'black')
+        # One record per position reached by make_move: (ply, hash, index of the previous
+        # occurrence of the hash or -1, occurrences so far, plies since the last capture,
+        # consecutive checking moves and consecutive chasing moves of the side that just moved)
+        self._history = [(len(self._undo_stack), self._hash, -1, 1, halfmove, 0, 0)]
+        # Hash -> index in _history of its latest occurrence
+        self._last_seen = {self._hash: 0}
+        # How the game ended: 'checkmate', 'repetition', 'perpetual_check', 'perpetual_chase', 'move_limit'
+        # or 'tablebase' (set by ChineseChessEnv when an endgame table decides the position)
+        self.termination = None
 
-        # Check if there are any valid moves left
-        for row in range(10):
-            for col in range(9):
-                piece = self.board[row][col]
-                if piece and piece['color'] == color:
-                    valid_moves = self.get_valid_moves(row, col)
-                    if valid_moves:
-                        return False
+    def _record_position(self):
+        """Append the position after the last move to the history, in constant time"""
+        history = self._history
+        index = len(history)
+        key = self._hash
+        to_sq, captured = self._undo_stack[-1][1], self._undo_stack[-1][3]
+        previous = self._last_seen.get(key, -1)
+        count = history[previous][3] + 1 if previous >= 0 else 1
+        quiet = 0 if captured != EMPTY else history[-1][4] + 1
 
-        return True
-    
-    def handle_click(self, pos):
-        """Handle mouse click at the given position"""
-        if self.game_over:
-            return
-        
-        # Convert screen position to board coordinates
-        x, y = pos
-        col = round((x - self.board_margin) / self.cell_size)
-        row = round((y - self.board_margin) / self.cell_size)
-        
-        # Check if click is on the board
-        if not (0 <= row < 10 and 0 <= col < 9):
-            return
-        
-        # If a piece is already selected
-        if self.selected_piece:
-            selected_row, selected_col = self.selected_piece
-            
-            # If clicking on the same piece, deselect it
-            if (row, col) == (selected_row, selected_col):
-                self.selected_piece = None
-                return
-            
-            # If clicking on a valid move, make the move
-            valid_moves = self.get_valid_moves(selected_row, selected_col)
-            if (row, col) in valid_moves:
-                move_success = self.make_move((selected_row, selected_col), (row, col))
-                self.selected_piece = None
-                return
-            
-            # If clicking on another piece of the same color, select that piece instead
-            piece_at_click = self.board[row][col]
-            if piece_at_click and piece_at_click['color'] == self.turn:
-                self.selected_piece = (row, col)
-                return
-            
-            # Otherwise, deselect
-            self.selected_piece = None
+        # Runs continue from the mover's own previous move, two records back
+        own = history[index - 2] if index >= 2 else None
+        check_run = chase_run = 0
+        opponent = COLORS.index(self.turn)
+        if self.generals[opponent] >= 0 and self._is_in_check(opponent):
+            check_run = (own[5] if own else 0) + 1
+        if self._chases(to_sq):
+            chase_run = (own[6] if own else 0) + 1
+
+        history.append((len(self._undo_stack), key, previous, count, quiet, check_run, chase_run))
+        self._last_seen[key] = index
+
+    def _forget_position(self):
+        """Drop the last history record when its move is taken back"""
+        _, key, previous, _, _, _, _ = self._history.pop()
+        if previous >= 0:
+            self._last_seen[key] = previous
         else:
-            # Select a piece if it belongs to the current player
-            piece = self.board[row][col]
-            if piece and piece['color'] == self.turn:
-                self.selected_piece = (row, col)
-    
+            del self._last_seen[key]
+
+    def _chases(self, sq):
+        """Check if the piece on sq attacks an enemy piece other than the general that is unprotected or worth more"""
+        squares = self.squares
+        piece = squares[sq]
+        # Generals and soldiers are allowed to chase
+        if CODE_TYPE[piece] == GENERAL or CODE_TYPE[piece] == SOLDIER:
+            return False
+        value = CODE_VALUES[piece]
+        defender = 1 - CODE_COLOR[piece]
+        for to_sq in self._pseudo_moves(sq):
+            target = squares[to_sq]
+            if target == EMPTY or CODE_TYPE[target] == GENERAL:
+                continue
+            if CODE_VALUES[target] > value or not self._is_attacked(to_sq, defender):
+                return True
+        return False
+
+    def _adjudicate(self):
+        """End the game on repetition or on the no-capture move limit"""
+        history = self._history
+        key, previous, count, quiet, check_run, chase_run = history[-1][1:]
+        if self.repetition_limit is not None and count >= self.repetition_limit:
+            # Each side made half of the moves of the cycle back to the earlier occurrence
+            moves = max(1, (history[-1][0] - history[previous][0]) // 2)
+            mover = 1 - COLORS.index(self.turn)
+            other_check_run, other_chase_run = history[-2][5:7]
+            # A side that checked (or, failing that, chased) on every move of the cycle
+            # while the other did not loses; anything else is a draw
+            for termination, mover_run, other_run in (('perpetual_check', check_run, other_check_run),
+                                                      ('perpetual_chase', chase_run, other_chase_run)):
+                mover_perpetual = mover_run >= moves
+                other_perpetual = other_run >= moves
+                if mover_perpetual != other_perpetual:
+                    self.game_over = True
+                    self.winner = COLORS[1 - mover] if mover_perpetual else COLORS[mover]
+                    self.termination = termination
+                    return
+                if mover_perpetual:
+                    break
+            self.game_over = True
+            self.winner = None
+            self.termination = 'repetition'
+        elif self.no_capture_limit is not None and quiet >= self.no_capture_limit:
+            self.game_over = True
+            self.winner = None
+            self.termination = 'move_limit'
+
+    @property
+    def repetition_count(self):
+        """How many times the current position has occurred in the game, counting this time"""
+        record = self._history[-1]
+        if record[0] == len(self._undo_stack) and record[1] == self._hash:
+            return record[3]
+        previous = self._last_seen.get(self._hash, -1)
+        return 1 + (self._history[previous][3] if previous >= 0 else 0)
+
+    @property
+    def no_capture_plies(self):
+        """Plies played by make_move since the last capture"""
+        return self._history[-1][4]
+
+    def push(self, move):
+        """Play a move ((from_row, from_col), (to_row, to_col)) without validating it.
+
+        Records everything needed to take the move back with pop(). Only a
+        captured general ends the game here; make_move also detects checkmate.
+        """
+        (from_row, from_col), (to_row, to_col) = move
+        self._push(from_row * COLS + from_col, to_row * COLS + to_col)
+
+    def _push(self, from_sq, to_sq):
+        piece = self.squares[from_sq]
+        captured = self._move_piece(from_sq, to_sq)
+        self._undo_stack.append((from_sq, to_sq, piece, captured, self.game_over, self.winner, self._hash))
+        self.turn = 'black' if self.turn == 'red' else 'red'
+        piece_keys = ZOBRIST_PIECES[piece]
+        self._hash ^= (piece_keys[from_sq] ^ piece_keys[to_sq] ^ ZOBRIST_PIECES[captured][to_sq]
+                       ^ ZOBRIST_BLACK_TO_MOVE)
+        piece_values = SQUARE_VALUES[piece]
+        self._score += piece_values[to_sq] - piece_values[from_sq] - SQUARE_VALUES[captured][to_sq]
+
+        # Check for game over conditions
+        if CODE_TYPE[captured] == GENERAL:
+            self.game_over = True
+            self.winner = COLORS[CODE_COLOR[piece]]
+
+    def pop(self):
+        """Take back the last move and return it as ((from_row, from_col), (to_row, to_col))"""
+        if not self._undo_stack:
+            raise IndexError("pop from empty move stack")
+        from_sq, to_sq = self._pop()
+        # Moves played with make_move also leave the position history
+        if len(self._history) > 1 and self._history[-1][0] > len(self._undo_stack):
+            self._forget_position()
+        if not self.game_over:
+            self.termination = None
+        return SQUARE_POS[from_sq], SQUARE_POS[to_sq]
+
+    def _pop(self):
+        from_sq, to_sq, piece, captured, self.game_over, self.winner, self._hash = self._undo_stack.pop()
+        self._unmove_piece(from_sq, to_sq, captured)
+        piece_values = SQUARE_VALUES[piece]
+        self._score -= piece_values[to_sq] - piece_values[from_sq] - SQUARE_VALUES[captured][to_sq]
+        self.turn = 'black' if self.turn == 'red' else 'red'
+        return from_sq, to_sq
+
+    @property
+    def score(self):
+        """Material and piece-square evaluation from red's point of view, kept up to date by push/pop"""
+        return self._score
+
+    def evaluate(self):
+        """Static evaluation from the point of view of the side to move"""
+        return self._score if self.turn == 'red' else -self._score
+
+    @property
+    def zobrist_hash(self):
+        """64-bit Zobrist hash of the position, including the side to move"""
+        return self._hash
+
+    def compute_hash(self):
+        """Recompute the Zobrist hash from scratch, e.g. to validate the incremental one"""
+        return compute_hash(self.squares, self.turn)
+
+    def previous_positions(self, count):
+        """Yield the squares of up to count earlier positions, most recent first"""
+        squares = bytearray(self.squares)
+        for from_sq, to_sq, piece, captured, _, _, _ in reversed(self._undo_stack[-count:] if count else []):
+            squares[from_sq] = piece
+            squares[to_sq] = captured
+            yield bytes(squares)
+
+    @property
+    def move_history(self):
+        """Moves played so far as {'piece', 'from', 'to', 'captured'} dicts, built from the undo stack"""
+        return [
+            {
+                'piece': piece_dict(piece),
+                'from': SQUARE_POS[from_sq],
+                'to': SQUARE_POS[to_sq],
+                'captured': piece_dict(captured),
+            }
+            for from_sq, to_sq, piece, captured, _, _, _ in self._undo_stack
+        ]
+
+    def is_checkmate(self, color):
+        """Check if the given color has no legal move (checkmate or stalemate, both lost in Xiangqi)"""
+        return not self._has_legal_move(COLORS.index(color))
+
     def board_to_string(self):
         """Return a string visualization of the board for terminal display."""
         piece_map = {
@@ -718,38 +1298,27 @@ class ChineseChess:
 
     def reset(self):
         """Reset the game to its initial state"""
-        self.board = self.create_initial_board()
-        self.selected_piece = None
+        self._set_squares(self.create_initial_board())
         self.turn = 'red'
         self.game_over = False
         self.winner = None
-        self.move_history = []
+        self._hash = compute_hash(self.squares, self.turn)
+        self._score = compute_score(self.squares)
+        self._undo_stack = []
+        self._reset_history()
         return
 
 
+def make_game(backend='array', **kwargs):
+    """Create a game with the given move generation backend: 'array' or 'bitboard'"""
+    if backend == 'array':
+        return ChineseChess(**kwargs)
+    if backend == 'bitboard':
+        from cc_bitboard import BitboardChineseChess
+        return BitboardChineseChess(**kwargs)
+    raise ValueError(f"unknown backend {backend!r}, expected 'array' or 'bitboard'")
+
+
 if __name__ == "__main__":
-    game = ChineseChess()
-    
-    # Main game loop
-    running = True
-
-    while running:
-        # print(f"action space: {game.get_action_space()}")
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click
-                    game.handle_click(event.pos)
-        
-        # Draw everything
-        game.draw_board()
-        game.draw_pieces()
-        if game.selected_piece:
-            valid_moves = game.get_valid_moves(*game.selected_piece)
-            game.draw_valid_moves(valid_moves)
-        game.draw_game_status()
-        
-        pygame.display.flip()
-    
-    pygame.quit()
\ No newline at end of file
+    from cc_render import main
+    main()
@@ -0,0 +1,118 @@
+"""Perft: count the leaf nodes of the legal move tree to a fixed depth.
+
+Move generation bugs show up as node counts that differ from the published
+Xiangqi perft numbers in PERFT_SUITE, so this doubles as a correctness gate
+and a move generation benchmark. Run ``python perft.py`` to check the suite
+to depth 3, ``python perft.py --depth 4`` for the full published depths, or
+``python perft.py --fen FEN --depth N --divide`` to split a single count by
+first move when hunting down a mismatch.
+"""
+import argparse
+import sys
+import time
+
+from chinese_chess import START_FEN, make_game
+
+
+# (name, FEN, {depth: nodes}) with published Xiangqi perft counts
+PERFT_SUITE = (
+    ('initial', START_FEN,
+     {1: 44, 2: 1920, 3: 79666, 4: 3290240, 5: 133312995}),
+    ('middlegame', 'r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1',
+     {1: 38, 2: 1128, 3: 43929, 4: 1339047}),
+    ('cannons', '1cbak4/9/n2a5/2p1p3p/5cp2/2n2N3/6PCP/3AB4/2C6/3A1K1N1 w - - 0 1',
+     {1: 7, 2: 281, 3: 8620, 4: 326201}),
+    ('endgame_chariot', '5a3/3k5/3aR4/9/5r3/5n3/9/3A1A3/5K3/2BC2B2 w - - 0 1',
+     {1: 25, 2: 424, 3: 9850, 4: 202884}),
+    ('attack', 'CRN1k1b2/3ca4/4ba3/9/2nr5/9/9/4B4/4A4/4KA3 w - - 0 1',
+     {1: 28, 2: 516, 3: 14808, 4: 395483}),
+    ('endgame_horse', 'R1N1k1b2/9/3aba3/9/2nr5/2B6/9/4B4/4A4/4KA3 w - - 0 1',
+     {1: 21, 2: 364, 3: 7626, 4: 162837}),
+)
+
+
+def perft(game, depth):
+    """Number of leaf nodes of the legal move tree of game to the given depth"""
+    if depth == 0:
+        return 1
+    actions = game.get_action_space()
+    if depth == 1:
+        return len(actions)
+    nodes = 0
+    for move in actions:
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def divide(game, depth):
+    """Perft split by first move: {((from_row, from_col), (to_row, to_col)): nodes}"""
+    result = {}
+    for move in game.get_action_space():
+        game.push(move)
+        result[move] = perft(game, depth - 1)
+        game.pop()
+    return result
+
+
+def _position(fen, backend='array'):
+    # The move cache would turn repeated subtrees into lookups and hide the cost of move generation
+    game = make_game(backend, move_cache=None)
+    game.load_fen(fen)
+    return game
+
+
+def run_suite(max_depth=3, suite=PERFT_SUITE, out=sys.stdout, backend='array'):
+    """Check every suite position up to max_depth; return the list of mismatches"""
+    failures = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in suite:
+        game = _position(fen, backend)
+        for depth in sorted(expected):
+            if depth > max_depth:
+                break
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = 'ok' if nodes == expected[depth] else f'FAIL (expected {expected[depth]})'
+            print(f"{name} depth {depth}: {nodes} nodes, {elapsed:.2f}s, "
+                  f"{nodes / max(elapsed, 1e-9):.0f} nodes/s {status}", file=out)
+            if nodes != expected[depth]:
+                failures.append((name, depth, nodes, expected[depth]))
+    print(f"total: {total_nodes} nodes, {total_time:.2f}s, "
+          f"{total_nodes / max(total_time, 1e-9):.0f} nodes/s", file=out)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fen', help='count a single position instead of running the suite')
+    parser.add_argument('--backend', default='array', choices=['array', 'bitboard'])
+    parser.add_argument('--divide', action='store_true', help='print the count of every first move')
+    args = parser.parse_args(argv)
+
+    if args.fen is None:
+        failures = run_suite(args.depth, backend=args.backend)
+        return 1 if failures else 0
+
+    game = _position(args.fen, args.backend)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(game, args.depth)
+        for move, nodes in sorted(counts.items()):
+            print(f"{move[0]} -> {move[1]}: {nodes}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game, args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"depth {args.depth}: {nodes} nodes, {elapsed:.2f}s, {nodes / max(elapsed, 1e-9):.0f} nodes/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from cc_batch import legal_action_mask
+
+
+def test_compact_mask_rejects_unencodable_moves():
+    # A red elephant on (8, 1), a square no elephant can reach
+    boards = np.zeros((1, 10, 9), dtype=np.uint8)
+    boards[0, 0, 3] = 8
+    boards[0, 9, 4] = 1
+    boards[0, 8, 1] = 3
+    assert legal_action_mask(boards, [0], "square")[0].sum() > 0
+    with pytest.raises(ValueError):
+        legal_action_mask(boards, [0], "compact")
@@ -0,0 +1,38 @@
+import random
+
+from cc_book import OpeningBook, format_iccs, parse_iccs
+from cc_records import BLACK_WIN, RED_WIN
+from chinese_chess import ChineseChess
+
+
+def test_iccs_round_trip():
+    assert parse_iccs('H2-E2') == ((7, 7), (7, 4))
+    assert format_iccs(((7, 7), (7, 4))) == 'h2e2'
+
+
+def test_lookup_returns_only_legal_book_moves():
+    game = ChineseChess()
+    book = OpeningBook()
+    book.add(game.zobrist_hash, ((7, 7), (7, 4)), 5)
+    book.add(game.zobrist_hash, ((9, 1), (7, 2)), 2)
+    # A black move and a chariot jumping over its horse are never legal here
+    book.add(game.zobrist_hash, ((0, 1), (2, 2)), 9)
+    book.add(game.zobrist_hash, ((9, 0), (5, 0)), 9)
+    assert book.lookup(game) == [(((7, 7), (7, 4)), 5), (((9, 1), (7, 2)), 2)]
+    assert book.choose(game, random.Random(0)) in (((7, 7), (7, 4)), ((9, 1), (7, 2)))
+
+
+def test_weights_follow_the_result_and_survive_save(tmp_path):
+    moves = [((7, 7), (7, 4)), ((0, 7), (2, 6))]
+    book = OpeningBook()
+    book.add_game(moves, RED_WIN)
+    book.add_game(moves, BLACK_WIN)
+    path = tmp_path / 'book.ccbk'
+    book.save(path)
+    loaded = OpeningBook.load(path)
+    assert loaded.entries == book.entries
+
+    game = ChineseChess()
+    assert loaded.lookup(game) == [(moves[0], 4)]
+    game.make_move(*moves[0])
+    assert loaded.lookup(game) == [(moves[1], 4)]
@@ -0,0 +1,89 @@
+import pytest
+
+import perft
+from chinese_chess import START_FEN, ChineseChess, format_fen, parse_fen
+
+
+@pytest.mark.parametrize('fen', [fen for _, fen, _ in perft.PERFT_SUITE])
+def test_round_trip(fen):
+    game = ChineseChess()
+    game.load_fen(fen)
+    assert game.to_fen() == fen
+    squares, turn, halfmove, fullmove = parse_fen(fen)
+    assert format_fen(squares, turn, fullmove, halfmove) == fen
+
+
+def test_start_position():
+    game = ChineseChess()
+    assert game.to_fen() == START_FEN
+    game.load_fen(START_FEN)
+    assert game.squares == ChineseChess().squares
+    assert game.zobrist_hash == ChineseChess().zobrist_hash
+
+
+def test_move_counters():
+    game = ChineseChess()
+    game.make_move((9, 1), (7, 2))
+    game.make_move((0, 1), (2, 2))
+    assert game.to_fen().endswith(' w - - 2 2')
+    # Cannon takes the horse, which resets the halfmove clock
+    game.make_move((7, 7), (0, 7))
+    assert game.to_fen().endswith(' b - - 0 2')
+
+
+def test_loaded_counters_carry_on():
+    game = ChineseChess()
+    game.load_fen('rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR b - - 7 30')
+    assert game.to_fen().endswith(' b - - 7 30')
+    assert game.no_capture_plies == 7
+    game.make_move((0, 1), (2, 2))
+    assert game.to_fen().endswith(' w - - 8 31')
+    game.make_move((9, 1), (7, 2))
+    assert game.to_fen().endswith(' b - - 9 31')
+    game.pop()
+    game.pop()
+    assert game.to_fen().endswith(' b - - 7 30')
+
+
+def test_black_to_move_first():
+    game = ChineseChess()
+    game.load_fen('rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR b - - 0 1')
+    game.make_move((0, 1), (2, 2))
+    assert game.to_fen().endswith(' w - - 1 2')
+
+
+def test_rejected_fen_leaves_the_game_unchanged():
+    game = ChineseChess()
+    game.make_move((9, 1), (7, 2))
+    before = (game.to_fen(), game.zobrist_hash, game.game_over)
+    with pytest.raises(ValueError):
+        game.load_fen('4k4/9/9/9/9/9/9/9/9/4K4 w')
+    assert (game.to_fen(), game.zobrist_hash, game.game_over) == before
+
+
+@pytest.mark.parametrize('fen', [
+    '',
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9 w',  # nine ranks
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNRR w',  # ten files
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNX w',  # unknown piece
+    'rnba1abnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w',  # no black general
+    'k8/9/9/9/9/9/9/9/9/4K4 w',  # general outside the palace
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR x',  # side to move
+    '4k4/9/9/9/9/9/9/9/9/4K4 w',  # facing generals: black to move could capture
+    '3k5/9/9/9/9/9/9/9/1B7/4K4 w',  # elephant off its squares
+    '3k5/9/9/9/9/9/9/9/9/4AK3 w',  # advisor off its squares
+    '3k5/9/9/9/9/9/9/P8/9/4K4 w',  # soldier behind its starting rank
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - x 1',  # halfmove clock
+    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 0',  # fullmove number
+])
+def test_invalid_fen(fen):
+    with pytest.raises(ValueError):
+        ChineseChess().load_fen(fen)
+
+
+def test_position_without_moves_is_over():
+    game = ChineseChess()
+    game.load_fen('3k5/4R4/3R5/9/9/9/9/9/9/4K4 b')
+    assert game.game_over
+    assert game.winner == 'red'
+    assert game.termination == 'checkmate'
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from chinese_chess import (
+    ADVISOR, BLACK_OFFSET, COLS, ELEPHANT, GENERAL, HORSE, NUM_SQUARES, ROWS, SOLDIER, ChineseChess,
+)
+
+
+def _own(squares, row, col, color):
+    piece = squares[row * COLS + col]
+    return piece != 0 and (piece > BLACK_OFFSET) == (color == 1)
+
+
+def _in_palace(row, col, color):
+    return 3 <= col <= 5 and (7 <= row <= 9 if color == 0 else 0 <= row <= 2)
+
+
+def reference_moves(squares, row, col, piece_type, color):
+    """Destinations of the leaping pieces as the branchy generator before the move tables found them"""
+    def empty(r, c):
+        return squares[r * COLS + c] == 0
+
+    def on_board(r, c):
+        return 0 <= r < ROWS and 0 <= c < COLS
+
+    moves = []
+    if piece_type == HORSE:
+        for dr, dc in ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)):
+            r, c = row + dr, col + dc
+            if not on_board(r, c):
+                continue
+            leg = (row + dr // 2, col) if abs(dr) == 2 else (row, col + dc // 2)
+            if empty(*leg) and not _own(squares, r, c, color):
+                moves.append((r, c))
+    elif piece_type == ELEPHANT:
+        for dr, dc in ((-2, -2), (-2, 2), (2, -2), (2, 2)):
+            r, c = row + dr, col + dc
+            if not on_board(r, c) or (r < 5 if color == 0 else r > 4):
+                continue
+            if empty(row + dr // 2, col + dc // 2) and not _own(squares, r, c, color):
+                moves.append((r, c))
+    elif piece_type in (ADVISOR, GENERAL):
+        steps = ((-1, -1), (-1, 1), (1, -1), (1, 1)) if piece_type == ADVISOR else ((-1, 0), (1, 0), (0, -1), (0, 1))
+        for dr, dc in steps:
+            r, c = row + dr, col + dc
+            if _in_palace(r, c, color) and not _own(squares, r, c, color):
+                moves.append((r, c))
+    elif piece_type == SOLDIER:
+        forward = -1 if color == 0 else 1
+        candidates = [(row + forward, col)]
+        if (row < 5) if color == 0 else (row > 4):
+            candidates += [(row, col - 1), (row, col + 1)]
+        for r, c in candidates:
+            if on_board(r, c) and not _own(squares, r, c, color):
+                moves.append((r, c))
+    return moves
+
+
+GENERATORS = {
+    HORSE: '_horse_moves',
+    ELEPHANT: '_elephant_moves',
+    ADVISOR: '_advisor_moves',
+    GENERAL: '_general_moves',
+    SOLDIER: '_soldier_moves',
+}
+
+
+def random_squares(rng, density):
+    # Random pieces other than generals, so the flying general capture never applies
+    return bytearray(rng.choice([ADVISOR, ELEPHANT, HORSE, SOLDIER]) + BLACK_OFFSET * rng.randrange(2)
+                     if rng.random() < density else 0 for _ in range(NUM_SQUARES))
+
+
+@pytest.mark.parametrize('piece_type', sorted(GENERATORS))
+@pytest.mark.parametrize('color', [0, 1])
+def test_tables_match_the_reference_generator(piece_type, color):
+    rng = random.Random(piece_type * 2 + color)
+    game = ChineseChess()
+    generate = getattr(game, GENERATORS[piece_type])
+    for density in (0.0, 0.3, 0.6):
+        for _ in range(20):
+            squares = random_squares(rng, density)
+            for sq in range(NUM_SQUARES):
+                row, col = divmod(sq, COLS)
+                board = bytearray(squares)
+                board[sq] = piece_type + BLACK_OFFSET * color
+                game.squares = board
+                found = sorted(divmod(to_sq, COLS) for to_sq in generate(sq, color))
+                assert found == sorted(reference_moves(board, row, col, piece_type, color)), (sq, board.hex())
@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+import perft
+from chinese_chess import START_FEN, make_game
+
+
+@pytest.mark.parametrize('backend', ['array', 'bitboard'])
+def test_suite_matches_published_counts(backend):
+    assert perft.run_suite(3, out=io.StringIO(), backend=backend) == []
+
+
+def test_backends_agree_move_by_move():
+    for _, fen, _ in perft.PERFT_SUITE:
+        counts = [perft.divide(perft._position(fen, backend), 2) for backend in ('array', 'bitboard')]
+        assert counts[0] == counts[1]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_game('quantum')
+
+
+def test_perft_leaves_position_unchanged():
+    game = perft._position(START_FEN)
+    perft.perft(game, 3)
+    assert game.to_fen() == START_FEN
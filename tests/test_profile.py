@@ -0,0 +1,43 @@
+import cc_profile
+from cc_gym import ChineseChessEnv
+from chinese_chess import ChineseChess
+
+ORIGINAL_MAKE_MOVE = ChineseChess.make_move
+
+
+def test_counts_and_restores():
+    profiler = cc_profile.Profiler()
+    with profiler:
+        assert ChineseChess.make_move is not ORIGINAL_MAKE_MOVE
+        game = ChineseChess()
+        game.make_move((9, 1), (7, 2))
+        game.get_action_space()
+    assert ChineseChess.make_move is ORIGINAL_MAKE_MOVE
+    snapshot = profiler.snapshot()
+    assert snapshot['methods']['make_move']['calls'] == 1
+    assert snapshot['pieces']['horse']['calls'] > 0
+    assert 'chinese_chess_method_calls_total{method="make_move"} 1' in profiler.prometheus_text()
+
+
+def test_enable_is_reference_counted():
+    profiler = cc_profile.Profiler()
+    profiler.enable()
+    profiler.enable()
+    profiler.disable()
+    assert profiler.enabled
+    profiler.disable()
+    assert not profiler.enabled
+    assert ChineseChess.make_move is ORIGINAL_MAKE_MOVE
+    profiler.disable()
+
+
+def test_env_attaches_and_releases_profiling():
+    env = ChineseChessEnv(action_encoding="compact", profile_interval=2)
+    env.reset(seed=0)
+    infos = []
+    for _ in range(4):
+        infos.append(env.step(int(env.action_mask.argmax()))[-1])
+    assert ['profile' in info for info in infos] == [False, True, False, True]
+    env.close()
+    assert not cc_profile.PROFILER.enabled
+    assert ChineseChess.make_move is ORIGINAL_MAKE_MOVE
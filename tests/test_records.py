@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from cc_gym import ACTION_ENCODINGS
+from cc_records import DRAW, RED_WIN, UNFINISHED, ShardReader, ShardWriter, game_result
+from chinese_chess import NUM_SQUARES, START_FEN, ChineseChess
+
+MIDDLEGAME = 'r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1'
+
+
+def random_game(seed, fen=None, plies=30):
+    rng = random.Random(seed)
+    game = ChineseChess()
+    if fen is not None:
+        game.load_fen(fen)
+    boards = []
+    while len(boards) < plies and not game.game_over:
+        boards.append(bytes(game.squares))
+        game.make_move(*rng.choice(game.get_action_space()))
+    return game, boards
+
+
+def random_policies(num_moves, seed):
+    rng = np.random.default_rng(seed)
+    action_size = ACTION_ENCODINGS["compact"][0]
+    policies = []
+    for _ in range(num_moves):
+        policy = np.zeros(action_size, dtype=np.float32)
+        actions = rng.choice(action_size, size=5, replace=False)
+        policy[actions] = rng.dirichlet(np.ones(5))
+        policies.append(policy)
+    return policies
+
+
+@pytest.mark.parametrize('snapshot_interval', [0, 4])
+def test_round_trip(tmp_path, snapshot_interval):
+    games = [random_game(0), random_game(1, MIDDLEGAME), random_game(2, plies=7)]
+    policies = random_policies(len(games[0][1]), 0)
+    with ShardWriter(tmp_path, max_shard_bytes=512, snapshot_interval=snapshot_interval) as writer:
+        writer.write_chess_game(games[0][0], policies=policies)
+        writer.write_chess_game(games[1][0])
+        writer.write_game([], 'draw')
+        writer.write_chess_game(games[2][0])
+    assert len(list(tmp_path.iterdir())) > 1
+
+    with ShardReader(tmp_path) as reader:
+        assert reader.num_games == 4
+        assert reader.num_positions == sum(len(boards) for _, boards in games)
+        records = [reader.game(i) for i in range(reader.num_games)]
+        assert records[0].fen == START_FEN
+        assert records[1].fen == MIDDLEGAME
+        assert [record.result for record in records] == [game_result(games[0][0]), game_result(games[1][0]),
+                                                         DRAW, game_result(games[2][0])]
+        assert records[0].has_policy and not records[1].has_policy
+
+        position = 0
+        for (game, boards), record in zip(games, records[:2] + records[3:]):
+            moves = [from_sq * NUM_SQUARES + to_sq for from_sq, to_sq, *_ in game._undo_stack]
+            assert record.moves.tolist() == moves
+            for ply, board in enumerate(boards):
+                stored = reader.position(position)
+                assert stored.squares.tobytes() == board
+                assert stored.move == moves[ply]
+                assert stored.ply == ply
+                position += 1
+
+        for ply, policy in enumerate(policies):
+            np.testing.assert_allclose(reader.policy(ply), policy, atol=1e-3)
+        assert reader.policy(len(policies)) is None
+
+        batch = reader.sample(16, np.random.default_rng(0))
+        assert batch['policy'].shape == (16, ACTION_ENCODINGS["compact"][0])
+        del records, stored, batch
+
+
+def test_values_follow_the_result(tmp_path):
+    with ShardWriter(tmp_path) as writer:
+        writer.write_game([((9, 1), (7, 2)), ((0, 1), (2, 2))], 'red')
+        writer.write_game([((9, 1), (7, 2)), ((0, 1), (2, 2))], None)
+    with ShardReader(tmp_path) as reader:
+        assert [reader.game(i).result for i in range(2)] == [RED_WIN, UNFINISHED]
+        assert [reader.position(i).value for i in range(4)] == [1.0, -1.0, 0.0, 0.0]
+
+
+def test_writers_share_a_directory(tmp_path):
+    game, _ = random_game(3)
+    writers = [ShardWriter(tmp_path, max_shard_bytes=64) for _ in range(3)]
+    for _ in range(4):
+        for writer in writers:
+            writer.write_chess_game(game)
+    for writer in writers:
+        writer.close()
+    with ShardReader(tmp_path) as reader:
+        assert reader.num_games == 12
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    game, _ = random_game(4)
+    with ShardWriter(tmp_path) as writer:
+        writer.write_chess_game(game)
+        writer.write_chess_game(game)
+    (shard,) = tmp_path.iterdir()
+    shard.write_bytes(shard.read_bytes()[:-5])
+    with ShardReader(tmp_path) as reader:
+        assert reader.num_games == 1
@@ -0,0 +1,54 @@
+from chinese_chess import ChineseChess
+
+HORSE_SHUFFLE = [((9, 1), (7, 2)), ((0, 1), (2, 2)), ((7, 2), (9, 1)), ((2, 2), (0, 1))]
+
+
+def test_threefold_repetition_is_a_draw():
+    game = ChineseChess()
+    for move in HORSE_SHUFFLE * 2:
+        assert not game.game_over
+        game.make_move(*move)
+    assert game.repetition_count == 3
+    assert game.game_over
+    assert game.winner is None
+    assert game.termination == 'repetition'
+
+
+def test_repetition_limit_none_keeps_playing():
+    game = ChineseChess(repetition_limit=None)
+    for move in HORSE_SHUFFLE * 3:
+        game.make_move(*move)
+    assert not game.game_over
+
+
+def test_pop_undoes_the_draw():
+    game = ChineseChess()
+    for move in HORSE_SHUFFLE * 2:
+        game.make_move(*move)
+    game.pop()
+    assert not game.game_over
+    assert game.termination is None
+    assert game.repetition_count == 2
+
+
+def test_perpetual_check_loses():
+    game = ChineseChess()
+    game.load_fen('9/4k4/9/9/9/R8/9/9/9/5K3 w')
+    # The red chariot checks from the d and e files while the black general steps between them
+    cycle = [((5, 4), (5, 3)), ((1, 3), (1, 4)), ((5, 3), (5, 4)), ((1, 4), (1, 3))]
+    for move in [((5, 0), (5, 4)), ((1, 4), (1, 3))] + cycle * 3:
+        if game.game_over:
+            break
+        assert game.make_move(*move)
+    assert game.game_over
+    assert game.termination == 'perpetual_check'
+    assert game.winner == 'black'
+
+
+def test_no_capture_limit():
+    game = ChineseChess(repetition_limit=None, no_capture_limit=8)
+    for move in HORSE_SHUFFLE * 2:
+        game.make_move(*move)
+    assert game.no_capture_plies == 8
+    assert game.game_over
+    assert game.termination == 'move_limit'
@@ -0,0 +1,50 @@
+import random
+
+from cc_search import SearchLimit, Searcher, best_move
+from chinese_chess import ChineseChess
+
+
+def position(fen):
+    game = ChineseChess()
+    game.load_fen(fen)
+    return game
+
+
+def test_static_exchange_counts_the_recapture():
+    # Cannon takes the chariot, the horse takes the cannon: 900 - 450
+    game = position('4k4/9/2n6/r8/9/9/P8/C8/9/3K5 w')
+    before = bytes(game.squares)
+    assert game.static_exchange((7, 0), (3, 0)) == 450
+    assert bytes(game.squares) == before
+
+
+def test_static_exchange_of_an_undefended_piece():
+    game = position('4k4/9/9/r8/9/9/9/R8/9/3K5 w')
+    assert game.static_exchange((7, 0), (3, 0)) == 900
+
+
+def test_captures_are_the_capturing_legal_moves():
+    rng = random.Random(0)
+    game = ChineseChess()
+    for _ in range(300):
+        moves = game.get_action_space()
+        if game.game_over or not moves:
+            game.reset()
+            continue
+        captures = [move for move in moves if game.squares[move[1][0] * 9 + move[1][1]]]
+        assert sorted(game.get_captures()) == sorted(captures)
+        game.make_move(*rng.choice(moves))
+
+
+def test_mate_in_one():
+    game = position('4k4/R8/9/9/9/9/9/9/9/R4K3 w')
+    move = best_move(game, SearchLimit(depth=2))
+    game.make_move(*move)
+    assert game.game_over and game.winner == 'red' and game.termination == 'checkmate'
+
+
+def test_quiescence_sees_the_recapture():
+    # Taking the horse on (5, 0) loses the chariot to the black chariot behind it
+    game = position('r3k4/9/9/9/9/n8/9/9/9/R2K5 w')
+    result = Searcher().search(game, SearchLimit(depth=1))
+    assert result.move != ((9, 0), (5, 0))
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from cc_tablebase import Tablebase, canonical_signature, generate, parse_signature
+from chinese_chess import ChineseChess
+
+
+@pytest.fixture(scope='module')
+def tablebase(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tablebase')
+    return generate('KRvK', directory=str(directory))
+
+
+def position(fen):
+    game = ChineseChess(repetition_limit=None)
+    game.load_fen(fen)
+    return game
+
+
+def test_signatures():
+    assert canonical_signature(*parse_signature('KvKR')) == ('KRvK', True)
+    assert canonical_signature(*parse_signature('KRvK')) == ('KRvK', False)
+
+
+def test_bare_generals_draw(tablebase):
+    assert tablebase.probe(position('4k4/9/9/9/9/9/9/9/9/3K5 w')) == ('draw', 0)
+
+
+def test_chariot_wins_for_either_colour(tablebase):
+    result, dtm = tablebase.probe(position('4k4/9/9/9/9/9/9/9/9/R2K5 w'))
+    assert result == 'win' and dtm > 0
+    # The same position with colours swapped and black to move
+    assert tablebase.probe(position('r2k5/9/9/9/9/9/9/9/9/4K4 b')) == ('win', dtm)
+    assert tablebase.probe(position('4k4/9/9/9/9/9/9/9/9/R2K5 b'))[0] == 'loss'
+
+
+def test_best_move_mates_within_dtm(tablebase):
+    game = position('4k4/9/9/9/9/9/9/9/9/R2K5 w')
+    _, dtm = tablebase.probe(game)
+    for _ in range(dtm):
+        if game.game_over:
+            break
+        game.make_move(*tablebase.best_move(game))
+    assert game.game_over and game.winner == 'red'
+
+
+def test_files_round_trip(tablebase):
+    loaded = Tablebase(tablebase.directory)
+    assert set(loaded.tables) == set(tablebase.tables)
+    for signature, codes in tablebase.tables.items():
+        np.testing.assert_array_equal(loaded.tables[signature], codes)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from cc_vector_env import ChineseChessVectorEnv
+
+
+@pytest.mark.parametrize('action_encoding', ['square', 'compact'])
+def test_masks_match_each_game(action_encoding):
+    env = ChineseChessVectorEnv(8, action_encoding=action_encoding, no_capture_limit=30)
+    rng = np.random.default_rng(0)
+    _, infos = env.reset(seed=0)
+    finished = 0
+    for _ in range(150):
+        for mask, game in zip(infos["action_mask"], env.games):
+            expected = np.zeros_like(mask)
+            expected[[env.encode_action(*move) for move in game.get_action_space()]] = True
+            np.testing.assert_array_equal(mask, expected)
+        actions = [rng.choice(np.flatnonzero(mask)) for mask in infos["action_mask"]]
+        _, _, terminations, truncations, infos = env.step(actions)
+        finished += int((terminations | truncations).sum())
+    assert finished > 0
+
+
+def test_illegal_action_plays_nothing():
+    env = ChineseChessVectorEnv(2)
+    _, infos = env.reset(seed=0)
+    legal = int(np.flatnonzero(infos["action_mask"][0])[0])
+    with pytest.raises(ValueError):
+        env.step([legal, 0])
+    assert [len(game._undo_stack) for game in env.games] == [0, 0]
+    env.step([legal, legal])
+    assert [len(game._undo_stack) for game in env.games] == [1, 1]